@@ -6,7 +6,8 @@ import shutil
 import threading
 import time
 import math  # 新增 math 库用于计算页数
-import urllib.request
+from contextlib import contextmanager
+from collections import OrderedDict
 import warnings
 
 warnings.filterwarnings("ignore", message="urllib3.*doesn\\'t match a supported version")
@@ -17,25 +18,43 @@ from urllib.request import getproxies
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import tarfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Any, Dict, List, Tuple
 from pathlib import Path
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlparse
 import gradio as gr
 
 # 配置参数
 VERSION = "v2.0.2-Gradio7-Web"
 DEFAULT_1MS_API = "https://1ms.run/api/v1/registry"
+REGISTRY_SCHEME = "https"
 CONNECT_TIMEOUT = 8
 READ_TIMEOUT = 120
 DOWNLOAD_MAX_RETRIES = 4
 BACKOFF_BASE = 0.3
 MAX_PARALLEL_LAYERS = 8
-
-# 防止回环代理问题
-local_proxies = getproxies()
-os.environ["HTTP_PROXY"] = os.environ["http_proxy"] = local_proxies.get("http", "")
-os.environ["HTTPS_PROXY"] = os.environ["https_proxy"] = local_proxies.get("https", "")
+RANGE_CHUNK_THRESHOLD = 64 * 1024 * 1024
+RANGE_CHUNK_SIZE = 16 * 1024 * 1024
+RANGE_WORKERS = 4
+MAX_CONCURRENT_JOBS = 3
+SESSION_IDLE_TIMEOUT = 300
+SESSION_POOL_MAX = 16
+API_CACHE_FILE_ENV = "DOCKER_PULL_CACHE_FILE"
+CATALOG_FILE = ".catalog.json"
+CATALOG_PAGE_SIZE = 20
+ARCHIVE_PORT_ENV = "DOCKER_PULL_ARCHIVE_PORT"
+ARCHIVE_PORT = 7861
+MANIFEST_ACCEPT = ", ".join([
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.oci.image.manifest.v1+json",
+])
+
+# 防止回环代理问题（仅影响 Gradio 自身的本地请求；拉取任务的代理只挂在各自的 Session 上）
 os.environ["NO_PROXY"] = os.environ["no_proxy"] = "localhost, 127.0.0.1/8, ::1"
 
 
@@ -68,6 +87,15 @@ class LayerProgress:
         self.index = index
         self.total_layers = total_layers
         self.status = "waiting"  # waiting, downloading, completed
+        self.version = 0
+
+
+# 状态 -> (文字颜色, 进度条颜色, 图标)
+LAYER_STATUS_STYLE = {
+    "completed": ("#4caf50", "#4caf50", "✔"),
+    "downloading": ("#29b6f6", "#29b6f6", "⬇"),
+    "waiting": ("#757575", "#616161", "⏳"),
+}
 
 
 class WebProgressDisplay:
@@ -78,21 +106,29 @@ class WebProgressDisplay:
         self.is_done = False
         self.error_msg = ""
         self.final_path = ""
+        self.version = 0
+
+    def _touch(self, layer: LayerProgress):
+        self.version += 1
+        layer.version = self.version
 
     def add_layer(self, name: str, total_size: int, index: int, total_layers: int):
         with self.lock:
             self.layers[name] = LayerProgress(name, total_size, index, total_layers)
+            self._touch(self.layers[name])
 
     def update_layer(self, name: str, downloaded: int):
         with self.lock:
             if name in self.layers:
                 self.layers[name].downloaded_size = downloaded
                 self.layers[name].status = "downloading"
+                self._touch(self.layers[name])
 
     def update_layer_size(self, name: str, total_size: int):
         with self.lock:
             if name in self.layers and total_size and total_size > 0:
                 self.layers[name].total_size = max(self.layers[name].total_size, total_size)
+                self._touch(self.layers[name])
 
     def complete_layer(self, name: str):
         with self.lock:
@@ -103,6 +139,38 @@ class WebProgressDisplay:
                 else:
                     layer.downloaded_size = layer.total_size
                 layer.status = "completed"
+                self._touch(layer)
+
+    def layer_names(self) -> frozenset:
+        with self.lock:
+            return frozenset(self.layers)
+
+    def _layer_view(self, layer: LayerProgress) -> Dict:
+        if layer.total_size > 0:
+            progress_pct = (layer.downloaded_size / layer.total_size) * 100
+        else:
+            progress_pct = 100.0 if layer.status == "completed" else 0.0
+        icon_color, bar_color, icon = LAYER_STATUS_STYLE.get(layer.status, LAYER_STATUS_STYLE["waiting"])
+        t_str = self.stats.format_size(layer.total_size) if layer.total_size > 0 else "?"
+        c_str = self.stats.format_size(layer.downloaded_size)
+        return {
+            "name": layer.name,
+            "pct": round(progress_pct, 1),
+            "size": f"{c_str}/{t_str}",
+            "icon": icon,
+            "color": icon_color,
+            "bar": bar_color,
+        }
+
+    def _speed_text(self) -> str:
+        speed = self.stats.get_avg_speed()
+        return self.stats.format_size(int(speed)) if speed > 0 else "0B"
+
+    def changes_since(self, version: int) -> Tuple[int, Dict]:
+        # 只返回指定版本之后有变化的层，供前端增量更新；每个查看者各自记录版本号
+        with self.lock:
+            layers = [self._layer_view(l) for l in self.layers.values() if l.version > version]
+            return self.version, {"layers": layers, "speed": self._speed_text()}
 
     def get_html_content(self) -> str:
         with self.lock:
@@ -119,42 +187,25 @@ class WebProgressDisplay:
             """]
 
             for _, layer in sorted(self.layers.items(), key=lambda x: x[1].index):
-                if layer.total_size > 0:
-                    progress_pct = (layer.downloaded_size / layer.total_size) * 100
-                else:
-                    progress_pct = 100.0 if layer.status == "completed" else 0.0
-
-                if layer.status == "completed":
-                    icon_color, bar_color, icon = "#4caf50", "#4caf50", "✔"
-                elif layer.status == "downloading":
-                    icon_color, bar_color, icon = "#29b6f6", "#29b6f6", "⬇"
-                else:
-                    icon_color, bar_color, icon = "#757575", "#616161", "⏳"
-
-                t_str = self.stats.format_size(layer.total_size) if layer.total_size > 0 else "?"
-                c_str = self.stats.format_size(layer.downloaded_size)
-
+                view = self._layer_view(layer)
                 html.append(f"""
-                <div style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 8px;">
-                    <div style="width: 140px; color: {icon_color};">
-                        <span style="display: inline-block; width: 20px;">{icon}</span>
+                <div class="dp-row" data-layer="{layer.name}" style="display: flex; align-items: center; justify-content: space-between; margin-bottom: 8px;">
+                    <div class="dp-label" style="width: 140px; color: {view['color']};">
+                        <span class="dp-icon" style="display: inline-block; width: 20px;">{view['icon']}</span>
                         ({layer.index}/{layer.total_layers}) {layer.name:<12}
                     </div>
                     <div style="flex-grow: 1; margin: 0 15px; background-color: #333333; height: 10px; border-radius: 5px; overflow: hidden;">
-                        <div style="width: {progress_pct}%; background-color: {bar_color}; height: 100%; transition: width 0.3s ease;"></div>
+                        <div class="dp-bar" style="width: {view['pct']}%; background-color: {view['bar']}; height: 100%; transition: width 0.3s ease;"></div>
                     </div>
                     <div style="width: 160px; text-align: right; color: #b0bec5;">
-                        <span style="display:inline-block; width: 50px;">{progress_pct:5.1f}%</span> | {c_str}/{t_str}
+                        <span class="dp-pct" style="display:inline-block; width: 50px;">{view['pct']:5.1f}%</span> | <span class="dp-size">{view['size']}</span>
                     </div>
                 </div>
                 """)
 
-            speed = self.stats.get_avg_speed()
-            speed_str = self.stats.format_size(int(speed)) if speed > 0 else "0B"
-
             html.append(f"""
                 <hr style="border: none; border-top: 1px dashed #424242; margin: 15px 0;">
-                <div style="color: #ffb74d;">📊 预估下载速度: {speed_str}/s</div>
+                <div style="color: #ffb74d;">📊 预估下载速度: <span class="dp-speed">{self._speed_text()}</span>/s</div>
             """)
 
             if self.is_done:
@@ -176,25 +227,128 @@ class WebProgressDisplay:
             return "".join(html)
 
 
+# --------------------------
+# Prometheus 指标
+# --------------------------
+METRICS_PORT_ENV = "DOCKER_PULL_METRICS_PORT"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meta: Dict[str, tuple] = {}
+        self.values: Dict[str, Dict[tuple, float]] = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.meta[name] = (kind, help_text, buckets)
+        self.values.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self.meta[name][2]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values[name]
+            # [各桶计数..., sum, count]
+            state = series.setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @staticmethod
+    def _labels(pairs):
+        if not pairs:
+            return ""
+        text = ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return "{" + text + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, buckets) in self.meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in self.values[name].items():
+                    if kind != "histogram":
+                        lines.append(f"{name}{self._labels(key)} {value}")
+                        continue
+                    for bound, count in zip(buckets + ("+Inf",), value[:-2] + [value[-1]]):
+                        lines.append(f"{name}_bucket{self._labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{self._labels(key)} {value[-2]}")
+                    lines.append(f"{name}_count{self._labels(key)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("docker_pull_bytes_total", "counter", "已下载的字节数（按仓库）")
+metrics.describe("docker_pull_active_connections", "gauge", "正在传输的 blob 连接数")
+metrics.describe("docker_pull_chunk_seconds", "histogram", "单次 blob/分片请求的耗时（秒）", LATENCY_BUCKETS)
+metrics.describe("docker_pull_retries_total", "counter", "blob 下载重试次数（按仓库）")
+metrics.describe("docker_pull_token_requests_total", "counter", "token 获取/刷新次数（按仓库）")
+metrics.describe("docker_pull_decompress_bytes_total", "counter", "解压输出的字节数")
+metrics.describe("docker_pull_decompress_seconds_total", "counter", "解压耗时累计（秒）")
+metrics.describe("docker_pull_jobs_active", "gauge", "正在执行的拉取任务数")
+metrics.describe("docker_pull_jobs_total", "counter", "已结束的拉取任务数（按结果）")
+metrics.describe("docker_pull_jobs_queued", "gauge", "排队等待执行的拉取任务数")
+metrics.describe("docker_pull_jobs_coalesced_total", "counter", "合并到已有任务的重复拉取请求数")
+metrics.describe("docker_pull_api_cache_total", "counter", "1ms 接口缓存命中情况（hit/stale/miss）")
+metrics.describe("docker_pull_archive_requests_total", "counter", "镜像包直链下载请求数（按状态码）")
+metrics.describe("docker_pull_archive_bytes_total", "counter", "镜像包直链下载发送的字节数")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
 # --------------------------
 # 核心网络与下载逻辑
 # --------------------------
-def apply_proxy_config(proxy_mode, p_host, p_user, p_pass):
+# 只返回代理字典，不写 os.environ：不同代理设置的任务可以在同一进程内并行
+def build_proxies(proxy_mode, p_host, p_user, p_pass):
     proxies = {}
     if proxy_mode == "系统代理":
-        sys_proxies = urllib.request.getproxies()
-        if "http" in sys_proxies:
-            os.environ["HTTP_PROXY"] = os.environ["http_proxy"] = sys_proxies["http"]
-            proxies["http"] = sys_proxies["http"]
-        if "https" in sys_proxies:
-            os.environ["HTTPS_PROXY"] = os.environ["https_proxy"] = sys_proxies["https"]
-            proxies["https"] = sys_proxies["https"]
+        sys_proxies = getproxies()
+        for scheme in ("http", "https"):
+            if scheme in sys_proxies:
+                proxies[scheme] = sys_proxies[scheme]
     elif proxy_mode == "自定义代理":
-        auth = f"{p_user}:{p_pass}@" if p_user else ""
+        auth = f"{quote(p_user, safe='')}:{quote(p_pass or '', safe='')}@" if p_user else ""
         url = f"http://{auth}{p_host}" if p_host else ""
         if url:
-            os.environ["HTTP_PROXY"] = os.environ["http_proxy"] = url
-            os.environ["HTTPS_PROXY"] = os.environ["https_proxy"] = url
             proxies = {"http": url, "https": url}
     return proxies
 
@@ -206,45 +360,243 @@ def get_session(verify_ssl, proxies) -> requests.Session:
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     session.verify = verify_ssl
-    session.proxies = proxies
+    # 不读取环境变量中的代理，"无代理" 即直连，代理完全由任务自身的配置决定
+    session.trust_env = False
+    session.proxies = dict(proxies or {})
     return session
 
 
+# 按 (SSL 校验, 代理) 复用 Session，保持到 1ms API 和各仓库的长连接；空闲超时或超出上限时回收
+class SessionPool:
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, max_sessions=SESSION_POOL_MAX):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        self.entries: Dict[tuple, Dict] = {}
+
+    @staticmethod
+    def _key(verify_ssl, proxies):
+        return bool(verify_ssl), tuple(sorted((proxies or {}).items()))
+
+    def acquire(self, verify_ssl, proxies) -> requests.Session:
+        key = self._key(verify_ssl, proxies)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {"session": get_session(verify_ssl, proxies), "users": 0}
+            entry["users"] += 1
+            entry["last_used"] = now
+            self._evict(now)
+            return entry["session"]
+
+    def release(self, session: requests.Session):
+        with self.lock:
+            for entry in self.entries.values():
+                if entry["session"] is session:
+                    entry["users"] -= 1
+                    entry["last_used"] = time.monotonic()
+                    break
+
+    @contextmanager
+    def session(self, verify_ssl, proxies):
+        session = self.acquire(verify_ssl, proxies)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def _evict(self, now):
+        # 只回收没有任务在用的 Session
+        idle = sorted((e["last_used"], key) for key, e in self.entries.items() if e["users"] == 0)
+        overflow = len(self.entries) - self.max_sessions
+        for last_used, key in idle:
+            if now - last_used > self.idle_timeout or overflow > 0:
+                self.entries.pop(key)["session"].close()
+                overflow -= 1
+
+
+session_pool = SessionPool()
+
+
+# 1ms 搜索/Tag 接口缓存：TTL 内直接返回；过期但未超过 stale 期限时先返回旧值并在后台刷新
+API_CACHE_TTL = 300
+API_CACHE_STALE_TTL = 3600
+API_CACHE_MAX_ENTRIES = 512
+
+
+def cache_key(*parts) -> str:
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+
+
+class TTLCache:
+    def __init__(self, ttl=API_CACHE_TTL, stale_ttl=API_CACHE_STALE_TTL, max_entries=API_CACHE_MAX_ENTRIES, disk_path=None):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.refreshing = set()
+        if disk_path:
+            self._load()
+
+    def get_or_load(self, key: str, loader):
+        if self.ttl <= 0:
+            return loader()
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.ttl:
+                metrics.inc("docker_pull_api_cache_total", result="hit")
+                return value
+            if age < self.stale_ttl:
+                metrics.inc("docker_pull_api_cache_total", result="stale")
+                self._refresh_async(key, loader)
+                return value
+        metrics.inc("docker_pull_api_cache_total", result="miss")
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key: str, value):
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if self.disk_path:
+            self._save()
+
+    def _refresh_async(self, key: str, loader):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, loader())
+            except Exception:
+                pass  # 刷新失败时继续使用旧值
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _load(self):
+        try:
+            with open(self.disk_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, (value, stored_at) in data.get("entries", {}).items():
+            if now - stored_at < self.stale_ttl:
+                self.entries[key] = (value, stored_at)
+
+    def _save(self):
+        with self.lock:
+            data = {"entries": {k: [v, t] for k, (v, t) in self.entries.items()}}
+        tmp_path = f"{self.disk_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.disk_path)
+        except OSError:
+            pass
+
+
+api_cache = TTLCache(disk_path=os.environ.get(API_CACHE_FILE_ENV) or None)
+
+
 def get_auth_head(session, registry, repository):
     try:
-        ping_url = f"https://{registry}/v2/"
+        ping_url = f"{REGISTRY_SCHEME}://{registry}/v2/"
         resp = session.get(ping_url, timeout=10)
         if resp.status_code == 401 and "WWW-Authenticate" in resp.headers:
             www = resp.headers["WWW-Authenticate"]
             auth_url = www.split('"')[1]
             reg_service = www.split('"')[3]
             token_url = f"{auth_url}?service={reg_service}&scope=repository:{repository}:pull"
+            metrics.inc("docker_pull_token_requests_total", registry=registry)
             t_resp = session.get(token_url, timeout=10)
             t_resp.raise_for_status()
             access_token = t_resp.json()["token"]
-            return {
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.docker.distribution.manifest.v2+json, application/vnd.docker.distribution.manifest.list.v2+json"
-            }
+            return {"Authorization": f"Bearer {access_token}", "Accept": MANIFEST_ACCEPT}
     except Exception as e:
         print(f"Auth Ping Fallback: {e}")
-    return {
-        "Accept": "application/vnd.docker.distribution.manifest.v2+json, application/vnd.docker.distribution.manifest.list.v2+json"}
+    return {"Accept": MANIFEST_ACCEPT}
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+def update_hash_from_file(sha256_hash, path, start=0, length=None, block_size=1024 * 1024):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            data = f.read(block_size if remaining is None else min(block_size, remaining))
+            if not data:
+                break
+            sha256_hash.update(data)
+            if remaining is not None:
+                remaining -= len(data)
 
 
-def download_file_chunked(session, url, headers, save_path, desc, expected_digest, progress: WebProgressDisplay):
-    resume_pos = os.path.getsize(save_path) if os.path.exists(save_path) else 0
-    fetch_headers = headers.copy()
-    if resume_pos > 0: fetch_headers["Range"] = f"bytes={resume_pos}-"
+def digest_matches(sha256_hash, expected_digest):
+    if not expected_digest or not expected_digest.startswith("sha256:"):
+        return True
+    return sha256_hash.hexdigest() == expected_digest[7:]
+
+
+def download_file_chunked(session, url, headers, save_path, desc, expected_digest, progress: WebProgressDisplay,
+                          total_size=0):
+    # 大 blob 拆成多个 Range 分片并行下载；已有单流下载的半成品文件时继续单流续传
+    if total_size > RANGE_CHUNK_THRESHOLD and not os.path.exists(save_path):
+        try:
+            return download_file_ranged(session, url, headers, save_path, desc, expected_digest, progress, total_size)
+        except RangeNotSupported:
+            for path in (f"{save_path}.part", f"{save_path}.journal"):
+                if os.path.exists(path): os.remove(path)
+    return download_file_stream(session, url, headers, save_path, desc, expected_digest, progress)
+
+
+def download_file_stream(session, url, headers, save_path, desc, expected_digest, progress: WebProgressDisplay):
+    registry = urlparse(url).netloc
 
     for attempt in range(DOWNLOAD_MAX_RETRIES):
         if progress.error_msg: return False
+        # 每次尝试都按磁盘上的实际长度续传，并先把已有部分计入摘要
+        resume_pos = os.path.getsize(save_path) if os.path.exists(save_path) else 0
+        sha256_hash = hashlib.sha256()
+        if resume_pos > 0: update_hash_from_file(sha256_hash, save_path)
+        fetch_headers = headers.copy()
+        if resume_pos > 0: fetch_headers["Range"] = f"bytes={resume_pos}-"
+
+        request_start = time.perf_counter()
+        metrics.inc("docker_pull_active_connections")
         try:
             with session.get(url, headers=fetch_headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
                 if resp.status_code == 416:
+                    if not digest_matches(sha256_hash, expected_digest):
+                        os.remove(save_path)
+                        raise ValueError(f"{desc} 已有文件校验失败，重新下载")
                     progress.complete_layer(desc)
                     return True
                 resp.raise_for_status()
+                if resume_pos > 0 and resp.status_code == 200:
+                    # 服务端不支持 Range，从头开始
+                    resume_pos = 0
+                    sha256_hash = hashlib.sha256()
 
                 content_range = resp.headers.get("content-range")
                 total_size = int(content_range.split("/")[1]) if content_range else int(
@@ -261,7 +613,9 @@ def download_file_chunked(session, url, headers, save_path, desc, expected_diges
                         if progress.error_msg: return False
                         if chunk:
                             f.write(chunk)
+                            sha256_hash.update(chunk)
                             downloaded_size += len(chunk)
+                            metrics.inc("docker_pull_bytes_total", len(chunk), registry=registry)
                             progress.update_layer(desc, downloaded_size)
                             progress.stats.total_size += len(chunk)
 
@@ -271,28 +625,214 @@ def download_file_chunked(session, url, headers, save_path, desc, expected_diges
                                 progress.stats.speeds.append(speed)
                                 last_size = downloaded_size
                                 last_update = now
+            metrics.observe("docker_pull_chunk_seconds", time.perf_counter() - request_start)
+            if not digest_matches(sha256_hash, expected_digest):
+                os.remove(save_path)
+                raise ValueError(f"{desc} 校验失败: sha256 与 {expected_digest} 不一致")
             progress.complete_layer(desc)
             return True
         except Exception as e:
             if attempt < DOWNLOAD_MAX_RETRIES - 1:
+                metrics.inc("docker_pull_retries_total", registry=registry)
                 time.sleep(1)
                 continue
             raise e
+        finally:
+            metrics.inc("docker_pull_active_connections", -1)
     return False
 
 
+def load_range_journal(journal_path, expected_digest, total_size):
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (journal.get("digest"), journal.get("size"), journal.get("chunk_size")) != (expected_digest, total_size, RANGE_CHUNK_SIZE):
+        return None
+    return set(journal.get("done", []))
+
+
+def save_range_journal(journal_path, expected_digest, total_size, done):
+    tmp_path = f"{journal_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"digest": expected_digest, "size": total_size, "chunk_size": RANGE_CHUNK_SIZE, "done": sorted(done)}, f)
+    os.replace(tmp_path, journal_path)
+
+
+# 分片写入预分配的 .part 文件，完成的分片记录在 .journal 中，服务重启后只下载缺失的分片；
+# 主线程按顺序对已完成的连续前缀计算 sha256，校验与下载重叠进行，全部完成后再改名为目标文件
+def download_file_ranged(session, url, headers, save_path, desc, expected_digest, progress: WebProgressDisplay,
+                         total_size):
+    part_path = f"{save_path}.part"
+    journal_path = f"{save_path}.journal"
+    registry = urlparse(url).netloc
+    chunks = [(start, min(start + RANGE_CHUNK_SIZE, total_size)) for start in range(0, total_size, RANGE_CHUNK_SIZE)]
+
+    done = load_range_journal(journal_path, expected_digest, total_size)
+    if done is None or not os.path.exists(part_path) or os.path.getsize(part_path) != total_size:
+        done = set()
+        with open(part_path, "wb") as f:
+            f.truncate(total_size)
+        save_range_journal(journal_path, expected_digest, total_size, done)
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    state = {"downloaded": sum(chunks[i][1] - chunks[i][0] for i in done)}
+    progress.update_layer_size(desc, total_size)
+    progress.update_layer(desc, state["downloaded"])
+
+    def fetch_chunk(index):
+        start, end = chunks[index]
+        offset = start
+        for attempt in range(DOWNLOAD_MAX_RETRIES):
+            if progress.error_msg or stop.is_set(): return False
+            request_start = time.perf_counter()
+            metrics.inc("docker_pull_active_connections")
+            try:
+                chunk_headers = dict(headers, Range=f"bytes={offset}-{end - 1}")
+                with session.get(url, headers=chunk_headers, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+                    resp.raise_for_status()
+                    if resp.status_code != 206:
+                        raise RangeNotSupported(url)
+                    with open(part_path, "r+b") as f:
+                        f.seek(offset)
+                        for data in resp.iter_content(chunk_size=65536):
+                            if progress.error_msg or stop.is_set(): return False
+                            data = data[:end - offset]
+                            f.write(data)
+                            offset += len(data)
+                            with lock:
+                                state["downloaded"] += len(data)
+                            metrics.inc("docker_pull_bytes_total", len(data), registry=registry)
+                            progress.stats.total_size += len(data)
+                            if offset >= end:
+                                break
+                if offset < end:
+                    raise IOError(f"{desc} 分片 {index} 数据不完整")
+                metrics.observe("docker_pull_chunk_seconds", time.perf_counter() - request_start)
+                return True
+            except RangeNotSupported:
+                raise
+            except Exception:
+                if attempt < DOWNLOAD_MAX_RETRIES - 1:
+                    metrics.inc("docker_pull_retries_total", registry=registry)
+                    time.sleep(1)
+                    continue
+                raise
+            finally:
+                metrics.inc("docker_pull_active_connections", -1)
+        return False
+
+    sha256_hash = hashlib.sha256()
+    hashed = 0
+    with ThreadPoolExecutor(max_workers=RANGE_WORKERS) as pool:
+        futures = {pool.submit(fetch_chunk, i): i for i in range(len(chunks)) if i not in done}
+        pending = set(futures)
+        last_update, last_size = time.time(), state["downloaded"]
+        try:
+            while True:
+                while hashed < len(chunks) and hashed in done:
+                    start, end = chunks[hashed]
+                    update_hash_from_file(sha256_hash, part_path, start, end - start)
+                    hashed += 1
+                if not pending:
+                    break
+                finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    if not fut.result():
+                        return False
+                    done.add(futures[fut])
+                if finished:
+                    save_range_journal(journal_path, expected_digest, total_size, done)
+
+                progress.update_layer(desc, state["downloaded"])
+                now = time.time()
+                if now - last_update >= 0.5:
+                    progress.stats.speeds.append((state["downloaded"] - last_size) / (now - last_update))
+                    last_size = state["downloaded"]
+                    last_update = now
+        finally:
+            stop.set()
+            for fut in pending:
+                fut.cancel()
+
+    os.remove(journal_path)
+    if not digest_matches(sha256_hash, expected_digest):
+        os.remove(part_path)
+        raise ValueError(f"{desc} 校验失败: sha256 与 {expected_digest} 不一致")
+    os.replace(part_path, save_path)
+    progress.complete_layer(desc)
+    return True
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DECOMPRESS_BUFFER_SIZE = 1024 * 1024
+
+
+def detect_layer_compression(path):
+    # 以文件头魔数为准：部分镜像站返回的 mediaType 与实际内容不一致
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "none"
+
+
+def _zstd_decompress_stream(src, dst):
+    # Python 3.14+ 使用标准库 compression.zstd，否则回退到 zstandard 模块
+    try:
+        from compression import zstd
+    except ImportError:
+        zstd = None
+    if zstd is not None:
+        with zstd.ZstdFile(src, "rb") as reader:
+            shutil.copyfileobj(reader, dst, DECOMPRESS_BUFFER_SIZE)
+        return
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("解压 zstd 层需要 Python 3.14+ 或安装 zstandard 模块（pip install zstandard）")
+    zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=DECOMPRESS_BUFFER_SIZE, write_size=DECOMPRESS_BUFFER_SIZE)
+
+
+def decompress_layer(src_path, dst_path):
+    compression = detect_layer_compression(src_path)
+    if compression == "none":
+        os.replace(src_path, dst_path)
+        return compression
+
+    start = time.perf_counter()
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        if compression == "gzip":
+            with gzip.GzipFile(fileobj=src, mode="rb") as gz:
+                shutil.copyfileobj(gz, dst, DECOMPRESS_BUFFER_SIZE)
+        else:
+            _zstd_decompress_stream(src, dst)
+        metrics.inc("docker_pull_decompress_bytes_total", dst.tell())
+    metrics.inc("docker_pull_decompress_seconds_total", time.perf_counter() - start)
+    os.remove(src_path)
+    return compression
+
+
 def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, arch, output_dir, proxy_args):
+    session = None
     try:
-        proxies = apply_proxy_config(*proxy_args[:4])
-        session = get_session(proxy_args[4], proxies)
+        proxies = build_proxies(*proxy_args[:4])
+        session = session_pool.acquire(proxy_args[4], proxies)
 
         if "/" not in repository: repository = f"library/{repository}"
         auth_head = get_auth_head(session, registry, repository)
 
-        mani_url = f"https://{registry}/v2/{repository}/manifests/{tag}"
+        mani_url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/manifests/{tag}"
         resp = session.get(mani_url, headers=auth_head)
         resp.raise_for_status()
         resp_json = resp.json()
+        manifest_digest = resp.headers.get("Docker-Content-Digest") or f"sha256:{hashlib.sha256(resp.content).hexdigest()}"
 
         if resp_json.get("manifests"):
             digest = None
@@ -304,8 +844,9 @@ def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, ar
                     break
             if not digest:
                 raise ValueError(f"该镜像在 {tag} 下未找到 {arch} 架构。")
+            manifest_digest = digest
 
-            mani_url = f"https://{registry}/v2/{repository}/manifests/{digest}"
+            mani_url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/manifests/{digest}"
             resp = session.get(mani_url, headers=auth_head)
             resp.raise_for_status()
             resp_json = resp.json()
@@ -320,7 +861,7 @@ def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, ar
         imgdir.mkdir(parents=True, exist_ok=True)
 
         config_path = str(imgdir / f"{config_digest[7:]}.json")
-        config_url = f"https://{registry}/v2/{repository}/blobs/{config_digest}"
+        config_url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/blobs/{config_digest}"
 
         progress.add_layer("Config", config_size, 1, len(layers) + 1)
 
@@ -337,13 +878,14 @@ def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, ar
 
         def download_worker(layer_obj):
             ublob = layer_obj["digest"]
-            url = f"https://{registry}/v2/{repository}/blobs/{ublob}"
+            url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/blobs/{ublob}"
             fake_layerid = layer_obj["fake_layerid"]
             ldir = imgdir / fake_layerid
             ldir.mkdir(parents=True, exist_ok=True)
 
             save_path = str(ldir / "layer_gzip.tar")
-            success = download_file_chunked(session, url, auth_head, save_path, ublob[:12], ublob, progress)
+            success = download_file_chunked(session, url, auth_head, save_path, ublob[:12], ublob, progress,
+                                            layer_obj.get("size", 0))
             return success, fake_layerid, ldir
 
         with ThreadPoolExecutor(max_workers=MAX_PARALLEL_LAYERS) as pool:
@@ -367,9 +909,7 @@ def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, ar
             tar_path = ldir / "layer.tar"
 
             if gz_path.exists():
-                with gzip.open(gz_path, "rb") as gz, open(tar_path, "wb") as file:
-                    shutil.copyfileobj(gz, file)
-                os.remove(gz_path)
+                decompress_layer(str(gz_path), str(tar_path))
 
             with open(ldir / "json", "w") as f:
                 json.dump({"id": fake_layerid, "parent": parent_layerid if parent_layerid else None}, f)
@@ -381,12 +921,23 @@ def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, ar
         with open(imgdir / "repositories", "w") as f:
             json.dump({repository: {tag: layers[-1]["fake_layerid"]}}, f)
 
+        # 先写到 .tar.part，完整写完再改名：文件服务和目录索引只认 .tar，不会拿到写了一半的包
         tar_final = Path(output_dir) / f"{safe_repo}_{tag}_{arch}.tar"
-        with tarfile.open(str(tar_final), "w") as tar:
-            tar.add(str(imgdir), arcname="/")
+        tar_part = tar_final.with_name(tar_final.name + ".part")
+        try:
+            with tarfile.open(str(tar_part), "w") as tar:
+                tar.add(str(imgdir), arcname="/")
+        except BaseException:
+            tar_part.unlink(missing_ok=True)
+            raise
 
         shutil.rmtree(str(imgdir), ignore_errors=True)
 
+        os.replace(tar_part, tar_final)
+        get_catalog(output_dir).record(
+            tar_final.name, registry=registry, repository=repository, tag=tag, arch=arch,
+            digest=manifest_digest, layers=[l["digest"] for l in layers])
+
         progress.final_path = str(tar_final.absolute())
         progress.is_done = True
 
@@ -394,37 +945,303 @@ def pull_image_logic(progress: WebProgressDisplay, registry, repository, tag, ar
         import traceback
         traceback.print_exc()
         progress.error_msg = str(e)
+    finally:
+        if session is not None:
+            session_pool.release(session)
 
 
 # --------------------------
 # UI 交互函数与文件管理
 # --------------------------
-def get_downloaded_tars(out_dir):
-    if not out_dir: out_dir = "downloads"
-    os.makedirs(out_dir, exist_ok=True)
-    files = []
-    try:
-        for f in os.listdir(out_dir):
-            if f.endswith(".tar"):
-                files.append(os.path.join(out_dir, f))
-        files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    except Exception:
+# 镜像包目录索引：记录每个 .tar 对应的镜像、tag、架构、manifest digest、大小与层 digest。
+# 拉取完成时增量写入；目录 mtime 变化时才重新扫描，只为新出现的文件取 stat，用于发现手动拷入或删除的文件
+class ArchiveCatalog:
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.id = hashlib.sha1(self.directory.encode("utf-8")).hexdigest()[:12]
+        self.path = os.path.join(self.directory, CATALOG_FILE)
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        self.dir_mtime = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = {e["file"]: e for e in json.load(f).get("archives", [])}
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.entries = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"archives": list(self.entries.values())}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _entry(name, st, **meta):
+        entry = {"file": name, "registry": "", "repository": "", "tag": "", "arch": "", "digest": "", "layers": []}
+        entry.update(meta)
+        entry["size"] = st.st_size
+        entry["mtime"] = st.st_mtime
+        return entry
+
+    def record(self, name, **meta):
+        st = os.stat(os.path.join(self.directory, name))
+        with self.lock:
+            self.entries[name] = self._entry(name, st, **meta)
+            self._save()
+
+    def remove(self, name):
+        with self.lock:
+            if self.entries.pop(name, None) is not None:
+                self._save()
+
+    def sync(self):
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return
+        with self.lock:
+            if mtime == self.dir_mtime:
+                return
+            names = set()
+            changed = False
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if not item.name.endswith(".tar") or not item.is_file():
+                        continue
+                    names.add(item.name)
+                    if item.name not in self.entries:
+                        self.entries[item.name] = self._entry(item.name, item.stat())
+                        changed = True
+            for name in set(self.entries) - names:
+                del self.entries[name]
+                changed = True
+            if changed:
+                self._save()
+            # 索引文件本身也在该目录下，保存后再取 mtime，避免下次刷新时重复扫描
+            self.dir_mtime = os.stat(self.directory).st_mtime_ns
+
+    def query(self, keyword="", arch=None) -> List[Dict]:
+        terms = keyword.lower().split()
+        with self.lock:
+            entries = list(self.entries.values())
+        result = []
+        for e in entries:
+            if arch and e["arch"] != arch:
+                continue
+            text = " ".join([e["file"], e["repository"], e["tag"], e["arch"], e["digest"]]).lower()
+            if all(t in text for t in terms):
+                result.append(e)
+        result.sort(key=lambda e: e["mtime"], reverse=True)
+        return result
+
+
+catalogs: Dict[str, ArchiveCatalog] = {}
+catalogs_lock = threading.Lock()
+
+
+def get_catalog(out_dir) -> ArchiveCatalog:
+    directory = os.path.abspath(out_dir or "downloads")
+    os.makedirs(directory, exist_ok=True)
+    with catalogs_lock:
+        if directory not in catalogs:
+            catalogs[directory] = ArchiveCatalog(directory)
+        return catalogs[directory]
+
+
+def find_catalog(catalog_id):
+    with catalogs_lock:
+        for catalog in catalogs.values():
+            if catalog.id == catalog_id:
+                return catalog
+    return None
+
+
+# 镜像包直链下载：/archives/<目录 id>/<文件名>，支持 Range 断点续传与 If-None-Match / If-Modified-Since / If-Range，
+# 正文用 socket.sendfile 直接从文件发送（Linux 下零拷贝），不经过 Gradio 的文件缓存
+class ArchiveHandler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _resolve(self):
+        parts = urlparse(self.path).path.split("/")
+        if len(parts) != 4 or parts[1] != "archives":
+            return None
+        catalog = find_catalog(parts[2])
+        name = unquote(parts[3])
+        if catalog is None or not name.endswith(".tar") or name != os.path.basename(name) or name.startswith("."):
+            return None
+        path = os.path.join(catalog.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _parse_range(self, size, etag, last_modified):
+        header = self.headers.get("Range")
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None  # 多段 Range 按规范可直接返回完整内容
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range.strip() not in (etag, last_modified):
+            return None
+        start, _, end = header[6:].strip().partition("-")
+        try:
+            if not start:
+                length = int(end)
+                if length <= 0:
+                    return "invalid"
+                return max(size - length, 0), size - 1
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        except ValueError:
+            return None
+        if start >= size or start > end:
+            return "invalid"
+        return start, end
+
+    def _serve(self, send_body):
+        path = self._resolve()
+        if path is None:
+            self.send_error(404)
+            return
+        st = os.stat(path)
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+
+        if self._not_modified(etag, st.st_mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return
+
+        byte_range = self._parse_range(st.st_size, etag, last_modified)
+        if byte_range == "invalid":
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{st.st_size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range or (0, st.st_size - 1)
+        length = end - start + 1 if st.st_size else 0
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", "application/x-tar")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(os.path.basename(path))}")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{st.st_size}")
+        self.end_headers()
+        if not send_body or not length:
+            return
+
+        metrics.inc("docker_pull_archive_requests_total", status=206 if byte_range else 200)
+        try:
+            with open(path, "rb") as f:
+                sent = self.connection.sendfile(f, start, length)
+            metrics.inc("docker_pull_archive_bytes_total", sent)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端中断，之后会带 Range 续传
+
+    def log_message(self, format, *args):
         pass
 
-    choices = [os.path.basename(f) for f in files]
-    return files, gr.update(choices=choices, value=None)
+
+archive_server = None
+
+
+def start_archive_server(port, host="0.0.0.0"):
+    global archive_server
+    archive_server = ThreadingHTTPServer((host, port), ArchiveHandler)
+    archive_server.daemon_threads = True
+    threading.Thread(target=archive_server.serve_forever, daemon=True).start()
+    return archive_server
+
+
+def request_host(request):
+    return request.headers.get("host") if request is not None else None
 
 
-def delete_local_tar(filename, out_dir):
+def archive_url(host, catalog, name):
+    if archive_server is None:
+        return None
+    hostname = urlparse(f"//{host}").hostname if host else None
+    hostname = hostname or "127.0.0.1"
+    if ":" in hostname:
+        hostname = f"[{hostname}]"
+    return f"http://{hostname}:{archive_server.server_address[1]}/archives/{catalog.id}/{quote(name)}"
+
+
+def fn_catalog_page(out_dir, keyword="", arch_filter="全部", page=1, host=None):
+    catalog = get_catalog(out_dir)
+    catalog.sync()
+    entries = catalog.query(keyword or "", None if arch_filter in (None, "", "全部") else arch_filter)
+
+    total_pages = max(1, math.ceil(len(entries) / CATALOG_PAGE_SIZE))
+    page = min(max(1, int(page or 1)), total_pages)
+    page_entries = entries[(page - 1) * CATALOG_PAGE_SIZE: page * CATALOG_PAGE_SIZE]
+    stats = DownloadStats()
+
+    rows = [[
+        e["file"],
+        f"{e['repository']}:{e['tag']}" if e["repository"] else "-",
+        e["arch"] or "-",
+        stats.format_size(e["size"]),
+        e["digest"][:19] if e["digest"] else "-",
+        len(e["layers"]) if e["layers"] else "-",
+        time.strftime("%Y-%m-%d %H:%M", time.localtime(e["mtime"])),
+        f"[⬇️ 下载]({url})" if (url := archive_url(host, catalog, e["file"])) else "-",
+    ] for e in page_entries]
+    files = [os.path.join(catalog.directory, e["file"]) for e in page_entries]
+    names = [e["file"] for e in page_entries]
+    page_html = f"<div style='text-align:center; padding-top:8px; color:#666; font-size:14px;'>第 {page} / {total_pages} 页（共 {len(entries)} 个镜像包）</div>"
+    return (files, gr.update(choices=names, value=None), rows, page_html, page,
+            gr.update(interactive=page > 1), gr.update(interactive=page < total_pages))
+
+
+def delete_local_tar(filename, out_dir, keyword, arch_filter, page, request: gr.Request):
     if filename:
-        filepath = os.path.join(out_dir, filename)
+        catalog = get_catalog(out_dir)
+        filepath = os.path.join(catalog.directory, filename)
         if os.path.exists(filepath):
             try:
                 os.remove(filepath)
+                catalog.remove(filename)
                 gr.Info(f"🗑️ 成功删除: {filename}")
             except Exception as e:
                 gr.Warning(f"删除失败: {e}")
-    return get_downloaded_tars(out_dir)
+    return fn_catalog_page(out_dir, keyword, arch_filter, page, request_host(request))
+
+
+def fetch_1ms_api(endpoint, params, verify_ssl, proxies):
+    def load():
+        with session_pool.session(verify_ssl, proxies) as session:
+            resp = session.get(f"{DEFAULT_1MS_API}/{endpoint}", params=params)
+        resp.raise_for_status()
+        payload = resp.json()
+        # 接口错误（code 非 0 或没有 data）直接抛出，不能当作空结果写进缓存
+        if payload.get("code") != 0 or payload.get("data") is None:
+            raise RuntimeError(f"{endpoint} 接口返回异常: {payload}")
+        return payload["data"]
+
+    return api_cache.get_or_load(cache_key(endpoint, DEFAULT_1MS_API, sorted(params.items())), load)
 
 
 # 🌟 新增：带分页的核心搜索函数
@@ -433,14 +1250,10 @@ def execute_search(keyword, target_page, p_mode, p_host, p_user, p_pass, vSSL):
         return [], 1, "<div style='text-align:center;'>请先输入关键词</div>", gr.update(interactive=False), gr.update(
             interactive=False)
 
-    proxies = apply_proxy_config(p_mode, p_host, p_user, p_pass)
-    session = get_session(vSSL, proxies)
+    proxies = build_proxies(p_mode, p_host, p_user, p_pass)
     page_size = 20
     try:
-        resp = session.get(f"{DEFAULT_1MS_API}/search",
-                           params={"query": keyword, "page": target_page, "page_size": page_size})
-        resp.raise_for_status()
-        data = resp.json().get("data", {})
+        data = fetch_1ms_api("search", {"query": keyword, "page": target_page, "page_size": page_size}, vSSL, proxies)
         items = data.get("list", [])
         total = data.get("total", 0)
 
@@ -473,13 +1286,10 @@ def execute_search(keyword, target_page, p_mode, p_host, p_user, p_pass, vSSL):
 
 
 def fn_get_tags(selected_repo, p_mode, p_host, p_user, p_pass, vSSL):
-    proxies = apply_proxy_config(p_mode, p_host, p_user, p_pass)
-    session = get_session(vSSL, proxies)
+    proxies = build_proxies(p_mode, p_host, p_user, p_pass)
     try:
-        resp = session.get(f"{DEFAULT_1MS_API}/get_tags",
-                           params={"repositories": selected_repo, "page": 1, "page_size": 100})
-        resp.raise_for_status()
-        items = resp.json().get("data", {}).get("list", [])
+        data = fetch_1ms_api("get_tags", {"repositories": selected_repo, "page": 1, "page_size": 100}, vSSL, proxies)
+        items = data.get("list", [])
         tags = [it.get("tag_name") for it in items if it.get("tag_name")]
         if not tags: tags = ["latest"]
         return gr.update(choices=tags, value="latest", interactive=True)
@@ -487,12 +1297,88 @@ def fn_get_tags(selected_repo, p_mode, p_host, p_user, p_pass, vSSL):
         return gr.update(choices=["latest"], value="latest", interactive=True)
 
 
+def run_pull_job(progress: WebProgressDisplay, *args):
+    metrics.inc("docker_pull_jobs_active")
+    try:
+        pull_image_logic(progress, *args)
+    finally:
+        metrics.inc("docker_pull_jobs_active", -1)
+        metrics.inc("docker_pull_jobs_total", result="ok" if progress.is_done else "failed")
+
+
+class PullJob:
+    def __init__(self, seq, key, registry, args):
+        self.seq = seq
+        self.key = key
+        self.registry = registry
+        self.args = args
+        self.progress = WebProgressDisplay()
+        self.state = "queued"  # queued, running, finished
+        self.finished = threading.Event()
+
+
+# 全局限制同时执行的拉取任务数；各仓库轮流出队，避免单个仓库的大批任务饿死其他仓库；
+# 相同 (仓库, 镜像, tag, 架构, 输出目录) 的请求合并为同一个任务，共享进度与结果文件
+class JobScheduler:
+    def __init__(self, max_concurrent=MAX_CONCURRENT_JOBS):
+        self.max_concurrent = max_concurrent
+        self.lock = threading.Lock()
+        self.jobs: Dict[tuple, PullJob] = {}
+        self.queues: "OrderedDict[str, List[PullJob]]" = OrderedDict()
+        self.running = 0
+        self.seq = 0
+
+    def submit(self, registry, repository, tag, arch, output_dir, proxy_args) -> Tuple[PullJob, bool]:
+        if "/" not in repository: repository = f"library/{repository}"
+        key = (registry, repository, tag, arch, os.path.abspath(output_dir or "downloads"))
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                metrics.inc("docker_pull_jobs_coalesced_total")
+                return job, True
+            self.seq += 1
+            job = PullJob(self.seq, key, registry, (registry, repository, tag, arch, output_dir, proxy_args))
+            self.jobs[key] = job
+            self.queues.setdefault(registry, []).append(job)
+            self._dispatch()
+            return job, False
+
+    def position(self, job: PullJob) -> int:
+        with self.lock:
+            return sum(1 for q in self.queues.values() for j in q if j.seq < job.seq)
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self.queues:
+            registry, queue = self.queues.popitem(last=False)
+            job = queue.pop(0)
+            if queue:
+                self.queues[registry] = queue
+            job.state = "running"
+            self.running += 1
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        metrics.set("docker_pull_jobs_queued", sum(len(q) for q in self.queues.values()))
+
+    def _run(self, job: PullJob):
+        try:
+            run_pull_job(job.progress, *job.args)
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.jobs.pop(job.key, None)
+                job.state = "finished"
+                job.finished.set()
+                self._dispatch()
+
+
+job_scheduler = JobScheduler()
+
+
 def fn_download_manager(repo, tag, arch, registry, out_dir, p_mode, p_host, p_user, p_pass, vSSL):
     if not repo:
-        yield '<div style="color:red;font-weight:bold;">❌ 请先在上方搜索并在表格中点击选择一个镜像！</div>', gr.skip(), gr.skip()
+        yield '<div style="color:red;font-weight:bold;">❌ 请先在上方搜索并在表格中点击选择一个镜像！</div>', gr.skip()
         return
 
-    yield '<div style="color:#666;font-family:monospace;padding:10px;">🕒 初始化下载任务中，请稍候...</div>', gr.skip(), gr.skip()
+    yield '<div style="color:#666;font-family:monospace;padding:10px;">🕒 初始化下载任务中，请稍候...</div>', gr.skip()
 
     reg_map = {
         "Docker 官方 (registry-1.docker.io)": "registry-1.docker.io",
@@ -502,23 +1388,54 @@ def fn_download_manager(repo, tag, arch, registry, out_dir, p_mode, p_host, p_us
     actual_registry = reg_map.get(registry, "docker.1ms.run")
     proxy_args = (p_mode, p_host, p_user, p_pass, vSSL)
 
-    progress = WebProgressDisplay()
-
-    t = threading.Thread(target=pull_image_logic,
-                         args=(progress, actual_registry, repo, tag, arch, out_dir, proxy_args))
-    t.start()
-
-    while t.is_alive():
-        time.sleep(0.5)
-        yield progress.get_html_content(), gr.skip(), gr.skip()
-
-    files, drop_update = get_downloaded_tars(out_dir)
-    yield progress.get_html_content(), files, drop_update
+    job, attached = job_scheduler.submit(actual_registry, repo, tag, arch, out_dir, proxy_args)
+    if attached:
+        gr.Info("相同镜像正在下载中，已加入该任务并共享进度与结果文件")
+    progress = job.progress
+
+    # 层列表变化时整体渲染一次 HTML，之后只推送有变化的层，由前端 JS 就地更新
+    rendered_names = None
+    seen_version = 0
+    while not job.finished.wait(0.5):
+        if job.state == "queued":
+            yield f'<div style="color:#666;font-family:monospace;padding:10px;">🕒 排队中，前面还有 {job_scheduler.position(job)} 个任务...</div>', gr.skip()
+            continue
+        names = progress.layer_names()
+        if names != rendered_names:
+            rendered_names = names
+            seen_version = progress.version
+            yield progress.get_html_content(), gr.skip()
+            continue
+        seen_version, changes = progress.changes_since(seen_version)
+        yield gr.skip(), changes if changes["layers"] else gr.skip()
+
+    yield progress.get_html_content(), gr.skip()
 
 
 # --------------------------
 # Gradio 界面设计
 # --------------------------
+PROGRESS_PATCH_JS = """
+(state) => {
+    const root = document.querySelector('#dp-log');
+    if (!root || !state || !state.layers) return [];
+    for (const layer of state.layers) {
+        const row = root.querySelector(`.dp-row[data-layer="${CSS.escape(layer.name)}"]`);
+        if (!row) continue;
+        const bar = row.querySelector('.dp-bar');
+        bar.style.width = layer.pct + '%';
+        bar.style.backgroundColor = layer.bar;
+        row.querySelector('.dp-label').style.color = layer.color;
+        row.querySelector('.dp-icon').textContent = layer.icon;
+        row.querySelector('.dp-pct').textContent = layer.pct.toFixed(1) + '%';
+        row.querySelector('.dp-size').textContent = layer.size;
+    }
+    const speed = root.querySelector('.dp-speed');
+    if (speed) speed.textContent = state.speed;
+    return [];
+}
+"""
+
 with gr.Blocks(
         title="Docker 镜像离线下载工具",
         theme=gr.themes.Soft(primary_hue="blue")
@@ -591,14 +1508,31 @@ with gr.Blocks(
 
             gr.Markdown("#### 运行日志 & 进度")
             log_box = gr.HTML(
-                value="<div style='color:#999; font-size:14px; text-align:center; padding: 20px; border: 1px dashed #ccc; border-radius: 8px;'>等待开始...</div>"
+                value="<div style='color:#999; font-size:14px; text-align:center; padding: 20px; border: 1px dashed #ccc; border-radius: 8px;'>等待开始...</div>",
+                elem_id="dp-log"
             )
+            progress_state = gr.JSON(visible="hidden")
 
     gr.Markdown("---\n### 📁 步骤 3：本地镜像包管理 (.tar)")
+    catalog_page_state = gr.State(1)
+    with gr.Row():
+        catalog_kw_ui = gr.Textbox(label="筛选镜像包", placeholder="按文件名、镜像名、tag 或 digest 搜索，回车确认",
+                                   show_label=False, scale=4)
+        catalog_arch_ui = gr.Dropdown(choices=["全部", "amd64", "arm64", "arm/v7", "s390x", "ppc64le"], value="全部",
+                                      show_label=False, scale=1)
+    catalog_df = gr.Dataframe(
+        headers=["文件", "镜像", "架构", "大小", "Manifest Digest", "层数", "时间", "直链 (支持断点续传)"],
+        datatype=["str", "str", "str", "str", "str", "str", "str", "markdown"],
+        interactive=False, wrap=True, type="array", max_height=400
+    )
+    with gr.Row():
+        catalog_prev_btn = gr.Button("◀ 上一页", interactive=False, size="sm")
+        catalog_page_info_ui = gr.HTML()
+        catalog_next_btn = gr.Button("下一页 ▶", interactive=False, size="sm")
     with gr.Row():
         with gr.Column(scale=3):
             file_list_ui = gr.File(
-                label="📦 已下载的镜像 (在浏览器中点击文件名即可直接下载至当前设备)",
+                label="📦 当前页的镜像 (在浏览器中点击文件名即可直接下载至当前设备)",
                 file_count="multiple",
                 interactive=False
             )
@@ -676,30 +1610,59 @@ with gr.Blocks(
         outputs=[selected_repo_ui, tag_ui]
     )
 
+    # 文件管理器事件绑定
+    catalog_outputs = [file_list_ui, delete_dropdown, catalog_df, catalog_page_info_ui, catalog_page_state,
+                       catalog_prev_btn, catalog_next_btn]
+
+
+    def on_catalog_first_page(out_dir, keyword, arch_filter, request: gr.Request):
+        return fn_catalog_page(out_dir, keyword, arch_filter, 1, request_host(request))
+
+
+    def on_catalog_prev_page(out_dir, keyword, arch_filter, page, request: gr.Request):
+        return fn_catalog_page(out_dir, keyword, arch_filter, page - 1, request_host(request))
+
+
+    def on_catalog_next_page(out_dir, keyword, arch_filter, page, request: gr.Request):
+        return fn_catalog_page(out_dir, keyword, arch_filter, page + 1, request_host(request))
+
+
+    catalog_inputs = [out_dir_ui, catalog_kw_ui, catalog_arch_ui]
     dl_btn.click(
         fn=fn_download_manager,
         inputs=[
             selected_repo_ui, tag_ui, arch_ui, registry_ui, out_dir_ui,
             proxy_mode_ui, proxy_host_ui, proxy_user_ui, proxy_pass_ui, ssl_ui
         ],
-        outputs=[log_box, file_list_ui, delete_dropdown]  # 同步刷新文件面板
-    )
-
-    # 文件管理器事件绑定
-    demo.load(
-        fn=get_downloaded_tars, inputs=[out_dir_ui], outputs=[file_list_ui, delete_dropdown]
-    )
-    refresh_btn.click(
-        fn=get_downloaded_tars, inputs=[out_dir_ui], outputs=[file_list_ui, delete_dropdown]
-    )
+        outputs=[log_box, progress_state],
+        concurrency_limit=None  # 实际并发由 job_scheduler 控制，排队中的用户也能看到位置
+    ).then(fn=on_catalog_first_page, inputs=catalog_inputs, outputs=catalog_outputs)  # 同步刷新文件面板
+    progress_state.change(fn=None, inputs=[progress_state], js=PROGRESS_PATCH_JS)
+
+    demo.load(fn=on_catalog_first_page, inputs=catalog_inputs, outputs=catalog_outputs)
+    refresh_btn.click(fn=on_catalog_first_page, inputs=catalog_inputs, outputs=catalog_outputs)
+    catalog_kw_ui.submit(fn=on_catalog_first_page, inputs=catalog_inputs, outputs=catalog_outputs)
+    catalog_arch_ui.change(fn=on_catalog_first_page, inputs=catalog_inputs, outputs=catalog_outputs)
+    catalog_prev_btn.click(fn=on_catalog_prev_page, inputs=catalog_inputs + [catalog_page_state],
+                           outputs=catalog_outputs)
+    catalog_next_btn.click(fn=on_catalog_next_page, inputs=catalog_inputs + [catalog_page_state],
+                           outputs=catalog_outputs)
     delete_btn.click(
-        fn=delete_local_tar, inputs=[delete_dropdown, out_dir_ui], outputs=[file_list_ui, delete_dropdown]
+        fn=delete_local_tar, inputs=[delete_dropdown] + catalog_inputs + [catalog_page_state], outputs=catalog_outputs
     )
 
     demo.queue(default_concurrency_limit=4)
 
 if __name__ == "__main__":
     print(f"🚀 服务启动中...\n💡 请在浏览器访问下方 URL 打开 UI 界面。")
+    if os.environ.get(METRICS_PORT_ENV):
+        start_metrics_server(int(os.environ[METRICS_PORT_ENV]))
+        print(f"📈 Prometheus 指标: http://0.0.0.0:{os.environ[METRICS_PORT_ENV]}/metrics")
+    try:
+        start_archive_server(int(os.environ.get(ARCHIVE_PORT_ENV) or ARCHIVE_PORT))
+        print(f"📦 镜像包直链下载: http://0.0.0.0:{archive_server.server_address[1]}/archives/")
+    except OSError as e:
+        print(f"⚠️ 镜像包直链服务启动失败（{e}），仅可通过页面文件列表下载")
     demo.launch(
         server_name="0.0.0.0",
         server_port=7860,
@@ -0,0 +1,247 @@
+"""
+拉取流程本地阶段的微基准
+
+只测本机 CPU / 磁盘相关的阶段，不涉及网络，用于判断在当前硬件上哪一步是瓶颈：
+- sha256     : update_hash_from_file，按块读取并计算摘要
+- merge      : merge_chunk_files，合并分片并同时计算 sha256（与分片下载路径一致）
+- decompress : decompress_layer，gzip / zstd 层解压为 layer.tar
+- tar        : create_image_tar，打包为 docker load 可用的镜像包（可选 gzip / zstd 压缩输出）
+
+夹具由 fake_registry.generate_layer 生成并缓存，结果为热缓存下的吞吐。
+
+示例：
+  python bench/bench_phases.py --size 1G
+  python bench/bench_phases.py --phases sha256,merge --block-sizes 64K,1M --json phases.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(ROOT))
+from fake_registry import generate_layer  # noqa: E402
+from bench_pull import parse_size  # noqa: E402
+
+import docker_image_puller as puller  # noqa: E402
+
+ALL_PHASES = ("sha256", "merge", "decompress", "tar")
+
+
+def _zstd_available() -> bool:
+    try:
+        from compression import zstd  # noqa: F401
+        return True
+    except ImportError:
+        pass
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _link_or_copy(src, dst):
+    # 硬链接避免每轮复制夹具；create_image_tar 结束时只会删除链接
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _link_tree(src: Path, dst: Path):
+    shutil.copytree(src, dst, copy_function=_link_or_copy)
+
+
+def measure(name: str, nbytes: int, repeat: int, run: Callable[[Path], None],
+            prepare: Callable[[Path], None] = None, **extra) -> Dict[str, Any]:
+    durations = []
+    for _ in range(repeat):
+        workdir = Path(tempfile.mkdtemp(prefix="bench-phase-"))
+        try:
+            if prepare:
+                prepare(workdir)
+            start = time.perf_counter()
+            run(workdir)
+            durations.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    best = min(durations)
+    median = statistics.median(durations)
+    mb = nbytes / 1024 / 1024
+    result = {
+        "phase": name,
+        "bytes": nbytes,
+        "best_s": round(best, 4),
+        "median_s": round(median, 4),
+        "best_mb_s": round(mb / best, 2) if best > 0 else 0.0,
+        "median_mb_s": round(mb / median, 2) if median > 0 else 0.0,
+    }
+    result.update(extra)
+    return result
+
+
+def bench_sha256(fixture: Path, block_sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    size = fixture.stat().st_size
+    return [
+        measure(f"sha256[{block_size // 1024}K]", size, repeat,
+                lambda _, bs=block_size: puller.update_hash_from_file(hashlib.sha256(), str(fixture), bs),
+                block_size=block_size)
+        for block_size in block_sizes
+    ]
+
+
+def bench_merge(fixture: Path, chunk_size: int, block_sizes: List[int], repeat: int) -> List[Dict[str, Any]]:
+    size = fixture.stat().st_size
+    chunk_dir = Path(tempfile.mkdtemp(prefix="bench-chunks-"))
+    chunk_paths = []
+    try:
+        with open(fixture, "rb") as src:
+            index = 0
+            while True:
+                data = src.read(chunk_size)
+                if not data:
+                    break
+                path = chunk_dir / f"chunk_{index:04d}"
+                path.write_bytes(data)
+                chunk_paths.append(str(path))
+                index += 1
+
+        return [
+            measure(f"merge[{block_size // 1024}K]", size, repeat,
+                    lambda workdir, bs=block_size: puller.merge_chunk_files(
+                        chunk_paths, str(workdir / "layer_gzip.tar"), hashlib.sha256(), bs),
+                    block_size=block_size, chunks=len(chunk_paths))
+            for block_size in block_sizes
+        ]
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+
+def bench_decompress(cache_dir: Path, size: int, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for compression in ("gzip", "zstd"):
+        if compression == "zstd" and not _zstd_available():
+            print("⚠️  未安装 zstd 支持，跳过 zstd 解压")
+            continue
+        blob = generate_layer(cache_dir, size, seed=1, compression=compression)
+
+        def prepare(workdir: Path, path=blob.path):
+            shutil.copyfile(path, workdir / "layer_gzip.tar")
+
+        def run(workdir: Path):
+            puller.decompress_layer(str(workdir / "layer_gzip.tar"), str(workdir / "layer.tar"))
+
+        # 吞吐按解压后的字节数计算
+        result = measure(f"decompress[{compression}]", size, repeat, run, prepare, compressed_bytes=blob.size)
+        results.append(result)
+    return results
+
+
+def bench_tar(cache_dir: Path, size: int, layers: int, compress_modes: List[str], repeat: int) -> List[Dict[str, Any]]:
+    fixture_dir = Path(tempfile.mkdtemp(prefix="bench-imgdir-"))
+    try:
+        layer_size = max(size // layers, 1)
+        total = 0
+        for i in range(layers):
+            blob = generate_layer(cache_dir, layer_size, seed=100 + i, compression="none")
+            layer_dir = fixture_dir / hashlib.sha256(str(i).encode()).hexdigest()
+            layer_dir.mkdir()
+            _link_or_copy(blob.path, layer_dir / "layer.tar")
+            total += blob.size
+        (fixture_dir / "manifest.json").write_text("[]")
+
+        results = []
+        for compress in compress_modes:
+            mode = None if compress == "none" else compress
+            if mode == "zstd" and not _zstd_available():
+                print("⚠️  未安装 zstd 支持，跳过 zstd 打包")
+                continue
+
+            def prepare(workdir: Path):
+                _link_tree(fixture_dir, workdir / "imgdir")
+
+            def run(workdir: Path, mode=mode):
+                puller.create_image_tar(str(workdir / "imgdir"), "bench/app", "latest", "amd64", workdir, compress=mode)
+
+            results.append(measure(f"tar[{compress}]", total, repeat, run, prepare, layers=layers))
+        return results
+    finally:
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+
+def print_table(results: List[Dict[str, Any]]):
+    print(f"{'阶段':<20}{'数据量(MB)':>12}{'最佳(s)':>10}{'中位(s)':>10}{'最佳 MB/s':>12}{'中位 MB/s':>12}")
+    for r in results:
+        print(f"{r['phase']:<20}{r['bytes'] / 1024 / 1024:>12.1f}{r['best_s']:>10.3f}{r['median_s']:>10.3f}"
+              f"{r['best_mb_s']:>12.1f}{r['median_mb_s']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="拉取流程本地阶段微基准（哈希 / 合并 / 解压 / 打包）")
+    parser.add_argument("--phases", default=",".join(ALL_PHASES), help="要测试的阶段，逗号分隔：sha256,merge,decompress,tar")
+    parser.add_argument("--size", type=parse_size, default=parse_size("256M"), help="夹具大小（未压缩），默认 256M")
+    parser.add_argument("--block-sizes", default="64K", help="sha256 / merge 的读块大小列表，默认 64K（与下载路径一致）")
+    parser.add_argument("--chunk-size", type=parse_size, default=parse_size("10M"), help="merge 阶段的分片大小，默认 10M")
+    parser.add_argument("--layers", type=int, default=4, help="tar 阶段的层数，总大小为 --size")
+    parser.add_argument("--tar-compress", default="none", help="tar 阶段的输出格式列表：none,gzip,zstd")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数")
+    parser.add_argument("--cache-dir", help="夹具缓存目录，默认 ~/.cache/docker-pull-bench")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    puller.logger.setLevel(logging.WARNING)
+    cache_dir = Path(args.cache_dir) if args.cache_dir else Path.home() / ".cache" / "docker-pull-bench"
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    unknown = set(phases) - set(ALL_PHASES)
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(sorted(unknown))}")
+    block_sizes = [parse_size(s) for s in args.block_sizes.split(",") if s.strip()]
+
+    print(f"🧪 生成/加载夹具: {args.size / 1024 / 1024:.0f}MB")
+    fixture = generate_layer(cache_dir, args.size, seed=0, compression="none").path
+
+    results: List[Dict[str, Any]] = []
+    for phase in phases:
+        print(f"⏱️  {phase} ...", flush=True)
+        if phase == "sha256":
+            results += bench_sha256(fixture, block_sizes, args.repeat)
+        elif phase == "merge":
+            results += bench_merge(fixture, args.chunk_size, block_sizes, args.repeat)
+        elif phase == "decompress":
+            results += bench_decompress(cache_dir, args.size, args.repeat)
+        elif phase == "tar":
+            modes = [m.strip() for m in args.tar_compress.split(",") if m.strip()]
+            results += bench_tar(cache_dir, args.size, args.layers, modes, args.repeat)
+
+    print()
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "host": {
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpus": os.cpu_count(),
+                },
+                "config": vars(args),
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+端到端拉取性能基准
+
+在进程内启动 FakeRegistry，分别以子进程方式跑三条拉取路径并统计
+墙钟时间、吞吐量与 CPU 时间（user/sys）：
+- cli  : docker_image_puller.py
+- 1ms  : docker_image_puller_1ms.py（搜索 API 也由 FakeRegistry 提供）
+- web  : app.py 的 pull_image_logic（需要安装 gradio）
+
+示例：
+  python bench/bench_pull.py --layers 64M,256M,1G --bandwidth 50M --latency 0.02
+  python bench/bench_pull.py --paths cli --error-rate 0.05 --redirect --json result.json
+  python bench/bench_pull.py --paths cli --layers 256M --bandwidth 20M --straggler-rate 0.1
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_registry import FakeRegistry, RegistryConfig  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_REPOSITORY = "bench/app"
+BENCH_TAG = "latest"
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+WORKER_RESULT_PREFIX = "BENCH_RESULT "
+
+
+def parse_size(text: str) -> int:
+    value = text.strip().upper().rstrip("B")
+    unit = value[-1] if value and value[-1] in SIZE_UNITS else ""
+    return int(float(value[:-1] if unit else value) * SIZE_UNITS[unit])
+
+
+def _children_cpu() -> Optional[Dict[str, float]]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {"user": usage.ru_utime, "sys": usage.ru_stime}
+
+
+def _find_archives(directory: Path) -> List[Path]:
+    candidates = list(directory.glob("*.tar*")) + list(directory.glob("*/*.tar*"))
+    return [p for p in candidates if p.is_file() and not p.name.endswith(".json")]
+
+
+def build_command(path: str, registry: FakeRegistry, workdir: Path, workers: int) -> List[str]:
+    if path == "cli":
+        return [
+            sys.executable, str(ROOT / "docker_image_puller.py"),
+            "-i", f"{registry.host}/{BENCH_REPOSITORY}:{BENCH_TAG}",
+            "-q", "--plain-http", "-o", str(workdir), "--workers", str(workers),
+        ]
+    if path == "1ms":
+        return [
+            sys.executable, str(ROOT / "docker_image_puller_1ms.py"),
+            "-k", BENCH_REPOSITORY.split("/")[-1], "--select-index", "1",
+            "--api", registry.api_base, "--registry", registry.host,
+            "-t", BENCH_TAG, "--plain-http",
+        ]
+    if path == "web":
+        return [
+            sys.executable, str(Path(__file__).resolve()), "--web-worker",
+            "--registry-host", registry.host, "--output", str(workdir),
+        ]
+    raise ValueError(f"未知路径: {path}")
+
+
+def run_once(path: str, registry: FakeRegistry, workers: int, keep: bool, timeout: float) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-{path}-"))
+    registry.reset_stats()
+    cpu_before = _children_cpu()
+    start = time.perf_counter()
+    proc = subprocess.run(
+        build_command(path, registry, workdir, workers),
+        cwd=workdir, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout,
+    )
+    wall = time.perf_counter() - start
+    cpu_after = _children_cpu()
+
+    # web 路径的子进程要先导入 gradio，这部分时间不计入拉取耗时
+    process_wall = wall
+    for line in proc.stdout.decode("utf-8", "replace").splitlines():
+        if line.startswith(WORKER_RESULT_PREFIX):
+            wall = json.loads(line[len(WORKER_RESULT_PREFIX):])["pull_s"]
+
+    archives = _find_archives(workdir)
+    total_bytes = sum(blob.size for blob in registry.blobs.values() if blob.path)
+    result: Dict[str, Any] = {
+        "path": path,
+        "ok": proc.returncode == 0 and bool(archives),
+        "wall_s": round(wall, 3),
+        "process_wall_s": round(process_wall, 3),
+        "bytes": total_bytes,
+        "throughput_mb_s": round(total_bytes / wall / 1024 / 1024, 2) if wall > 0 else 0.0,
+        "registry": registry.stats.to_dict(),
+    }
+    if cpu_before and cpu_after:
+        result["cpu_user_s"] = round(cpu_after["user"] - cpu_before["user"], 3)
+        result["cpu_sys_s"] = round(cpu_after["sys"] - cpu_before["sys"], 3)
+    if not result["ok"]:
+        result["stderr_tail"] = proc.stderr.decode("utf-8", "replace")[-2000:]
+    if not keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def web_worker(registry_host: str, output: str) -> int:
+    sys.path.insert(0, str(ROOT))
+    import app
+
+    app.REGISTRY_SCHEME = "http"
+    progress = app.WebProgressDisplay()
+    start = time.perf_counter()
+    app.pull_image_logic(progress, registry_host, BENCH_REPOSITORY, BENCH_TAG, "amd64", output,
+                         ("无代理", "", "", "", False))
+    print(WORKER_RESULT_PREFIX + json.dumps({"pull_s": time.perf_counter() - start}), flush=True)
+    if progress.error_msg:
+        print(progress.error_msg, file=sys.stderr)
+        return 1
+    return 0
+
+
+def print_table(results: List[Dict[str, Any]]):
+    print(f"{'路径':<6}{'成功':<6}{'耗时(s)':>10}{'吞吐(MB/s)':>12}{'CPU user':>10}{'CPU sys':>10}{'请求数':>8}{'重试注入':>10}")
+    for r in results:
+        injected = r["registry"]["injected_errors"] + r["registry"]["dropped_connections"]
+        print(
+            f"{r['path']:<6}{'✅' if r['ok'] else '❌':<6}{r['wall_s']:>10.2f}{r['throughput_mb_s']:>12.2f}"
+            f"{r.get('cpu_user_s', float('nan')):>10.2f}{r.get('cpu_sys_s', float('nan')):>10.2f}"
+            f"{r['registry']['requests']:>8}{injected:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端拉取性能基准（本地 FakeRegistry）")
+    parser.add_argument("--paths", default="cli,1ms,web", help="要测试的拉取路径，逗号分隔：cli,1ms,web")
+    parser.add_argument("--layers", default="8M,64M,256M", help="合成层大小列表，例如 64M,1G,4G")
+    parser.add_argument("--layer-compression", choices=["gzip", "zstd", "none"], default="gzip", help="合成层压缩格式")
+    parser.add_argument("--archs", default="amd64", help="架构列表，多个时以 manifest list 提供")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟（秒）")
+    parser.add_argument("--bandwidth", type=parse_size, default=0, help="单连接带宽上限（每秒字节数，例如 20M）")
+    parser.add_argument("--total-bandwidth", type=parse_size, default=0, help="总带宽上限（每秒字节数）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="blob 请求返回 503 的概率")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="blob 传输中途断开连接的概率")
+    parser.add_argument("--straggler-rate", type=float, default=0.0, help="blob 请求成为慢请求的概率（模拟拖尾分片）")
+    parser.add_argument("--straggler-bandwidth", type=parse_size, default=parse_size("256K"), help="慢请求的带宽（每秒字节数）")
+    parser.add_argument("--redirect", action="store_true", help="blob 请求 307 重定向到 CDN 路径")
+    parser.add_argument("--no-auth", action="store_true", help="关闭 token 认证")
+    parser.add_argument("--workers", type=int, default=4, help="传给 CLI 的 --workers")
+    parser.add_argument("--repeat", type=int, default=1, help="每条路径重复次数")
+    parser.add_argument("--timeout", type=float, default=3600, help="单次拉取超时（秒）")
+    parser.add_argument("--cache-dir", help="合成层缓存目录，默认 ~/.cache/docker-pull-bench")
+    parser.add_argument("--keep", action="store_true", help="保留每次拉取的输出目录")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    parser.add_argument("--web-worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--registry-host", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.web_worker:
+        sys.exit(web_worker(args.registry_host, args.output))
+
+    config = RegistryConfig(
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        total_bandwidth=args.total_bandwidth,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        straggler_rate=args.straggler_rate,
+        straggler_bandwidth=args.straggler_bandwidth,
+        redirect=args.redirect,
+        auth=not args.no_auth,
+    )
+    registry = FakeRegistry(config, cache_dir=Path(args.cache_dir) if args.cache_dir else None)
+    layer_sizes = [parse_size(s) for s in args.layers.split(",") if s.strip()]
+    print(f"🧪 生成/加载合成层: {args.layers} ({args.layer_compression})")
+    registry.add_image(BENCH_REPOSITORY, BENCH_TAG, layer_sizes,
+                       archs=tuple(a.strip() for a in args.archs.split(",") if a.strip()),
+                       compression=args.layer_compression)
+
+    results = []
+    with registry:
+        print(f"🚀 FakeRegistry: http://{registry.host}")
+        for path in [p.strip() for p in args.paths.split(",") if p.strip()]:
+            for _ in range(args.repeat):
+                print(f"⏱️  {path} ...", flush=True)
+                results.append(run_once(path, registry, args.workers, args.keep, args.timeout))
+
+    print()
+    print_table(results)
+    for r in results:
+        if not r["ok"]:
+            print(f"\n❌ {r['path']} 失败:\n{r.get('stderr_tail', '')}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if k not in ("web_worker", "registry_host", "output")},
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
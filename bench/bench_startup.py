@@ -0,0 +1,146 @@
+"""
+启动耗时基准
+
+以子进程方式反复运行各脚本的轻量命令，统计冷启动墙钟时间，
+并用 python -X importtime 给出模块导入耗时最高的依赖：
+- cli  : docker_image_puller.py --version / --help
+- 1ms  : docker_image_puller_1ms.py --help
+- web  : 仅统计 import app 的耗时（需要安装 gradio）
+
+被其它程序循环调用、或打包成单文件可执行程序时，启动耗时会直接叠加到每次调用上。
+
+示例：
+  python bench/bench_startup.py
+  python bench/bench_startup.py --paths cli --repeat 20 --top 15 --json startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = {
+    "cli": "docker_image_puller.py",
+    "1ms": "docker_image_puller_1ms.py",
+    "web": "app.py",
+}
+COMMANDS = {
+    "cli": ("--version", "--help"),
+    "1ms": ("--help",),
+    "web": (),
+}
+
+
+def time_command(cmd: List[str], repeat: int) -> Dict[str, Any]:
+    durations = []
+    ok = True
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=ROOT, stdin=subprocess.DEVNULL, capture_output=True)
+        durations.append(time.perf_counter() - start)
+        ok = ok and proc.returncode == 0
+    return {
+        "ok": ok,
+        "best_ms": round(min(durations) * 1000, 1),
+        "median_ms": round(statistics.median(durations) * 1000, 1),
+    }
+
+
+def _importtime_lines(module: str) -> List[str]:
+    # importtime 输出格式：import time: self [us] | cumulative | imported package
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+    )
+    return [l for l in proc.stderr.splitlines() if l.startswith("import time:") and "self [us]" not in l]
+
+
+def import_profile(module: str, top: int) -> Tuple[float, List[Tuple[str, float]]]:
+    # 返回模块总导入耗时，以及它直接导入的依赖（缩进一级）中最慢的几个
+    lines = _importtime_lines(module)
+    try:
+        end = next(i for i, l in enumerate(lines) if l.split("|")[2] == f" {module}")
+    except StopIteration:
+        return 0.0, []
+    total_ms = int(lines[end].split("|")[1]) / 1000
+    begin = end
+    while begin > 0 and lines[begin - 1].split("|")[2].startswith("   "):
+        begin -= 1
+    deps = []
+    for line in lines[begin:end]:
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("   ") and not name.startswith("     "):
+            deps.append((name.strip(), int(cumulative) / 1000))
+    deps.sort(key=lambda e: e[1], reverse=True)
+    return total_ms, deps[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="脚本启动耗时基准（--version / --help / import）")
+    parser.add_argument("--paths", default="cli,1ms", help="要测试的脚本，逗号分隔：cli,1ms,web")
+    parser.add_argument("--repeat", type=int, default=10, help="每条命令重复次数")
+    parser.add_argument("--top", type=int, default=10, help="列出导入耗时最高的依赖个数")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    unknown = set(paths) - set(SCRIPTS)
+    if unknown:
+        parser.error(f"未知路径: {', '.join(sorted(unknown))}")
+
+    print("⏱️  python 解释器基线 ...", flush=True)
+    baseline = time_command([sys.executable, "-c", "pass"], args.repeat)
+
+    results = []
+    for path in paths:
+        script = SCRIPTS[path]
+        module = script[:-3]
+        print(f"⏱️  {path} ...", flush=True)
+        for flag in COMMANDS[path]:
+            result = time_command([sys.executable, script, flag], args.repeat)
+            results.append({"path": path, "command": f"{script} {flag}", **result})
+        result = time_command([sys.executable, "-c", f"import {module}"], args.repeat)
+        import_ms, dependencies = import_profile(module, args.top)
+        results.append({
+            "path": path,
+            "command": f"import {module}",
+            "import_ms": round(import_ms, 1),
+            "dependencies": dependencies,
+            **result,
+        })
+
+    print()
+    print(f"解释器基线: 最佳 {baseline['best_ms']:.1f}ms / 中位 {baseline['median_ms']:.1f}ms")
+    print(f"{'命令':<42}{'成功':<6}{'最佳(ms)':>10}{'中位(ms)':>10}")
+    for r in results:
+        print(f"{r['command']:<42}{'✅' if r['ok'] else '❌':<6}{r['best_ms']:>10.1f}{r['median_ms']:>10.1f}")
+
+    for r in results:
+        if r.get("dependencies"):
+            print(f"\n📦 {r['command']}（importtime {r['import_ms']:.1f}ms）直接依赖耗时:")
+            for name, ms in r["dependencies"]:
+                print(f"  {name:<36}{ms:>8.1f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "host": {
+                    "platform": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpus": os.cpu_count(),
+                },
+                "config": vars(args),
+                "baseline": baseline,
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
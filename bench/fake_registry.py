@@ -0,0 +1,481 @@
+"""
+进程内 Docker Registry 替身（仅用于性能基准）
+
+实现拉取流程用到的全部接口：
+- /v2/ 探测 + Bearer token 认证（/token）
+- manifest / manifest list 的 GET、HEAD
+- blob 的 GET、HEAD、Range，以及 307 重定向到“CDN”路径（/_blobs/）
+- 1ms 搜索 API 的最小子集（/api/search、/api/get_detail、/api/get_tags）
+
+可配置每请求延迟、单连接/总带宽上限、错误注入（5xx、连接中断），
+层数据为按大小和种子生成的合成 tar 层，缓存在磁盘上重复使用。
+"""
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import tarfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+MEDIA_MANIFEST = "application/vnd.docker.distribution.manifest.v2+json"
+MEDIA_MANIFEST_LIST = "application/vnd.docker.distribution.manifest.list.v2+json"
+MEDIA_CONFIG = "application/vnd.docker.container.image.v1+json"
+LAYER_MEDIA_TYPES = {
+    "gzip": "application/vnd.docker.image.rootfs.diff.tar.gzip",
+    "zstd": "application/vnd.oci.image.layer.v1.tar+zstd",
+    "none": "application/vnd.oci.image.layer.v1.tar",
+}
+SEND_CHUNK = 64 * 1024
+GENERATE_CHUNK = 4 * 1024 * 1024
+TOKEN = "fake-registry-token"
+
+
+@dataclass
+class RegistryConfig:
+    latency: float = 0.0  # 每个请求的额外延迟（秒）
+    bandwidth: int = 0  # 单连接带宽上限（B/s），0 表示不限
+    total_bandwidth: int = 0  # 所有连接合计带宽上限（B/s），0 表示不限
+    error_rate: float = 0.0  # blob GET 返回 503 的概率
+    drop_rate: float = 0.0  # blob GET 传输一半后断开连接的概率
+    straggler_rate: float = 0.0  # blob GET 成为慢请求（限速为 straggler_bandwidth）的概率
+    straggler_bandwidth: int = 256 * 1024  # 慢请求的带宽（B/s）
+    redirect: bool = False  # blob GET 是否 307 重定向到 /_blobs/
+    auth: bool = True  # 是否要求 Bearer token
+    seed: int = 0
+
+
+@dataclass
+class Blob:
+    digest: str
+    size: int
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+    diff_id: str = ""
+
+
+@dataclass
+class RegistryStats:
+    requests: int = 0
+    token_requests: int = 0
+    manifest_requests: int = 0
+    blob_requests: int = 0
+    range_requests: int = 0
+    redirects: int = 0
+    injected_errors: int = 0
+    dropped_connections: int = 0
+    stragglers: int = 0
+    bytes_sent: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **kwargs):
+        with self.lock:
+            for key, value in kwargs.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {k: v for k, v in self.__dict__.items() if k != "lock"}
+
+
+class _RandomReader:
+    def __init__(self, size: int, seed: int):
+        self.remaining = size
+        self.rng = random.Random(seed)
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0 or n > self.remaining:
+            n = self.remaining
+        n = min(n, GENERATE_CHUNK)
+        self.remaining -= n
+        return self.rng.randbytes(n)
+
+
+class _HashingWriter:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        self.position += len(data)
+        if self.fileobj is not None:
+            self.fileobj.write(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+
+def generate_layer(cache_dir: Path, size: int, seed: int, compression: str = "gzip") -> Blob:
+    """生成（或复用缓存的）合成层：单个随机内容文件的 tar 包，按指定方式压缩。"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    blob_path = cache_dir / f"layer-{compression}-{size}-{seed}.blob"
+    meta_path = blob_path.with_suffix(".json")
+    if blob_path.exists() and meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        return Blob(meta["digest"], meta["size"], path=blob_path, diff_id=meta["diff_id"])
+
+    # 多个基准进程可能同时生成同一层，临时文件名带上 pid 避免互相覆盖/抢先 rename
+    tmp_path = blob_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as raw:
+        compressed = _HashingWriter(raw)
+        if compression == "gzip":
+            sink = gzip.GzipFile(fileobj=compressed, mode="wb", compresslevel=1, mtime=0)
+        elif compression == "zstd":
+            try:
+                from compression import zstd
+
+                sink = zstd.ZstdFile(compressed, mode="wb", level=1)
+            except ImportError:
+                import zstandard
+
+                sink = zstandard.ZstdCompressor(level=1).stream_writer(compressed, closefd=False)
+        else:
+            sink = None
+        uncompressed = _HashingWriter(sink if sink is not None else compressed)
+        with tarfile.open(fileobj=uncompressed, mode="w") as tar:
+            info = tarfile.TarInfo(f"data/{seed}.bin")
+            info.size = size
+            info.mtime = 0
+            tar.addfile(info, _RandomReader(size, seed))
+        if sink is not None:
+            sink.close()
+
+    meta = {
+        "digest": f"sha256:{compressed.sha256.hexdigest()}",
+        "size": compressed.position,
+        "diff_id": f"sha256:{uncompressed.sha256.hexdigest()}",
+    }
+    os.replace(tmp_path, blob_path)
+    tmp_meta = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_meta.write_text(json.dumps(meta))
+    os.replace(tmp_meta, meta_path)
+    return Blob(meta["digest"], meta["size"], path=blob_path, diff_id=meta["diff_id"])
+
+
+def _json_blob(obj: Any) -> Blob:
+    data = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    return Blob(f"sha256:{hashlib.sha256(data).hexdigest()}", len(data), data=data)
+
+
+class FakeRegistry:
+    def __init__(self, config: Optional[RegistryConfig] = None, cache_dir: Optional[Path] = None, port: int = 0):
+        self.config = config or RegistryConfig()
+        self.cache_dir = Path(cache_dir or Path.home() / ".cache" / "docker-pull-bench")
+        self.port = port
+        self.stats = RegistryStats()
+        self.blobs: Dict[str, Blob] = {}
+        self.manifests: Dict[Tuple[str, str], Tuple[str, bytes]] = {}
+        self.repositories: Dict[str, Dict[str, Any]] = {}
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._bucket_lock = threading.Lock()
+        self._bucket_time = 0.0
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    @property
+    def api_base(self) -> str:
+        return f"http://{self.host}/api"
+
+    def add_image(
+        self,
+        repository: str,
+        tag: str,
+        layer_sizes: List[int],
+        archs: Tuple[str, ...] = ("amd64",),
+        compression: str = "gzip",
+    ):
+        """注册一个镜像；archs 多于一个时以 manifest list 形式提供，各架构共用同一组层。"""
+        layers = [generate_layer(self.cache_dir, size, seed, compression) for seed, size in enumerate(layer_sizes, start=1)]
+        for blob in layers:
+            self.blobs[blob.digest] = blob
+
+        platform_manifests = []
+        for arch in archs:
+            config = _json_blob({
+                "architecture": arch,
+                "os": "linux",
+                "rootfs": {"type": "layers", "diff_ids": [blob.diff_id for blob in layers]},
+            })
+            self.blobs[config.digest] = config
+            manifest = _json_blob({
+                "schemaVersion": 2,
+                "mediaType": MEDIA_MANIFEST,
+                "config": {"mediaType": MEDIA_CONFIG, "size": config.size, "digest": config.digest},
+                "layers": [
+                    {"mediaType": LAYER_MEDIA_TYPES[compression], "size": blob.size, "digest": blob.digest}
+                    for blob in layers
+                ],
+            })
+            self.manifests[(repository, manifest.digest)] = (MEDIA_MANIFEST, manifest.data)
+            platform_manifests.append((arch, manifest))
+
+        if len(platform_manifests) == 1:
+            self.manifests[(repository, tag)] = (MEDIA_MANIFEST, platform_manifests[0][1].data)
+        else:
+            index = _json_blob({
+                "schemaVersion": 2,
+                "mediaType": MEDIA_MANIFEST_LIST,
+                "manifests": [
+                    {
+                        "mediaType": MEDIA_MANIFEST,
+                        "size": manifest.size,
+                        "digest": manifest.digest,
+                        "platform": {"architecture": arch, "os": "linux"},
+                    }
+                    for arch, manifest in platform_manifests
+                ],
+            })
+            self.manifests[(repository, index.digest)] = (MEDIA_MANIFEST_LIST, index.data)
+            self.manifests[(repository, tag)] = (MEDIA_MANIFEST_LIST, index.data)
+
+        repo = self.repositories.setdefault(repository, {"tags": {}})
+        repo["tags"][tag] = {
+            "tag_name": tag,
+            "images": [
+                {
+                    "os": "linux",
+                    "architecture": arch,
+                    "digest": manifest.digest,
+                    "size": sum(blob.size for blob in layers),
+                    "last_pushed": "2026-01-01T00:00:00Z",
+                }
+                for arch, manifest in platform_manifests
+            ],
+        }
+
+    def start(self) -> "FakeRegistry":
+        handler = type("BoundHandler", (_RegistryHandler,), {"registry": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def reset_stats(self):
+        self.stats = RegistryStats()
+
+    def __enter__(self) -> "FakeRegistry":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def roll(self, probability: float) -> bool:
+        if probability <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < probability
+
+    def throttle_total(self, nbytes: int):
+        rate = self.config.total_bandwidth
+        if rate <= 0:
+            return
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._bucket_time = max(self._bucket_time, now) + nbytes / rate
+            delay = self._bucket_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _RegistryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    registry: FakeRegistry
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head: bool):
+        reg = self.registry
+        reg.stats.add(requests=1)
+        if reg.config.latency > 0:
+            time.sleep(reg.config.latency)
+
+        url = urlparse(self.path)
+        path = url.path
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if path.startswith("/api/"):
+            return self._handle_api(path[len("/api/"):], query)
+        if path == "/token":
+            reg.stats.add(token_requests=1)
+            return self._send_json({"token": TOKEN, "access_token": TOKEN, "expires_in": 300})
+        if path.startswith("/_blobs/"):
+            return self._send_blob(path[len("/_blobs/"):], head)
+
+        if reg.config.auth and self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            realm = f"http://{self.headers.get('Host') or reg.host}/token"
+            return self._send_bytes(
+                401, b"{}", "application/json",
+                {"WWW-Authenticate": f'Bearer realm="{realm}",service="fake-registry"'},
+            )
+        if path in ("/v2", "/v2/"):
+            return self._send_json({})
+
+        match = re.match(r"^/v2/(.+)/(manifests|blobs)/([^/]+)$", path)
+        if not match:
+            return self._send_bytes(404, b"{}", "application/json")
+        repository, kind, reference = match.groups()
+
+        if kind == "manifests":
+            reg.stats.add(manifest_requests=1)
+            manifest = reg.manifests.get((repository, reference))
+            if manifest is None:
+                return self._send_bytes(404, b"{}", "application/json")
+            media_type, data = manifest
+            digest = f"sha256:{hashlib.sha256(data).hexdigest()}"
+            return self._send_bytes(200, b"" if head else data, media_type, {"Docker-Content-Digest": digest}, len(data))
+
+        if not head and reg.config.redirect:
+            reg.stats.add(redirects=1)
+            return self._send_bytes(307, b"", "text/plain", {"Location": f"/_blobs/{reference}"})
+        return self._send_blob(reference, head)
+
+    def _handle_api(self, endpoint: str, query: Dict[str, str]):
+        reg = self.registry
+        page = int(query.get("page", 1))
+        page_size = int(query.get("page_size", 10))
+        if endpoint == "search":
+            keyword = query.get("query", "")
+            items = [
+                {
+                    "namespace": repo.rsplit("/", 1)[0] if "/" in repo else "library",
+                    "name": repo.rsplit("/", 1)[-1],
+                    "description": f"bench image {repo}",
+                    "star_count": 0,
+                    "pull_count": 0,
+                    "last_updated": "2026-01-01T00:00:00Z",
+                }
+                for repo in sorted(reg.repositories)
+                if keyword in repo
+            ]
+            return self._send_api_page(items, page, page_size)
+        if endpoint == "get_detail":
+            return self._send_json({"code": 0, "data": {"description": query.get("repositories", ""), "categories": []}})
+        if endpoint == "get_tags":
+            repo = reg.repositories.get(query.get("repositories", ""), {"tags": {}})
+            search = query.get("search", "")
+            items = [item for name, item in sorted(repo["tags"].items()) if search in name]
+            return self._send_api_page(items, page, page_size)
+        return self._send_bytes(404, b"{}", "application/json")
+
+    def _send_api_page(self, items: List[Dict[str, Any]], page: int, page_size: int):
+        start = (max(1, page) - 1) * page_size
+        return self._send_json({"code": 0, "data": {"total": len(items), "list": items[start:start + page_size]}})
+
+    def _send_json(self, obj: Any):
+        self._send_bytes(200, json.dumps(obj).encode("utf-8"), "application/json")
+
+    def _send_bytes(self, status: int, body: bytes, content_type: str,
+                    headers: Optional[Dict[str, str]] = None, length: Optional[int] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body) if length is None else length))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_blob(self, digest: str, head: bool):
+        reg = self.registry
+        blob = reg.blobs.get(digest)
+        if blob is None:
+            return self._send_bytes(404, b"{}", "application/json")
+
+        headers = {"Docker-Content-Digest": blob.digest, "Accept-Ranges": "bytes"}
+        if head:
+            return self._send_bytes(200, b"", "application/octet-stream", headers, blob.size)
+
+        reg.stats.add(blob_requests=1)
+        if reg.roll(reg.config.error_rate):
+            reg.stats.add(injected_errors=1)
+            return self._send_bytes(503, b"", "text/plain")
+
+        start, end = 0, blob.size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header:
+            match = re.match(r"bytes=(\d+)-(\d*)$", range_header.strip())
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2)), blob.size - 1) if match.group(2) else blob.size - 1
+                if start >= blob.size or start > end:
+                    return self._send_bytes(416, b"", "text/plain", {"Content-Range": f"bytes */{blob.size}"})
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{blob.size}"
+                reg.stats.add(range_requests=1)
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        drop_at = length // 2 if reg.roll(reg.config.drop_rate) else None
+        rate = reg.config.bandwidth
+        if reg.roll(reg.config.straggler_rate):
+            reg.stats.add(stragglers=1)
+            rate = reg.config.straggler_bandwidth
+        self._stream_range(blob, start, length, drop_at, rate)
+
+    def _stream_range(self, blob: Blob, start: int, length: int, drop_at: Optional[int], rate: int):
+        reg = self.registry
+        begin = time.monotonic()
+        sent = 0
+        src = open(blob.path, "rb") if blob.path else None
+        try:
+            if src:
+                src.seek(start)
+            while sent < length:
+                if drop_at is not None and sent >= drop_at:
+                    reg.stats.add(dropped_connections=1)
+                    self.close_connection = True
+                    return
+                n = min(SEND_CHUNK, length - sent)
+                data = src.read(n) if src else blob.data[start + sent:start + sent + n]
+                reg.throttle_total(len(data))
+                self.wfile.write(data)
+                sent += len(data)
+                reg.stats.add(bytes_sent=len(data))
+                if rate > 0 and sent < length:
+                    delay = sent / rate - (time.monotonic() - begin)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            if src:
+                src.close()
@@ -1,7 +1,9 @@
+from __future__ import annotations
+
 import os
 import sys
-import gzip
 import json
+import re
 import hashlib
 import shutil
 import threading
@@ -11,28 +13,35 @@ import warnings
 warnings.filterwarnings('ignore', message='urllib3.*doesn\'t match a supported version')
 warnings.filterwarnings('ignore', category=UserWarning, module='requests')
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import tarfile
-import urllib3
+# requests / urllib3 / tarfile / gzip / http.server 等较重的模块在用到的函数里再导入，
+# --version、--help 和只读本地文件的子命令不必为网络栈付出启动时间
 import argparse
 import logging
-import base64
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Tuple, Any
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple, Any, Callable, Union
 from pathlib import Path
 import io
+import functools
 import signal
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlparse
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+if TYPE_CHECKING:
+    import tarfile
+    from http.server import ThreadingHTTPServer
 
-urllib3.disable_warnings()
+    import requests
 
 VERSION = "v1.9.0"
 
+# 本地/内网 HTTP 仓库可通过 --plain-http 切换为 http
+REGISTRY_SCHEME = "https"
+
+# tty: 终端进度条；json: 输出 NDJSON 进度事件（--progress=json）
+PROGRESS_MODE = "tty"
+progress_stream = None
+
 MIRROR_SITES = {
     "1": {"name": "Docker Hub (官方)", "registry": "registry-1.docker.io"},
     "2": {"name": "1ms.run", "registry": "docker.1ms.run"},
@@ -46,11 +55,6 @@ MIRROR_SITES = {
     "10": {"name": "DaoCloud - Quay", "registry": "quay.m.daocloud.io"},
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s: %(message)s',
-    encoding='utf-8'
-)
 logger = logging.getLogger(__name__)
 
 stop_event = threading.Event()
@@ -72,7 +76,23 @@ def signal_handler(signum, frame):
     print('💡 再次按 Ctrl+C 强制退出')
 
 
-original_sigint_handler = signal.signal(signal.SIGINT, signal_handler)
+def setup_console():
+    global original_sigint_handler
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    # 作为库导入时不改动宿主程序的日志配置，只有命令行入口才配置根 logger
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s: %(message)s',
+        encoding='utf-8'
+    )
+    original_sigint_handler = signal.signal(signal.SIGINT, signal_handler)
+
+
+def request_errors() -> tuple:
+    # 未导入 requests 时不可能出现它的异常，except 子句里用这个避免为了匹配异常类型而导入
+    requests = sys.modules.get('requests')
+    return (requests.exceptions.RequestException,) if requests else ()
 
 
 @dataclass
@@ -83,6 +103,63 @@ class ImageInfo:
     tag: str
 
 
+class PullError(Exception):
+    pass
+
+
+class AuthError(PullError):
+    pass
+
+
+class ManifestError(PullError):
+    pass
+
+
+class PlatformNotFoundError(ManifestError):
+    def __init__(self, arch: str, platforms: List[str]):
+        super().__init__(f'在清单中找不到指定的架构 {arch}，可用架构: {", ".join(platforms)}')
+        self.arch = arch
+        self.platforms = platforms
+
+
+class DownloadError(PullError):
+    pass
+
+
+class PullCancelled(PullError):
+    pass
+
+
+# 分片下载中的一段字节区间。end 会在空闲线程拆走尾部时缩小；对冲时同一区间有多个请求，先写完的为 winner，
+# written / last_data 记录进度最快的请求
+@dataclass
+class ChunkRange:
+    start: int
+    end: int
+    path: str
+    winner: Optional[str] = None
+    copies: int = 0
+    hedges: int = 0
+    written: int = 0
+    started: float = 0.0
+    last_data: float = 0.0
+    hedged_at: float = 0.0
+    finished: float = 0.0
+    responses: Dict[str, Any] = field(default_factory=dict)
+
+
+def abort_response(resp):
+    # 从其它线程中止正在读取的响应：close() 唤不醒阻塞在 recv 上的线程，需要 shutdown 底层 socket
+    import socket
+
+    sock = getattr(getattr(getattr(resp, 'raw', None), 'connection', None), 'sock', None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
 @dataclass
 class DownloadStats:
     total_size: int = 0
@@ -260,12 +337,429 @@ class ProgressDisplay:
             self.last_line_count = len(self.layers) + 1
             self.initialized = True
 
+    def verify_layer(self, name: str, ok: bool):
+        pass
+
+    def phase(self, name: str, seconds: float):
+        pass
+
+    def finish(self):
+        print()
+
+    def summary(self, report: 'PullReport'):
+        report.print_summary()
+
+
+class JsonProgressDisplay(ProgressDisplay):
+    def __init__(self, stream, update_interval: float = 0.5):
+        super().__init__()
+        self.stream = stream
+        self.update_interval = update_interval
+        self.write_lock = threading.Lock()
+        self.last_emit: Dict[str, float] = {}
+
+    def emit(self, event: str, **fields):
+        line = json.dumps({'event': event, 'ts': round(time.time(), 3), **fields},
+                          ensure_ascii=False, separators=(',', ':'))
+        with self.write_lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def add_layer(self, name: str, total_size: int, index: int, total_layers: int):
+        super().add_layer(name, total_size, index, total_layers)
+        self.emit('layer_start', layer=name, index=index, total_layers=total_layers, size=total_size)
+
+    def update_layer(self, name: str, downloaded: int):
+        super().update_layer(name, downloaded)
+        now = time.monotonic()
+        if now - self.last_emit.get(name, 0) < self.update_interval:
+            return
+        self.last_emit[name] = now
+        layer = self.layers.get(name)
+        speed = int(self.stats.get_avg_speed()) if self.stats else 0
+        self.emit('bytes', layer=name, downloaded=downloaded, total=layer.total_size if layer else 0, speed=speed)
+
+    def set_chunk_info(self, name: str, current: int, total: int):
+        layer = self.layers.get(name)
+        previous = layer.current_chunk if layer else 0
+        super().set_chunk_info(name, current, total)
+        if current != previous:
+            self.emit('chunk', layer=name, done=current, total=total)
+
+    def complete_layer(self, name: str):
+        super().complete_layer(name)
+        layer = self.layers.get(name)
+        self.emit('complete', layer=name, size=layer.total_size if layer else 0)
+
+    def verify_layer(self, name: str, ok: bool):
+        self.emit('verify', layer=name, ok=ok)
+
+    def phase(self, name: str, seconds: float):
+        self.emit('phase', phase=name, seconds=round(seconds, 3))
+
+    def _refresh_display(self):
+        pass
+
+    def print_initial(self):
+        pass
+
+    def finish(self):
+        pass
+
+    def summary(self, report: 'PullReport'):
+        data = report.to_dict()
+        self.emit('done', result=data['result'], error=data['error'], total_s=data['total_s'],
+                  phases={name: v['seconds'] for name, v in data['phases'].items()})
+
+
+class CallbackProgressDisplay(JsonProgressDisplay):
+    # 供 Puller 使用：事件与 --progress=json 相同，以 dict 交给回调（在下载线程中调用），不写任何输出
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]], update_interval: float = 0.5):
+        super().__init__(None, update_interval)
+        self.callback = callback
+
+    def emit(self, event: str, **fields):
+        if self.callback is None:
+            return
+        try:
+            self.callback({'event': event, 'ts': round(time.time(), 3), **fields})
+        except Exception as e:
+            logger.debug(f'进度回调异常: {e}')
+
+
+def create_progress_display() -> ProgressDisplay:
+    if PROGRESS_MODE == 'json':
+        return JsonProgressDisplay(progress_stream or sys.stdout)
+    return ProgressDisplay()
+
 
 progress_display = ProgressDisplay()
 
 
+class PullReport:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.total_s: Optional[float] = None
+        self.result = 'incomplete'
+        self.error: Optional[str] = None
+        self.image: Dict[str, Any] = {}
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.layers: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - begin)
+
+    def add_phase(self, name: str, seconds: float):
+        with self.lock:
+            entry = self.phases.setdefault(name, {'seconds': 0.0, 'count': 0})
+            entry['seconds'] += seconds
+            entry['count'] += 1
+        progress_display.phase(name, seconds)
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # 每层按完整 digest 记录，name 只是表格里显示的短名（层 digest 前 12 位或 Config）
+    def _layer(self, digest: str) -> Dict[str, Any]:
+        return self.layers.setdefault(digest, {'digest': digest, 'name': digest[:12]})
+
+    def update_layer(self, digest: str, **fields):
+        with self.lock:
+            self._layer(digest).update(fields)
+
+    def add_layer_value(self, digest: str, key: str, value: float):
+        with self.lock:
+            layer = self._layer(digest)
+            layer[key] = layer.get(key, 0) + value
+
+    def set_layer_first(self, digest: str, key: str, value: float):
+        with self.lock:
+            self._layer(digest).setdefault(key, value)
+
+    def retry(self, digest: str):
+        self.add_layer_value(digest, 'retries', 1)
+        self.count('retries')
+
+    def finish(self, result: str, error: Optional[BaseException] = None):
+        if self.total_s is not None:
+            return
+        self.total_s = time.perf_counter() - self.start
+        self.result = result
+        if error is not None:
+            self.error = str(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.total_s if self.total_s is not None else time.perf_counter() - self.start
+            return {
+                'version': VERSION,
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started_at)),
+                'total_s': round(total, 3),
+                'result': self.result,
+                'error': self.error,
+                'image': dict(self.image),
+                'phases': {
+                    name: {'seconds': round(v['seconds'], 3), 'count': v['count']}
+                    for name, v in self.phases.items()
+                },
+                'layers': [
+                    {k: round(v, 3) if isinstance(v, float) else v for k, v in layer.items()}
+                    for layer in self.layers.values()
+                ],
+                'counters': dict(self.counters),
+            }
+
+    def write(self, path: str):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+            logger.info(f'📄 耗时报告已写入: {path}')
+        except OSError as e:
+            logger.warning(f'写入耗时报告失败: {e}')
+
+    def print_summary(self, top: int = 5):
+        report = self.to_dict()
+        total = report['total_s'] or 1
+        print(f"\n⏱️  阶段耗时（总计 {report['total_s']:.2f}s）")
+        for name, phase in report['phases'].items():
+            print(f"  {name:<12}{phase['seconds']:>9.2f}s {phase['seconds'] / total * 100:>5.1f}%  x{phase['count']}")
+        layers = sorted(report['layers'], key=lambda l: l.get('transfer_s', 0), reverse=True)[:top]
+        if layers:
+            print(f"  {'层':<14}{'大小':>10}{'TTFB':>8}{'传输':>9}{'校验':>8}{'解压':>8}{'重试':>6}")
+            for layer in layers:
+                print(f"  {layer['name']:<14}{LayerProgress.format_size(layer.get('size', 0)):>10}"
+                      f"{layer.get('ttfb_s', 0):>7.2f}s{layer.get('transfer_s', 0):>8.2f}s"
+                      f"{layer.get('verify_s', 0):>7.2f}s{layer.get('decompress_s', 0):>7.2f}s{layer.get('retries', 0):>6}")
+
+
+pull_report = PullReport()
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meta: Dict[str, tuple] = {}
+        self.values: Dict[str, Dict[tuple, float]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: Optional[tuple] = None):
+        self.meta[name] = (kind, help_text, buckets)
+        self.values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self.meta[name][2]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values[name]
+            # [各桶计数..., sum, count]
+            state = series.setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @staticmethod
+    def _labels(pairs):
+        if not pairs:
+            return ''
+        text = ','.join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return '{' + text + '}'
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, buckets) in self.meta.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in self.values[name].items():
+                    if kind != 'histogram':
+                        lines.append(f'{name}{self._labels(key)} {value}')
+                        continue
+                    for bound, count in zip(buckets + ('+Inf',), value[:-2] + [value[-1]]):
+                        lines.append(f'{name}_bucket{self._labels(key + (("le", bound),))} {count}')
+                    lines.append(f'{name}_sum{self._labels(key)} {value[-2]}')
+                    lines.append(f'{name}_count{self._labels(key)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('docker_pull_bytes_total', 'counter', '已下载的字节数（按仓库）')
+metrics.describe('docker_pull_active_connections', 'gauge', '正在传输的 blob 连接数')
+metrics.describe('docker_pull_chunk_seconds', 'histogram', '单次 blob/分片请求的耗时（秒）', LATENCY_BUCKETS)
+metrics.describe('docker_pull_retries_total', 'counter', 'blob 下载重试次数（按仓库）')
+metrics.describe('docker_pull_straggler_requests_total', 'counter', '为拖尾分片额外发出的请求数（steal=拆分剩余区间，hedge=重复请求）')
+metrics.describe('docker_pull_token_requests_total', 'counter', 'token 获取/刷新次数（按仓库）')
+metrics.describe('docker_pull_decompress_bytes_total', 'counter', '解压输出的字节数')
+metrics.describe('docker_pull_decompress_seconds_total', 'counter', '解压耗时累计（秒）')
+metrics.describe('docker_pull_blob_cache_hits_total', 'counter', '命中本地 blob 缓存、免于下载的 blob 数')
+metrics.describe('docker_pull_blob_cache_bytes_total', 'counter', '命中本地 blob 缓存节省的下载字节数')
+metrics.describe('docker_pull_daemon_jobs', 'gauge', '守护进程中排队和执行中的任务数')
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+HTTP2_MAX_CONNECTIONS = 50
+HTTP2_MAX_RETRIES = 10
+HTTP2_BACKOFF_FACTOR = 3
+HTTP2_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def as_requests_error(e: Exception) -> Exception:
+    import httpx
+    import requests
+
+    if isinstance(e, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(e))
+    if isinstance(e, httpx.TransportError):
+        return requests.exceptions.ConnectionError(str(e))
+    return requests.exceptions.RequestException(str(e))
+
+
+class Http2Response:
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.response.close()
+
+    def json(self):
+        return self.response.json()
+
+    def iter_content(self, chunk_size: int = 65536):
+        import httpx
+
+        try:
+            yield from self.response.iter_bytes(chunk_size)
+        except httpx.HTTPError as e:
+            raise as_requests_error(e) from e
+
+    def raise_for_status(self):
+        import requests
+
+        if self.status_code >= 400:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.exceptions.HTTPError(
+                f'{self.status_code} {kind} Error: {self.response.reason_phrase} for url: {self.url}', response=self)
+
+
+# --http2：用 httpx 的 HTTP/2 连接代替 requests/urllib3，同一仓库的并发 Range 请求复用少量连接上的多个流，
+# 免去每个分片各自的 TCP+TLS 握手。只实现下载代码用到的 get/head 子集，异常转换为 requests 的异常类型，
+# 调用方无需区分；HTTP/2 通过 TLS ALPN 协商，对方不支持（或 --plain-http）时同一连接池自动使用 HTTP/1.1
+class Http2Session:
+    def __init__(self):
+        import httpx
+
+        transport = httpx.HTTPTransport(
+            http2=True, verify=False,
+            limits=httpx.Limits(max_connections=HTTP2_MAX_CONNECTIONS, max_keepalive_connections=20)
+        )
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        # trust_env 保持开启，HTTP(S)_PROXY / NO_PROXY 环境变量与 requests 行为一致
+        self.client = httpx.Client(transport=transport, verify=False, timeout=httpx.Timeout(600, connect=60))
+        self.versions: Dict[str, str] = {}
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, timeout=None,
+                stream: bool = False, allow_redirects: bool = True, verify: bool = False) -> Http2Response:
+        import httpx
+
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        elif timeout is None:
+            timeout = self.client.timeout
+        # 与 SessionManager 里 urllib3 Retry 的策略一致：连接错误和 429/5xx 重试，第二次起指数退避
+        request = self.client.build_request(method, url, headers=headers, timeout=timeout)
+        for attempt in range(HTTP2_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(min(HTTP2_BACKOFF_FACTOR * 2 ** (attempt - 1), 120) if attempt > 1 else 0)
+            try:
+                response = self.client.send(request, stream=stream, follow_redirects=allow_redirects)
+            except httpx.TransportError as e:
+                if attempt < HTTP2_MAX_RETRIES:
+                    logger.debug(f'{method} {url} 连接失败，重试 ({attempt + 1}/{HTTP2_MAX_RETRIES}): {e}')
+                    continue
+                raise as_requests_error(e) from e
+            except httpx.HTTPError as e:
+                raise as_requests_error(e) from e
+            if response.status_code in HTTP2_RETRY_STATUSES and attempt < HTTP2_MAX_RETRIES:
+                response.close()
+                continue
+            break
+
+        host = response.url.host
+        if self.versions.get(host) != response.http_version:
+            self.versions[host] = response.http_version
+            logger.debug(f'{host} 使用 {response.http_version}')
+        return Http2Response(response)
+
+    def get(self, url: str, **kwargs) -> Http2Response:
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> Http2Response:
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
 class SessionManager:
     _instance: Optional[requests.Session] = None
+    use_http2 = False
 
     @classmethod
     def get_session(cls) -> requests.Session:
@@ -275,6 +769,21 @@ class SessionManager:
 
     @classmethod
     def _create_session(cls) -> requests.Session:
+        if cls.use_http2:
+            try:
+                import h2  # noqa: F401
+                session = Http2Session()
+                logger.info('🔀 使用 HTTP/2 传输（httpx）')
+                return session
+            except ImportError:
+                logger.warning('⚠️ --http2 需要安装 httpx 和 h2（pip install "httpx[http2]"），回退到 HTTP/1.1')
+
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        urllib3.disable_warnings()
         session = requests.Session()
 
         retry_strategy = Retry(
@@ -305,7 +814,16 @@ class SessionManager:
         return session
 
 
-def get_output_dir(repository: str, tag: str, arch: str, output_path: Optional[str] = None) -> Path:
+MANIFEST_ACCEPT = ', '.join([
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.index.v1+json',
+    'application/vnd.oci.image.manifest.v1+json',
+])
+
+
+def get_output_dir(repository: str, tag: str, arch: str, output_path: Optional[str] = None,
+                   root: Optional[str] = None) -> Path:
     safe_repo = repository.replace("/", "_").replace(":", "_")
     dir_name = f"{safe_repo}_{tag}_{arch}"
 
@@ -314,10 +832,22 @@ def get_output_dir(repository: str, tag: str, arch: str, output_path: Optional[s
     else:
         output_dir = Path.cwd() / dir_name
 
+    # 指定 root 时（守护进程），最终目录也必须落在 root 之内，防止 tag/arch 拼出越界路径
+    if root:
+        root = os.path.realpath(root)
+        if os.path.commonpath([root, os.path.realpath(output_dir)]) != root:
+            raise PullError(f'输出目录 {output_dir} 超出了输出根目录')
+
     output_dir.mkdir(parents=True, exist_ok=True)
     return output_dir
 
 
+def get_imgparts(image_info: ImageInfo) -> List[str]:
+    if image_info.registry == 'registry-1.docker.io' and image_info.repository.startswith('library/'):
+        return []
+    return image_info.repository.split('/')[:-1]
+
+
 def parse_image_input(image_input: str, custom_registry: Optional[str] = None) -> ImageInfo:
     if '/' in image_input and ('.' in image_input.split('/')[0] or ':' in image_input.split('/')[0]):
         registry, remainder = image_input.split('/', 1)
@@ -363,31 +893,35 @@ def get_auth_head(
     repository: str,
     username: Optional[str] = None,
     password: Optional[str] = None,
-    max_retries: int = 3
+    max_retries: int = 3,
+    report: Optional[PullReport] = None
 ) -> Dict[str, str]:
+    # report 为 None 时不记录阶段耗时（例如 pull() 之外并发执行的 Puller.resolve）
+    import requests
+
     for attempt in range(max_retries):
         try:
             url = f'{auth_url}?service={reg_service}&scope=repository:{repository}:pull'
 
             headers = {}
             if username and password:
+                import base64
                 auth_string = f"{username}:{password}"
                 encoded_auth = base64.b64encode(auth_string.encode('utf-8')).decode('utf-8')
                 headers['Authorization'] = f'Basic {encoded_auth}'
 
             logger.debug(f"获取认证头: {url}")
 
-            resp = session.get(url, headers=headers, verify=False, timeout=60)
+            if report:
+                report.count('token_requests')
+            metrics.inc('docker_pull_token_requests_total', registry=urlparse(auth_url).netloc)
+            with report.phase('token') if report else nullcontext():
+                resp = session.get(url, headers=headers, verify=False, timeout=60)
             resp.raise_for_status()
             access_token = resp.json()['token']
             auth_head = {
                 'Authorization': f'Bearer {access_token}',
-                'Accept': ', '.join([
-                    'application/vnd.docker.distribution.manifest.v2+json',
-                    'application/vnd.docker.distribution.manifest.list.v2+json',
-                    'application/vnd.oci.image.index.v1+json',
-                    'application/vnd.oci.image.manifest.v1+json',
-                ])
+                'Accept': MANIFEST_ACCEPT
             }
 
             return auth_head
@@ -407,14 +941,19 @@ def fetch_manifest(
     repository: str,
     tag: str,
     auth_head: Dict[str, str],
-    max_retries: int = 3
+    max_retries: int = 3,
+    scheme: Optional[str] = None,
+    report: Optional[PullReport] = None
 ) -> Tuple[requests.Response, int]:
+    import requests
+
     for attempt in range(max_retries):
         try:
-            url = f'https://{registry}/v2/{repository}/manifests/{tag}'
+            url = f'{scheme or REGISTRY_SCHEME}://{registry}/v2/{repository}/manifests/{tag}'
             logger.debug(f'获取镜像清单: {url}')
 
-            resp = session.get(url, headers=auth_head, verify=False, timeout=60)
+            with report.phase('manifest') if report else nullcontext():
+                resp = session.get(url, headers=auth_head, verify=False, timeout=60)
             if resp.status_code == 401:
                 logger.info('需要认证。')
                 return resp, 401
@@ -430,6 +969,14 @@ def fetch_manifest(
                 raise
 
 
+def list_platforms(manifests: List[Dict]) -> List[str]:
+    return [
+        m.get('annotations', {}).get('com.docker.official-images.bashbrew.arch') or
+        m.get('platform', {}).get('architecture')
+        for m in manifests if m.get('platform', {}).get('os') == 'linux'
+    ]
+
+
 def select_manifest(manifests: List[Dict], arch: str) -> Optional[str]:
     for m in manifests:
         if (m.get('annotations', {}).get('com.docker.official-images.bashbrew.arch') == arch or
@@ -526,6 +1073,95 @@ class DownloadProgressManager:
                 logger.error(f'清除进度文件失败: {e}')
 
 
+BLOB_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'docker_image_puller', 'blobs')
+
+
+def link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+# 按 digest 存放校验通过的 config / 层 blob（压缩态），多个镜像共享基础层时直接硬链接到输出目录，
+# 跨盘时退化为复制；max_size 非 0 时按最近使用时间淘汰
+class BlobCache:
+    def __init__(self, directory: str = BLOB_CACHE_DIR, max_size: int = 0):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        algo, _, hexdigest = digest.partition(':')
+        return os.path.join(self.directory, algo, hexdigest)
+
+    def get(self, digest: str, dest: str) -> bool:
+        src = self.path(digest)
+        if not os.path.exists(src):
+            return False
+        try:
+            if os.path.exists(dest):
+                os.remove(dest)
+            link_or_copy(src, dest)
+            os.utime(src)
+        except OSError as e:
+            logger.debug(f'读取 blob 缓存失败 {digest[:19]}: {e}')
+            return False
+        metrics.inc('docker_pull_blob_cache_hits_total')
+        metrics.inc('docker_pull_blob_cache_bytes_total', os.path.getsize(dest))
+        return True
+
+    def put(self, digest: str, src: str):
+        dst = self.path(digest)
+        if os.path.exists(dst) or not os.path.exists(src):
+            return
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f'{dst}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            link_or_copy(src, tmp)
+            os.replace(tmp, dst)
+        except OSError as e:
+            logger.warning(f'写入 blob 缓存失败 {digest[:19]}: {e}')
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def stats(self) -> Dict[str, int]:
+        files = self._files()
+        return {'blobs': len(files), 'bytes': sum(size for _, size, _ in files), 'max_size': self.max_size}
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def evict(self):
+        if not self.max_size:
+            return
+        with self.lock:
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
 def get_file_size(session: requests.Session, url: str, headers: Dict[str, str]) -> int:
     try:
         resp = session.head(url, headers=headers, verify=False, timeout=30)
@@ -536,6 +1172,32 @@ def get_file_size(session: requests.Session, url: str, headers: Dict[str, str])
     return 0
 
 
+def update_hash_from_file(sha256_hash, path: str, block_size: int = 65536):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            sha256_hash.update(data)
+
+
+def merge_chunk_files(chunk_paths: List[str], save_path: str, sha256_hash=None, block_size: int = 65536) -> bool:
+    with open(save_path, 'wb') as outfile:
+        for chunk_file in chunk_paths:
+            if stop_event.is_set():
+                return False
+
+            with open(chunk_file, 'rb') as infile:
+                while True:
+                    data = infile.read(block_size)
+                    if not data:
+                        break
+                    outfile.write(data)
+                    if sha256_hash:
+                        sha256_hash.update(data)
+    return True
+
+
 def download_file_with_progress(
     session: requests.Session,
     url: str,
@@ -547,11 +1209,20 @@ def download_file_with_progress(
     stats: Optional[DownloadStats] = None,
     chunk_size: int = 10 * 1024 * 1024
 ) -> bool:
+    import requests
+
     CHUNK_THRESHOLD = 50 * 1024 * 1024
+    layer_start = time.perf_counter()
+    registry = urlparse(url).netloc
+    report_key = expected_digest or desc
+    pull_report.update_layer(report_key, name=desc)
     
     for attempt in range(max_retries):
         if stop_event.is_set():
             return False
+        if attempt > 0:
+            pull_report.retry(report_key)
+            metrics.inc('docker_pull_retries_total', registry=registry)
 
         resume_pos = 0
         if os.path.exists(save_path):
@@ -564,6 +1235,20 @@ def download_file_with_progress(
             download_headers['Range'] = f'bytes={resume_pos}-'
 
         try:
+            request_start = time.perf_counter()
+            metrics.inc('docker_pull_active_connections')
+            if resume_pos == 0 and isinstance(session, Http2Session):
+                # HTTP/2 下先用 HEAD 取大小再决定是否分片：提前关闭未读完的整包流不会归还连接级流控窗口（httpcore 不重置该流），
+                # 会拖住同一连接上的其它分片
+                with session.head(url, headers=headers, verify=False, timeout=120, allow_redirects=True) as head:
+                    head.raise_for_status()
+                    total_size = int(head.headers.get('content-length', 0))
+                if total_size > CHUNK_THRESHOLD:
+                    progress_display.update_layer_size(desc, total_size)
+                    return download_file_in_chunks(
+                        session, url, headers, save_path, desc,
+                        total_size, expected_digest, max_retries, stats, chunk_size
+                    )
             with session.get(url, headers=download_headers, verify=False, timeout=120, stream=True) as resp:
                 if resp.status_code == 416:
                     progress_display.complete_layer(desc)
@@ -589,12 +1274,7 @@ def download_file_with_progress(
                 sha256_hash = hashlib.sha256() if expected_digest else None
 
                 if resume_pos > 0 and sha256_hash:
-                    with open(save_path, 'rb') as existing_file:
-                        while True:
-                            chunk = existing_file.read(65536)
-                            if not chunk:
-                                break
-                            sha256_hash.update(chunk)
+                    update_hash_from_file(sha256_hash, save_path)
 
                 if stats:
                     stats.total_size += total_size - resume_pos
@@ -604,6 +1284,7 @@ def download_file_with_progress(
                 downloaded_size = resume_pos
                 last_update_time = time.time()
                 last_downloaded = resume_pos
+                hash_time = 0.0
 
                 with open(save_path, mode) as file:
                     for chunk in resp.iter_content(chunk_size=65536):
@@ -611,11 +1292,16 @@ def download_file_with_progress(
                             return False
 
                         if chunk:
+                            if downloaded_size == resume_pos:
+                                pull_report.set_layer_first(report_key, 'ttfb_s', time.perf_counter() - request_start)
                             file.write(chunk)
                             downloaded_size += len(chunk)
+                            metrics.inc('docker_pull_bytes_total', len(chunk), registry=registry)
 
                             if sha256_hash:
+                                hash_start = time.perf_counter()
                                 sha256_hash.update(chunk)
+                                hash_time += time.perf_counter() - hash_start
 
                             progress_display.update_layer(desc, downloaded_size)
 
@@ -627,10 +1313,17 @@ def download_file_with_progress(
                                     last_downloaded = downloaded_size
                                     last_update_time = current_time
 
+                metrics.observe('docker_pull_chunk_seconds', time.perf_counter() - request_start)
+                pull_report.update_layer(report_key, size=total_size, resumed=resume_pos > 0,
+                                         transfer_s=time.perf_counter() - layer_start)
+                pull_report.add_layer_value(report_key, 'verify_s', hash_time)
+
                 if expected_digest and sha256_hash:
                     actual_digest = f'sha256:{sha256_hash.hexdigest()}'
+                    progress_display.verify_layer(desc, actual_digest == expected_digest)
                     if actual_digest != expected_digest:
                         logger.error(f'❌ {desc} 校验失败！')
+                        pull_report.count('digest_mismatches')
                         if os.path.exists(save_path):
                             os.remove(save_path)
                         if attempt < max_retries - 1:
@@ -669,10 +1362,18 @@ def download_file_with_progress(
                 continue
             logger.error(f'❌ {desc} 下载失败: {e}')
             return False
+        finally:
+            metrics.inc('docker_pull_active_connections', -1)
 
     return False
 
 
+CHUNK_STEAL_MIN_SIZE = 1024 * 1024
+CHUNK_HEDGE_DELAY = 2.0
+CHUNK_SLOW_FACTOR = 4
+CHUNK_MAX_HEDGES = 2
+
+
 def download_file_in_chunks(
     session: requests.Session,
     url: str,
@@ -687,8 +1388,12 @@ def download_file_in_chunks(
 ) -> bool:
     num_chunks = (total_size + chunk_size - 1) // chunk_size
     temp_dir = save_path + '.chunks'
+    layer_start = time.perf_counter()
+    registry = urlparse(url).netloc
+    report_key = expected_digest or desc
     
     progress_display.set_chunk_info(desc, 0, num_chunks)
+    pull_report.update_layer(report_key, size=total_size, chunks=num_chunks)
     
     try:
         os.makedirs(temp_dir, exist_ok=True)
@@ -711,114 +1416,251 @@ def download_file_in_chunks(
                 stats.start_time = time.time()
         
         sha256_hash = hashlib.sha256() if expected_digest else None
-        completed_chunks = [False] * num_chunks
-        chunk_sizes = [end - start for start, end, _ in chunk_files]
+        chunk_lock = threading.Lock()
+        cancelled = threading.Event()
+        ranges = [ChunkRange(start, end, chunk_file) for start, end, chunk_file in chunk_files]
         
-        def download_single_chunk(i: int, start: int, end: int, chunk_file: str) -> bool:
-            if stop_event.is_set():
-                return False
-            
-            if os.path.exists(chunk_file):
-                existing_size = os.path.getsize(chunk_file)
-                if existing_size == end - start:
-                    return True
-                else:
-                    os.remove(chunk_file)
-            
-            chunk_headers = headers.copy()
-            chunk_headers['Range'] = f'bytes={start}-{end-1}'
-            
+        def download_range(chunk: ChunkRange, path: str) -> bool:
+            # path 为 chunk.path 时是主请求，否则是对冲的重复请求；返回 True 表示该请求先完整写完了区间
             for attempt in range(max_retries):
-                if stop_event.is_set():
+                if stop_event.is_set() or cancelled.is_set() or chunk.winner:
                     return False
+                if attempt > 0:
+                    pull_report.retry(report_key)
+                    metrics.inc('docker_pull_retries_total', registry=registry)
                 
+                written = 0
                 try:
+                    request_start = time.perf_counter()
+                    metrics.inc('docker_pull_active_connections')
+                    with chunk_lock:
+                        if path == chunk.path and not chunk.started:
+                            chunk.started = chunk.last_data = request_start
+                        chunk_headers = headers.copy()
+                        chunk_headers['Range'] = f'bytes={chunk.start}-{chunk.end-1}'
                     with session.get(url, headers=chunk_headers, verify=False, timeout=120, stream=True) as resp:
+                        # 登记响应，区间由其它请求先完成或下载被取消时，由对方直接中止本次读取
+                        with chunk_lock:
+                            if cancelled.is_set() or chunk.winner:
+                                return False
+                            chunk.responses[path] = resp
                         resp.raise_for_status()
                         
-                        with open(chunk_file, 'wb') as f:
+                        with open(path, 'wb') as f:
                             for data in resp.iter_content(chunk_size=65536):
-                                if stop_event.is_set():
+                                if stop_event.is_set() or cancelled.is_set() or chunk.winner:
                                     return False
-                                if data:
-                                    f.write(data)
+                                if not data:
+                                    continue
+                                pull_report.set_layer_first(report_key, 'ttfb_s', time.perf_counter() - request_start)
+                                # 区间尾部可能已被空闲线程拆走，只写到当前的 end 为止
+                                with chunk_lock:
+                                    data = data[:chunk.end - chunk.start - written]
+                                    written += len(data)
+                                    if written >= chunk.written:
+                                        chunk.written = written
+                                        chunk.last_data = time.perf_counter()
+                                f.write(data)
+                                metrics.inc('docker_pull_bytes_total', len(data), registry=registry)
+                                if written >= chunk.end - chunk.start:
+                                    break
                         
-                        if os.path.getsize(chunk_file) == end - start:
-                            return True
-                        else:
-                            if os.path.exists(chunk_file):
-                                os.remove(chunk_file)
-                            if attempt < max_retries - 1:
-                                wait_time = min(2 ** attempt, 60)
-                                time.sleep(wait_time)
-                                continue
-                            return False
+                        with chunk_lock:
+                            if chunk.winner:
+                                return False
+                            if written == chunk.end - chunk.start:
+                                chunk.winner = path
+                                chunk.finished = time.perf_counter()
+                                for other, other_resp in chunk.responses.items():
+                                    if other != path:
+                                        abort_response(other_resp)
+                                metrics.observe('docker_pull_chunk_seconds', time.perf_counter() - request_start)
+                                return True
+                        if attempt < max_retries - 1:
+                            wait_time = min(2 ** attempt, 60)
+                            cancelled.wait(wait_time)
+                            continue
+                        return False
                 except Exception as e:
+                    if chunk.winner or cancelled.is_set():
+                        return False
                     if attempt < max_retries - 1:
                         wait_time = min(2 ** attempt, 60)
-                        logger.info(f'🔄 {desc} 分片 {i+1} 下载失败，{wait_time}秒后重试 ({attempt + 1}/{max_retries}): {e}')
-                        time.sleep(wait_time)
+                        logger.info(f'🔄 {desc} 分片 {os.path.basename(path)} 下载失败，{wait_time}秒后重试 ({attempt + 1}/{max_retries}): {e}')
+                        cancelled.wait(wait_time)
                         continue
                     else:
-                        logger.error(f'❌ {desc} 分片 {i+1} 下载失败: {e}')
+                        logger.error(f'❌ {desc} 分片 {os.path.basename(path)} 下载失败: {e}')
                         return False
+                finally:
+                    with chunk_lock:
+                        chunk.responses.pop(path, None)
+                    metrics.inc('docker_pull_active_connections', -1)
             
             return False
         
+        def typical_speed() -> float:
+            speeds = sorted((c.end - c.start) / max(c.finished - c.started, 1e-6)
+                            for c in ranges if c.winner and c.finished)
+            return speeds[len(speeds) // 2] if speeds else 0.0
+        
+        def is_slow(c: ChunkRange, now: float, typical: float) -> bool:
+            # 长时间收不到数据，或速度远低于已完成区间的典型速度
+            if c.winner or not c.started or now - c.started < CHUNK_HEDGE_DELAY:
+                return False
+            if now - c.last_data >= CHUNK_HEDGE_DELAY:
+                return True
+            return typical > 0 and c.written / (now - c.started) * CHUNK_SLOW_FACTOR < typical
+        
+        def pick_straggler(tail: bool) -> Optional[Tuple[ChunkRange, str]]:
+            # 处理预计最晚完成的区间（队列未空时只处理慢区间）：仍在收数据的，把剩余区间的尾部拆给空闲线程；
+            # 长时间收不到数据、或剩余太少不值得拆但预计还要很久的，发一个重复请求，先完成者胜出
+            now = time.perf_counter()
+            with chunk_lock:
+                typical = typical_speed()
+                running = [c for c in ranges if not c.winner and c.started and (tail or is_slow(c, now, typical))]
+                
+                def speed(c: ChunkRange) -> float:
+                    return c.written / max(now - c.started, 1e-6)
+                
+                def eta(c: ChunkRange) -> float:
+                    return (c.end - c.start - c.written) / speed(c) if speed(c) > 0 else float('inf')
+                
+                def stealable(c: ChunkRange) -> int:
+                    # 按原请求与典型速度之比切分，让两边大致同时完成；还没有已完成的区间可参考时对半切。
+                    # 切分点不低于进度最快的请求已写到的位置，对冲中的区间也可以拆
+                    if now - c.last_data >= CHUNK_HEDGE_DELAY:
+                        return 0
+                    share = typical / (speed(c) + typical) if typical > 0 and speed(c) > 0 else 0.5
+                    size = int((c.end - c.start - c.written) * share)
+                    return size if size >= CHUNK_STEAL_MIN_SIZE else 0
+                
+                splittable = [c for c in running if stealable(c)]
+                if splittable:
+                    chunk = max(splittable, key=eta)
+                    split_at = chunk.end - stealable(chunk)
+                    stolen = ChunkRange(split_at, chunk.end, f'{chunk.path}.{len(ranges)}')
+                    chunk.end = split_at
+                    ranges.append(stolen)
+                    pull_report.count('chunk_steals')
+                    logger.debug(f'{desc}: 拆分慢分片 {os.path.basename(chunk.path)}，'
+                                 f'{LayerProgress.format_size(stolen.end - stolen.start)} 交给空闲线程')
+                    metrics.inc('docker_pull_straggler_requests_total', kind='steal')
+                    return stolen, stolen.path
+                
+                # 重复请求要从区间开头重新下载，只有按典型速度能更早完成时才值得发；
+                # 上一个重复请求同样很慢时，过 CHUNK_HEDGE_DELAY 后可以再发一个
+                def worth_hedging(c: ChunkRange) -> bool:
+                    if c.hedges >= CHUNK_MAX_HEDGES or now - max(c.started, c.hedged_at) < CHUNK_HEDGE_DELAY:
+                        return False
+                    if now - c.last_data >= CHUNK_HEDGE_DELAY:
+                        return True
+                    return eta(c) >= CHUNK_HEDGE_DELAY and typical > 0 and (c.end - c.start) / typical < eta(c)
+                
+                slow = [c for c in running if worth_hedging(c)]
+                if not slow:
+                    return None
+                chunk = max(slow, key=eta)
+                chunk.hedges += 1
+                chunk.hedged_at = now
+                pull_report.count('chunk_hedges')
+                logger.debug(f'{desc}: 慢分片 {os.path.basename(chunk.path)} 发出重复请求')
+                metrics.inc('docker_pull_straggler_requests_total', kind='hedge')
+                return chunk, f'{chunk.path}.hedge{chunk.hedges}'
+        
         max_workers = min(num_chunks, 4)
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {}
-            for i, (start, end, chunk_file) in enumerate(chunk_files):
-                if os.path.exists(chunk_file) and os.path.getsize(chunk_file) == end - start:
-                    completed_chunks[i] = True
+        # HTTP/2 下提前关闭的流不会归还连接级流控窗口（见 download_file_with_progress），不做拆分和对冲
+        hedging = not isinstance(session, Http2Session)
+        # 慢请求不占用并发名额，额外的线程留给拆分和对冲请求；已有 winner 的区间上落败的请求不计入
+        max_threads = max_workers * 2 if hedging else max_workers
+        futures = {}
+        pending = []
+        
+        def submit(chunk: ChunkRange, path: str):
+            # 用守护线程而不是线程池：中止不了的落败请求（例如卡在等待响应头）不会拖住进程退出
+            future = Future()
+            
+            def run():
+                try:
+                    future.set_result(download_range(chunk, path))
+                except BaseException as e:
+                    future.set_exception(e)
+            
+            with chunk_lock:
+                chunk.copies += 1
+            futures[future] = (chunk, path)
+            threading.Thread(target=run, daemon=True).start()
+        
+        try:
+            for chunk in ranges:
+                if os.path.exists(chunk.path) and os.path.getsize(chunk.path) == chunk.end - chunk.start:
+                    chunk.winner = chunk.path
                     continue
-                futures[executor.submit(download_single_chunk, i, start, end, chunk_file)] = i
+                pending.append(chunk)
             
-            while futures:
+            while not all(c.winner for c in ranges):
                 for future in list(futures.keys()):
                     if future.done():
-                        i = futures.pop(future)
+                        chunk, path = futures.pop(future)
+                        with chunk_lock:
+                            chunk.copies -= 1
                         try:
                             result = future.result()
-                            if result:
-                                completed_chunks[i] = True
-                                progress_display.set_chunk_info(desc, sum(completed_chunks), num_chunks)
-                            else:
-                                logger.error(f'❌ {desc} 分片 {i+1} 下载失败')
-                                return False
                         except Exception as e:
-                            logger.error(f'❌ {desc} 分片 {i+1} 下载异常: {e}')
+                            logger.error(f'❌ {desc} 分片 {os.path.basename(path)} 下载异常: {e}')
+                            result = False
+                        if not result and not chunk.winner and chunk.copies == 0:
+                            logger.error(f'❌ {desc} 分片 {os.path.basename(chunk.path)} 下载失败')
                             return False
                 
-                current_completed = sum(1 for c in completed_chunks if c)
-                current_size = sum(chunk_sizes[i] for i in range(num_chunks) if completed_chunks[i])
-                progress_display.update_layer(desc, current_size)
-                progress_display.set_chunk_info(desc, current_completed, num_chunks)
+                while True:
+                    now = time.perf_counter()
+                    with chunk_lock:
+                        typical = typical_speed()
+                        active = sum(c.copies for c in ranges if not c.winner)
+                        slow = sum(1 for c in ranges if c.copies and is_slow(c, now, typical)) if hedging else 0
+                    if active >= max_threads or active - slow >= max_workers:
+                        break
+                    straggler = pick_straggler(tail=not pending) if hedging else None
+                    if straggler:
+                        submit(*straggler)
+                    elif pending:
+                        chunk = pending.pop(0)
+                        submit(chunk, chunk.path)
+                    else:
+                        break
+                
+                completed = [c for c in ranges if c.winner]
+                progress_display.update_layer(desc, sum(c.end - c.start for c in completed))
+                progress_display.set_chunk_info(desc, len(completed), len(ranges))
                 
                 time.sleep(0.1)
+        finally:
+            # 结束（完成或失败）时中止所有仍在进行的请求，包括卡在读超时或重试等待中的
+            cancelled.set()
+            with chunk_lock:
+                for chunk in ranges:
+                    for resp in chunk.responses.values():
+                        abort_response(resp)
         
-        logger.info(f'{desc}: 合并 {num_chunks} 个分片...')
+        ranges.sort(key=lambda c: c.start)
+        logger.info(f'{desc}: 合并 {len(ranges)} 个分片...')
+        pull_report.update_layer(report_key, transfer_s=time.perf_counter() - layer_start)
         
-        with open(save_path, 'wb') as outfile:
-            for i, (_, _, chunk_file) in enumerate(chunk_files):
-                if stop_event.is_set():
-                    return False
-                
-                with open(chunk_file, 'rb') as infile:
-                    while True:
-                        data = infile.read(65536)
-                        if not data:
-                            break
-                        outfile.write(data)
-                        if sha256_hash:
-                            sha256_hash.update(data)
+        # 分片模式下校验与合并同时进行，verify_s 包含合并耗时
+        merge_start = time.perf_counter()
+        if not merge_chunk_files([c.winner for c in ranges], save_path, sha256_hash):
+            return False
+        pull_report.add_layer_value(report_key, 'verify_s', time.perf_counter() - merge_start)
         
         shutil.rmtree(temp_dir, ignore_errors=True)
         
         if expected_digest and sha256_hash:
             actual_digest = f'sha256:{sha256_hash.hexdigest()}'
+            progress_display.verify_layer(desc, actual_digest == expected_digest)
             if actual_digest != expected_digest:
                 logger.error(f'❌ {desc} 校验失败！')
+                pull_report.count('digest_mismatches')
                 if os.path.exists(save_path):
                     os.remove(save_path)
                 return False
@@ -833,6 +1675,73 @@ def download_file_in_chunks(
         return False
 
 
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+DECOMPRESS_BUFFER_SIZE = 1024 * 1024
+
+
+def detect_layer_compression(path: str, media_type: str = '') -> str:
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        compression = 'gzip'
+    elif magic.startswith(ZSTD_MAGIC):
+        compression = 'zstd'
+    else:
+        compression = 'none'
+
+    if media_type.endswith('+zstd'):
+        declared = 'zstd'
+    elif media_type.endswith('+gzip') or media_type.endswith('.tar.gzip'):
+        declared = 'gzip'
+    elif media_type:
+        declared = 'none'
+    else:
+        declared = compression
+    if declared != compression:
+        logger.debug(f'层声明类型 {media_type} 与实际内容 ({compression}) 不符，按实际内容处理')
+    return compression
+
+
+def _zstd_decompress_stream(src, dst):
+    try:
+        from compression import zstd
+    except ImportError:
+        zstd = None
+    if zstd is not None:
+        with zstd.ZstdFile(src, 'rb') as reader:
+            shutil.copyfileobj(reader, dst, DECOMPRESS_BUFFER_SIZE)
+        return
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError('解压 zstd 层需要 Python 3.14+ 或安装 zstandard 模块（pip install zstandard）')
+    zstandard.ZstdDecompressor().copy_stream(
+        src, dst, read_size=DECOMPRESS_BUFFER_SIZE, write_size=DECOMPRESS_BUFFER_SIZE
+    )
+
+
+def decompress_layer(src_path: str, dst_path: str, media_type: str = '') -> str:
+    compression = detect_layer_compression(src_path, media_type)
+    if compression == 'none':
+        os.replace(src_path, dst_path)
+        return compression
+
+    start = time.perf_counter()
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        if compression == 'gzip':
+            import gzip
+            with gzip.GzipFile(fileobj=src, mode='rb') as gz:
+                shutil.copyfileobj(gz, dst, DECOMPRESS_BUFFER_SIZE)
+        else:
+            _zstd_decompress_stream(src, dst)
+        metrics.inc('docker_pull_decompress_bytes_total', dst.tell())
+    metrics.inc('docker_pull_decompress_seconds_total', time.perf_counter() - start)
+    os.remove(src_path)
+    return compression
+
+
 def download_layers(
     session: requests.Session,
     registry: str,
@@ -846,10 +1755,15 @@ def download_layers(
     tag: str,
     arch: str,
     output_dir: Path,
-    workers: int
+    workers: int,
+    reuse_layers: Optional[set] = None,
+    display: Optional[ProgressDisplay] = None,
+    scheme: Optional[str] = None,
+    blob_cache: Optional[BlobCache] = None
 ):
     global progress_display
-    progress_display = ProgressDisplay()
+    progress_display = display or create_progress_display()
+    scheme = scheme or REGISTRY_SCHEME
 
     os.makedirs(imgdir, exist_ok=True)
 
@@ -861,35 +1775,45 @@ def download_layers(
         config_digest = resp_json['config']['digest']
         config_filename = f'{config_digest[7:]}.json'
         config_path = os.path.join(imgdir, config_filename)
-        config_url = f'https://{registry}/v2/{repository}/blobs/{config_digest}'
+        config_url = f'{scheme}://{registry}/v2/{repository}/blobs/{config_digest}'
 
         if progress_manager.is_config_completed() and os.path.exists(config_path):
             logger.info(f'✅ Config 已存在，跳过下载')
+        elif blob_cache and blob_cache.get(config_digest, config_path):
+            progress_manager.update_config_status('completed', digest=config_digest)
         else:
             progress_manager.update_config_status('downloading', digest=config_digest)
             config_size = get_file_size(session, config_url, auth_head)
             progress_display.add_layer('Config', config_size, 0, len(layers) + 1)
             
-            if not download_file_with_progress(
-                session, config_url, auth_head, config_path, "Config",
-                expected_digest=config_digest, stats=stats
-            ):
+            with pull_report.phase('config'):
+                config_ok = download_file_with_progress(
+                    session, config_url, auth_head, config_path, "Config",
+                    expected_digest=config_digest, stats=stats
+                )
+            if not config_ok:
                 progress_manager.update_config_status('failed')
-                raise Exception(f'Config 下载失败')
+                raise DownloadError('Config 下载失败')
 
             progress_manager.update_config_status('completed', digest=config_digest)
+            if blob_cache:
+                blob_cache.put(config_digest, config_path)
 
     except Exception as e:
         logging.error(f'请求配置失败: {e}')
-        return
+        raise DownloadError(f'请求配置失败: {e}') from e
 
     repo_tag = f'{"/".join(imgparts)}/{img}:{tag}' if imgparts else f'{img}:{tag}'
     content = [{'Config': config_filename, 'RepoTags': [repo_tag], 'Layers': []}]
     parentid = ''
     layer_json_map: Dict[str, Dict] = {}
+    layer_media_types: Dict[str, str] = {}
+    layer_digests: Dict[str, str] = {}
 
     layers_to_download = []
     skipped_count = 0
+    reused_count = 0
+    cached_count = 0
 
     for layer in layers:
         ublob = layer['digest']
@@ -897,20 +1821,36 @@ def download_layers(
         layerdir = f'{imgdir}/{fake_layerid}'
         os.makedirs(layerdir, exist_ok=True)
         layer_json_map[fake_layerid] = {"id": fake_layerid, "parent": parentid if parentid else None}
+        layer_media_types[fake_layerid] = layer.get('mediaType', '')
+        layer_digests[fake_layerid] = ublob
         parentid = fake_layerid
 
         save_path = f'{layerdir}/layer_gzip.tar'
 
-        if progress_manager.is_layer_completed(ublob) and os.path.exists(save_path):
+        if reuse_layers and f'{fake_layerid}/layer.tar' in reuse_layers:
+            reused_count += 1
+        elif progress_manager.is_layer_completed(ublob) and os.path.exists(save_path):
             skipped_count += 1
+        elif blob_cache and blob_cache.get(ublob, save_path):
+            progress_manager.update_layer_status(ublob, 'completed')
+            cached_count += 1
         else:
             layers_to_download.append((ublob, fake_layerid, layerdir, save_path))
 
+    pull_report.count('layers_total', len(layers))
+    pull_report.count('layers_skipped', skipped_count)
+    pull_report.count('layers_reused', reused_count)
+    pull_report.count('layers_cached', cached_count)
+
     if skipped_count > 0:
         logger.info(f'📦 跳过 {skipped_count} 个已下载的层，还需下载 {len(layers_to_download)} 个层')
+    if reused_count > 0:
+        logger.info(f'♻️ 增量模式：{reused_count} 个层已存在于基准镜像包中，不再下载')
+    if cached_count > 0:
+        logger.info(f'⚡ {cached_count} 个层命中本地 blob 缓存，不再下载')
 
     for idx, (ublob, fake_layerid, layerdir, save_path) in enumerate(layers_to_download):
-        url = f'https://{registry}/v2/{repository}/blobs/{ublob}'
+        url = f'{scheme}://{registry}/v2/{repository}/blobs/{ublob}'
         layer_size = get_file_size(session, url, auth_head)
         progress_display.add_layer(ublob[:12], layer_size, idx + 1, len(layers_to_download))
 
@@ -918,14 +1858,14 @@ def download_layers(
 
     num_workers = min(len(layers_to_download), max(1, workers)) if layers_to_download else 1
 
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    with pull_report.phase('download'), ThreadPoolExecutor(max_workers=num_workers) as executor:
         futures = {}
         try:
             for idx, (ublob, fake_layerid, layerdir, save_path) in enumerate(layers_to_download):
                 if stop_event.is_set():
                     raise KeyboardInterrupt
 
-                url = f'https://{registry}/v2/{repository}/blobs/{ublob}'
+                url = f'{scheme}://{registry}/v2/{repository}/blobs/{ublob}'
                 progress_manager.update_layer_status(ublob, 'downloading')
 
                 futures[executor.submit(
@@ -948,9 +1888,11 @@ def download_layers(
 
                 if not result:
                     progress_manager.update_layer_status(ublob, 'failed')
-                    raise Exception(f'层 {ublob[:12]} 下载失败')
+                    raise DownloadError(f'层 {ublob[:12]} 下载失败')
                 else:
                     progress_manager.update_layer_status(ublob, 'completed')
+                    if blob_cache:
+                        blob_cache.put(ublob, save_path)
 
         except KeyboardInterrupt:
             logging.error("用户终止下载，保存当前进度...")
@@ -958,7 +1900,7 @@ def download_layers(
             executor.shutdown(wait=False)
             raise
 
-    print()
+    progress_display.finish()
 
     for fake_layerid in layer_json_map.keys():
         if stop_event.is_set():
@@ -969,9 +1911,11 @@ def download_layers(
         tar_path = f'{layerdir}/layer.tar'
 
         if os.path.exists(gz_path):
-            with gzip.open(gz_path, 'rb') as gz, open(tar_path, 'wb') as file:
-                shutil.copyfileobj(gz, file)
-            os.remove(gz_path)
+            decompress_start = time.perf_counter()
+            with pull_report.phase('decompress'):
+                compression = decompress_layer(gz_path, tar_path, layer_media_types[fake_layerid])
+            pull_report.update_layer(layer_digests[fake_layerid], compression=compression,
+                                     decompress_s=time.perf_counter() - decompress_start)
 
         json_path = f'{layerdir}/json'
         with open(json_path, 'w') as file:
@@ -997,12 +1941,200 @@ def download_layers(
     progress_manager.clear_progress()
 
 
-def create_image_tar(imgdir: str, repository: str, tag: str, arch: str, output_dir: Path) -> str:
+COMPRESS_SUFFIXES = {'gzip': '.tar.gz', 'zstd': '.tar.zst'}
+COMPRESS_DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+COMPRESS_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class ParallelGzipWriter:
+    def __init__(self, fileobj, level: int = 6, workers: Optional[int] = None,
+                 block_size: int = COMPRESS_BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = []
+        self.buffer = bytearray()
+        self.position = 0
+
+    def _compress_block(self, block: bytes) -> bytes:
+        import gzip
+        return gzip.compress(block, compresslevel=self.level, mtime=0)
+
+    def _submit(self, block: bytes):
+        self.pending.append(self.executor.submit(self._compress_block, block))
+        while len(self.pending) > self.workers * 2:
+            self.fileobj.write(self.pending.pop(0).result())
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self):
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            for future in self.pending:
+                self.fileobj.write(future.result())
+            self.pending.clear()
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+def open_zstd_writer(fileobj, level: int = 3, workers: Optional[int] = None):
+    workers = workers or os.cpu_count() or 1
+    try:
+        from compression import zstd
+    except ImportError:
+        zstd = None
+    if zstd is not None:
+        options = {zstd.CompressionParameter.compression_level: level}
+        lower, upper = zstd.CompressionParameter.nb_workers.bounds()
+        if upper > 0:
+            options[zstd.CompressionParameter.nb_workers] = max(lower, min(workers, upper))
+        return zstd.ZstdFile(fileobj, 'wb', options=options)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError('zstd 压缩输出需要 Python 3.14+ 或安装 zstandard 模块（pip install zstandard）')
+    return zstandard.ZstdCompressor(level=level, threads=workers).stream_writer(fileobj, closefd=False)
+
+
+def open_compressed_writer(fileobj, compress: str, level: Optional[int] = None, workers: Optional[int] = None):
+    if level is None:
+        level = COMPRESS_DEFAULT_LEVELS[compress]
+    if compress == 'gzip':
+        return ParallelGzipWriter(fileobj, level=level, workers=workers)
+    if compress == 'zstd':
+        return open_zstd_writer(fileobj, level=level, workers=workers)
+    raise ValueError(f'不支持的压缩格式: {compress}')
+
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    value = text.strip().upper().rstrip('B') or '0'
+    unit = value[-1] if value[-1] in SIZE_UNITS else ''
+    number = value[:-1] if unit else value
+    try:
+        size = int(float(number) * SIZE_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'无效的大小: {text}（示例: 700M, 4G）')
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f'大小必须大于 0: {text}')
+    return size
+
+
+class VolumeWriter:
+    def __init__(self, base_path: str, volume_size: int):
+        self.base_path = base_path
+        self.volume_size = volume_size
+        self.volumes: List[Dict[str, Any]] = []
+        self.position = 0
+        self.current = None
+        self.current_name = ''
+        self.current_size = 0
+        self.current_hash = None
+
+    def _open_next_volume(self):
+        self._close_current_volume()
+        self.current_name = f'{os.path.basename(self.base_path)}.{len(self.volumes) + 1:03d}'
+        self.current = open(os.path.join(os.path.dirname(self.base_path), self.current_name), 'wb')
+        self.current_size = 0
+        self.current_hash = hashlib.sha256()
+
+    def _close_current_volume(self):
+        if self.current is None:
+            return
+        self.current.close()
+        self.volumes.append({
+            'name': self.current_name,
+            'size': self.current_size,
+            'sha256': self.current_hash.hexdigest()
+        })
+        self.current = None
+
+    def write(self, data) -> int:
+        view = memoryview(data)
+        written = len(view)
+        while view:
+            if self.current is None or self.current_size >= self.volume_size:
+                self._open_next_volume()
+            part = view[:self.volume_size - self.current_size]
+            self.current.write(part)
+            self.current_hash.update(part)
+            self.current_size += len(part)
+            view = view[len(part):]
+        self.position += written
+        return written
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self):
+        self._close_current_volume()
+
+    def write_manifest(self) -> str:
+        manifest_path = f'{self.base_path}.volumes.json'
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'archive': os.path.basename(self.base_path),
+                'volume_size': self.volume_size,
+                'total_size': self.position,
+                'volumes': self.volumes
+            }, f, indent=2, ensure_ascii=False)
+        return manifest_path
+
+
+def create_image_tar(
+    imgdir: str,
+    repository: str,
+    tag: str,
+    arch: str,
+    output_dir: Path,
+    compress: Optional[str] = None,
+    compress_level: Optional[int] = None,
+    split_size: Optional[int] = None,
+    name_suffix: str = ''
+) -> str:
+    import tarfile
+
     safe_repo = repository.replace("/", "_")
-    docker_tar = str(output_dir / f'{safe_repo}_{tag}_{arch}.tar')
+    suffix = COMPRESS_SUFFIXES.get(compress, '.tar')
+    docker_tar = str(output_dir / f'{safe_repo}_{tag}_{arch}{name_suffix}{suffix}')
     try:
-        with tarfile.open(docker_tar, "w") as tar:
-            tar.add(imgdir, arcname='/')
+        if compress:
+            logger.info(f'🗜️  使用 {compress} 并行压缩输出 (level={compress_level if compress_level is not None else COMPRESS_DEFAULT_LEVELS[compress]})')
+        if split_size:
+            logger.info(f'✂️  按 {LayerProgress.format_size(split_size)} 分卷输出')
+            raw = VolumeWriter(docker_tar, split_size)
+        else:
+            raw = open(docker_tar, 'wb')
+        try:
+            writer = open_compressed_writer(raw, compress, compress_level) if compress else raw
+            try:
+                with tarfile.open(fileobj=writer, mode='w') as tar:
+                    tar.add(imgdir, arcname='/')
+            finally:
+                if writer is not raw:
+                    writer.close()
+        finally:
+            raw.close()
+
+        if split_size:
+            docker_tar = raw.write_manifest()
+            logger.info(f'📦 共 {len(raw.volumes)} 个分卷，清单: {docker_tar}')
         logger.debug(f'Docker 镜像已拉取：{docker_tar}')
         
         try:
@@ -1018,6 +2150,713 @@ def create_image_tar(imgdir: str, repository: str, tag: str, arch: str, output_d
         raise
 
 
+def verify_volumes(manifest_path: str, workers: int = 4) -> List[str]:
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    def verify_one(volume: Dict[str, Any]) -> Optional[str]:
+        path = os.path.join(base_dir, volume['name'])
+        if not os.path.exists(path):
+            return f'{volume["name"]}: 文件不存在'
+        if os.path.getsize(path) != volume['size']:
+            return f'{volume["name"]}: 大小不符（期望 {volume["size"]}，实际 {os.path.getsize(path)}）'
+        sha256_hash = hashlib.sha256()
+        with open(path, 'rb') as vf:
+            while True:
+                data = vf.read(DECOMPRESS_BUFFER_SIZE)
+                if not data:
+                    break
+                sha256_hash.update(data)
+        if sha256_hash.hexdigest() != volume['sha256']:
+            return f'{volume["name"]}: SHA256 校验失败'
+        return None
+
+    volumes = manifest['volumes']
+    logger.info(f'🔍 并行校验 {len(volumes)} 个分卷...')
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(volumes)))) as executor:
+        errors = [err for err in executor.map(verify_one, volumes) if err]
+    if errors:
+        for err in errors:
+            logger.error(f'❌ {err}')
+        raise RuntimeError(f'{len(errors)} 个分卷校验失败')
+    logger.info('✅ 分卷校验通过')
+    return [os.path.join(base_dir, volume['name']) for volume in volumes]
+
+
+def load_volumes(manifest_path: str, load_command: str = 'docker load', workers: int = 4):
+    volume_paths = verify_volumes(manifest_path, workers)
+
+    import shlex
+    import subprocess
+
+    logger.info(f'📥 流式导入: {load_command}')
+    proc = subprocess.Popen(shlex.split(load_command), stdin=subprocess.PIPE)
+    try:
+        for path in volume_paths:
+            with open(path, 'rb') as vf:
+                shutil.copyfileobj(vf, proc.stdin, DECOMPRESS_BUFFER_SIZE)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f'{load_command} 退出码 {returncode}')
+    logger.info('✅ 分卷导入完成')
+
+
+DELTA_INFO_FILE = 'delta.json'
+
+
+def open_archive_stream(path: str) -> tarfile.TarFile:
+    import tarfile
+
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if not magic.startswith(ZSTD_MAGIC):
+        return tarfile.open(path, 'r|*')
+
+    try:
+        from compression import zstd
+        reader = zstd.ZstdFile(path, 'rb')
+    except ImportError:
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError('读取 zstd 镜像包需要 Python 3.14+ 或安装 zstandard 模块（pip install zstandard）')
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    return tarfile.open(fileobj=reader, mode='r|')
+
+
+def read_archive_json(path: str, name: str) -> Any:
+    import tarfile
+
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC) or magic.startswith(ZSTD_MAGIC):
+        tar = open_archive_stream(path)
+    else:
+        # 未压缩的包可随机访问，遍历时只读成员头、跳过层数据（manifest.json 写在包尾）
+        tar = tarfile.open(path, 'r:')
+    with tar:
+        for member in tar:
+            if member.name.removeprefix('./') == name:
+                return json.load(tar.extractfile(member))
+    raise RuntimeError(f'{path} 中没有 {name}')
+
+
+def read_archive_manifest(path: str) -> List[Dict[str, Any]]:
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return read_archive_json(path, 'manifest.json')
+
+
+def load_delta_base_layers(base_path: str) -> set:
+    manifest = read_archive_manifest(base_path)
+    base_layers = {layer for item in manifest for layer in item.get('Layers', [])}
+    logger.info(f'♻️ 基准镜像包 {os.path.basename(base_path)} 含 {len(base_layers)} 个层')
+    return base_layers
+
+
+def write_delta_info(imgdir: str, base_path: str, base_layers: set) -> List[str]:
+    with open(os.path.join(imgdir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    reused = [layer for item in manifest for layer in item['Layers'] if layer in base_layers]
+    with open(os.path.join(imgdir, DELTA_INFO_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'base': os.path.basename(base_path), 'base_layers': reused}, f, indent=2, ensure_ascii=False)
+    return reused
+
+
+def rehydrate_delta(delta_path: str, base_path: str, output_path: Optional[str] = None) -> str:
+    if not output_path:
+        name = os.path.basename(delta_path)
+        for ext in ('.tar.gz', '.tar.zst', '.tar'):
+            if name.endswith(ext):
+                name = name[:-len(ext)]
+                break
+        if name.endswith('.delta'):
+            name = name[:-len('.delta')]
+        output_path = os.path.join(os.path.dirname(os.path.abspath(delta_path)), f'{name}.tar')
+
+    import tarfile
+
+    # 增量包只流式读一遍：复制成员的同时取出 delta.json
+    delta_info = None
+    with tarfile.open(output_path, 'w') as out:
+        with open_archive_stream(delta_path) as delta:
+            for member in delta:
+                if member.name.removeprefix('./') == DELTA_INFO_FILE:
+                    delta_info = json.load(delta.extractfile(member))
+                    continue
+                out.addfile(member, delta.extractfile(member) if member.isfile() else None)
+        if delta_info is None:
+            out.close()
+            os.remove(output_path)
+            raise RuntimeError(f'{delta_path} 中没有 {DELTA_INFO_FILE}')
+        needed = set(delta_info['base_layers'])
+        logger.info(f'♻️ 从基准镜像包 {os.path.basename(base_path)} 补齐 {len(needed)} 个层')
+
+        with open_archive_stream(base_path) as base:
+            for member in base:
+                name = member.name.removeprefix('./')
+                if name in needed and member.isfile():
+                    out.addfile(member, base.extractfile(member))
+                    needed.discard(name)
+
+    if needed:
+        os.remove(output_path)
+        raise RuntimeError(f'基准镜像包中缺少 {len(needed)} 个层: {", ".join(sorted(needed))}')
+    logger.info(f'✅ 已还原完整镜像包: {output_path}')
+    return output_path
+
+
+TOKEN_TTL = 240
+ARCH_PATTERN = re.compile(r'^[A-Za-z0-9._-]+$')
+MANIFEST_CACHE_SIZE = 256
+
+# 下载流水线使用模块级的 progress_display / pull_report / stop_event，同一进程内的 pull() 串行执行
+pull_lock = threading.Lock()
+# 每次 pull() 有自己的取消标志，只有持有 pull_lock 的那次拉取才会把它转成全局的 stop_event
+cancel_lock = threading.Lock()
+active_cancel: Optional[threading.Event] = None
+
+
+def check_arch(arch: str):
+    # arch 会拼进输出目录名和镜像包文件名，只允许普通的架构名
+    if not ARCH_PATTERN.match(arch or ''):
+        raise PullError(f'无效的架构名: {arch!r}')
+
+
+@dataclass
+class ResolvedImage:
+    image: ImageInfo
+    arch: str
+    digest: Optional[str]
+    manifest: Dict[str, Any]
+    platforms: List[str]
+    auth_head: Dict[str, str] = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class PullResult:
+    image: ImageInfo
+    arch: str
+    digest: Optional[str]
+    output_file: str
+    output_dir: str
+    report: Dict[str, Any]
+
+
+# 非交互的库接口：不读 stdin、不退出进程，失败时抛出 PullError 的子类。
+# 同一个 Puller 在多次调用间复用连接池、认证质询、token（TOKEN_TTL 秒）和按 digest 缓存的清单。
+class Puller:
+    def __init__(
+        self,
+        registry: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        plain_http: bool = False,
+        workers: int = 4,
+        output_dir: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        blob_cache: Optional[BlobCache] = None,
+        output_root: Optional[str] = None
+    ):
+        self.registry = registry
+        self.username = username
+        self.password = password
+        self.scheme = 'http' if plain_http else REGISTRY_SCHEME
+        self.workers = workers
+        self.output_dir = output_dir
+        self.progress = progress
+        self.blob_cache = blob_cache
+        self.output_root = output_root
+        self.session = SessionManager.get_session()
+        self.lock = threading.Lock()
+        self.challenges: Dict[str, Optional[Tuple[str, str]]] = {}
+        self.tokens: Dict[Tuple[str, str], Tuple[float, Dict[str, str]]] = {}
+        self.manifests: Dict[str, Dict[str, Any]] = {}
+
+    def _challenge(self, registry: str) -> Optional[Tuple[str, str]]:
+        with self.lock:
+            if registry in self.challenges:
+                return self.challenges[registry]
+        resp = self.session.get(f'{self.scheme}://{registry}/v2/', verify=False, timeout=60)
+        parts = resp.headers.get('WWW-Authenticate', '').split('"')
+        challenge = (parts[1], parts[3]) if len(parts) > 3 else None
+        with self.lock:
+            self.challenges[registry] = challenge
+        return challenge
+
+    def _auth_head(self, info: ImageInfo, refresh: bool = False,
+                   report: Optional[PullReport] = None) -> Dict[str, str]:
+        key = (info.registry, info.repository)
+        now = time.monotonic()
+        with self.lock:
+            cached = self.tokens.get(key)
+        if cached and not refresh and cached[0] > now:
+            return cached[1]
+
+        challenge = self._challenge(info.registry)
+        if challenge is None:
+            auth_head = {'Accept': MANIFEST_ACCEPT}
+        else:
+            try:
+                auth_head = get_auth_head(self.session, challenge[0], challenge[1], info.repository,
+                                          self.username, self.password, report=report)
+            except request_errors() as e:
+                raise AuthError(f'获取 {info.registry}/{info.repository} 的 token 失败: {e}') from e
+        with self.lock:
+            self.tokens[key] = (now + TOKEN_TTL, auth_head)
+        return auth_head
+
+    def _manifest(self, info: ImageInfo, reference: str, auth_head: Dict[str, str],
+                  report: Optional[PullReport] = None) -> Tuple[Dict[str, Any], Optional[str], Dict[str, str]]:
+        with self.lock:
+            cached = self.manifests.get(reference)
+        if cached is not None:
+            return cached, reference, auth_head
+
+        resp, http_code = fetch_manifest(self.session, info.registry, info.repository, reference,
+                                         auth_head, scheme=self.scheme, report=report)
+        if http_code == 401:
+            auth_head = self._auth_head(info, refresh=True, report=report)
+            resp, http_code = fetch_manifest(self.session, info.registry, info.repository, reference,
+                                             auth_head, scheme=self.scheme, report=report)
+            if http_code == 401:
+                raise AuthError(f'无权访问 {info.registry}/{info.repository}，请检查用户名和密码')
+        try:
+            manifest = resp.json()
+        except ValueError as e:
+            raise ManifestError(f'清单解析失败: {e}') from e
+
+        digest = resp.headers.get('Docker-Content-Digest') or (reference if reference.startswith('sha256:') else None)
+        if digest:
+            with self.lock:
+                if len(self.manifests) >= MANIFEST_CACHE_SIZE:
+                    self.manifests.pop(next(iter(self.manifests)))
+                self.manifests[digest] = manifest
+        return manifest, digest, auth_head
+
+    def resolve(self, image: str, arch: str = 'amd64') -> ResolvedImage:
+        return self._resolve(image, arch)
+
+    def _resolve(self, image: str, arch: str, report: Optional[PullReport] = None) -> ResolvedImage:
+        # 只有 pull() 内部的解析才记入本次拉取的报告，并发的 resolve() 不碰全局 pull_report
+        check_arch(arch)
+        info = parse_image_input(image, self.registry)
+        try:
+            auth_head = self._auth_head(info, report=report)
+            manifest, digest, auth_head = self._manifest(info, info.tag, auth_head, report)
+            platforms: List[str] = []
+            manifests = manifest.get('manifests')
+            if manifests is not None:
+                platforms = list_platforms(manifests)
+                digest = select_manifest(manifests, arch)
+                if not digest:
+                    raise PlatformNotFoundError(arch, platforms)
+                manifest, _, auth_head = self._manifest(info, digest, auth_head, report)
+        except request_errors() as e:
+            if getattr(getattr(e, 'response', None), 'status_code', None) == 404:
+                raise ManifestError(f'镜像不存在: {info.registry}/{info.repository}:{info.tag}') from e
+            raise PullError(f'连接仓库失败: {e}') from e
+
+        if 'layers' not in manifest or 'config' not in manifest:
+            raise ManifestError('清单格式不完整，缺少必要字段')
+        return ResolvedImage(info, arch, digest, manifest, platforms, auth_head)
+
+    def pull(
+        self,
+        image: Union[str, ResolvedImage],
+        arch: str = 'amd64',
+        output: Optional[str] = None,
+        compress: Optional[str] = None,
+        compress_level: Optional[int] = None,
+        split_size: Optional[int] = None,
+        delta_base: Optional[str] = None,
+        report_path: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> PullResult:
+        global pull_report, progress_display, active_cancel
+        cancel_event = cancel_event or threading.Event()
+        with pull_lock:
+            with cancel_lock:
+                if cancel_event.is_set():
+                    raise PullCancelled('拉取已取消')
+                stop_event.clear()
+                active_cancel = cancel_event
+            pull_report = PullReport()
+            display = CallbackProgressDisplay(progress or self.progress)
+            progress_display = display
+            try:
+                resolved = self._resolve(image, arch, pull_report) if isinstance(image, str) else image
+                check_arch(resolved.arch)
+                info = resolved.image
+                manifest = resolved.manifest
+                pull_report.image = {
+                    'registry': info.registry,
+                    'repository': info.repository,
+                    'tag': info.tag,
+                    'arch': resolved.arch,
+                }
+                output_dir = get_output_dir(info.repository, info.tag, resolved.arch, output or self.output_dir,
+                                            root=self.output_root)
+                imgdir = str(output_dir / 'layers')
+                base_layers = load_delta_base_layers(delta_base) if delta_base else None
+                # 预先 resolve 的结果可能已放置很久，token 按 TOKEN_TTL 重新取
+                auth_head = self._auth_head(info, report=pull_report)
+
+                download_layers(
+                    self.session, info.registry, info.repository,
+                    manifest['layers'], auth_head, imgdir, manifest,
+                    get_imgparts(info), info.image_name, info.tag, resolved.arch,
+                    output_dir, self.workers, reuse_layers=base_layers,
+                    display=display, scheme=self.scheme, blob_cache=self.blob_cache
+                )
+                if base_layers is not None:
+                    write_delta_info(imgdir, delta_base, base_layers)
+
+                with pull_report.phase('archive'):
+                    output_file = create_image_tar(
+                        imgdir, info.repository, info.tag, resolved.arch, output_dir,
+                        compress=compress, compress_level=compress_level, split_size=split_size,
+                        name_suffix='.delta' if base_layers is not None else ''
+                    )
+                pull_report.finish('ok')
+            except KeyboardInterrupt as e:
+                pull_report.finish('cancelled')
+                raise PullCancelled('拉取已取消') from e
+            except PullError as e:
+                pull_report.finish('failed', e)
+                raise
+            except request_errors() as e:
+                pull_report.finish('failed', e)
+                raise PullError(f'网络连接失败: {e}') from e
+            except Exception as e:
+                pull_report.finish('failed', e)
+                raise PullError(str(e)) from e
+            finally:
+                with cancel_lock:
+                    active_cancel = None
+                display.summary(pull_report)
+                if report_path:
+                    pull_report.write(report_path)
+
+            return PullResult(info, resolved.arch, resolved.digest, output_file, str(output_dir),
+                              pull_report.to_dict())
+
+    def cancel(self, cancel_event: Optional[threading.Event] = None):
+        # 不指定 cancel_event 时中断当前正在进行的拉取；指定时只取消对应的那次 pull()，排队中的在开始前放弃
+        with cancel_lock:
+            if cancel_event is None:
+                stop_event.set()
+                return
+            cancel_event.set()
+            if active_cancel is cancel_event:
+                stop_event.set()
+
+    async def resolve_async(self, image: str, arch: str = 'amd64') -> ResolvedImage:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.resolve, image, arch))
+
+    async def pull_async(self, image: Union[str, ResolvedImage], arch: str = 'amd64', **kwargs) -> PullResult:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        cancel_event = kwargs.setdefault('cancel_event', threading.Event())
+        callback = kwargs.pop('progress', None) or self.progress
+        if callback is not None:
+            # 进度事件在下载线程中产生，转交到事件循环线程里调用回调
+            target = callback
+            kwargs['progress'] = lambda event: loop.call_soon_threadsafe(target, event)
+        try:
+            return await loop.run_in_executor(None, functools.partial(self.pull, image, arch, **kwargs))
+        except asyncio.CancelledError:
+            self.cancel(cancel_event)
+            raise
+
+
+DAEMON_LISTEN = '127.0.0.1:8765'
+DAEMON_MAX_PULLERS = 32
+
+
+def pull_error_dict(e: PullError) -> Dict[str, Any]:
+    data = {'type': type(e).__name__, 'message': str(e)}
+    if isinstance(e, PlatformNotFoundError):
+        data['platforms'] = e.platforms
+    return data
+
+
+# 常驻进程：按 仓库前缀 + 凭据 复用 Puller，连接池、token、清单缓存和 blob 缓存在任务之间保持热状态
+class PullDaemon:
+    def __init__(self, output_dir: Optional[str] = None, workers: int = 4, plain_http: bool = False,
+                 blob_cache: Optional[BlobCache] = None):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.plain_http = plain_http
+        self.blob_cache = blob_cache
+        self.lock = threading.Lock()
+        # 按 (仓库, 凭据摘要, plain_http) 缓存 Puller，最多 DAEMON_MAX_PULLERS 个，最久未用的先淘汰
+        self.pullers: Dict[tuple, Puller] = {}
+        self.key_salt = os.urandom(16)
+        self.started_at = time.time()
+        self.jobs = 0
+        self.completed = 0
+        self.failed = 0
+
+    def get_puller(self, options: Dict[str, Any]) -> Puller:
+        username, password = options.get('username'), options.get('password')
+        credentials = hashlib.sha256(self.key_salt + json.dumps([username, password]).encode('utf-8')).hexdigest()
+        plain_http = bool(options.get('plain_http', self.plain_http))
+        key = (options.get('registry'), credentials, plain_http)
+        with self.lock:
+            puller = self.pullers.pop(key, None)
+            if puller is None:
+                puller = Puller(registry=key[0], username=username, password=password, plain_http=plain_http,
+                                workers=self.workers, output_dir=self.output_dir, blob_cache=self.blob_cache,
+                                output_root=self.output_dir or os.getcwd())
+                while len(self.pullers) >= DAEMON_MAX_PULLERS:
+                    self.pullers.pop(next(iter(self.pullers)))
+            self.pullers[key] = puller
+            return puller
+
+    def confine_path(self, value: Optional[str], field_name: str) -> Optional[str]:
+        # 请求里的路径只能是输出根目录下的相对路径：TCP 监听没有认证，不能让本机其它用户借守护进程读写任意位置
+        if not value:
+            return None
+        root = os.path.realpath(self.output_dir or os.getcwd())
+        path = Path(str(value))
+        if path.is_absolute() or path.drive or '..' in path.parts:
+            raise ValueError(f'{field_name} 必须是输出根目录下的相对路径')
+        full = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, full]) != root:
+            raise ValueError(f'{field_name} 超出了输出根目录')
+        return full
+
+    def job_started(self) -> int:
+        with self.lock:
+            ahead = self.jobs
+            self.jobs += 1
+            metrics.set('docker_pull_daemon_jobs', self.jobs)
+        return ahead
+
+    def job_finished(self, ok: bool):
+        with self.lock:
+            self.jobs -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            metrics.set('docker_pull_daemon_jobs', self.jobs)
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            pullers = list(self.pullers.values())
+            data = {
+                'version': VERSION,
+                'uptime_s': round(time.time() - self.started_at, 1),
+                'jobs': self.jobs,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+        data['tokens'] = sum(len(p.tokens) for p in pullers)
+        data['manifests'] = sum(len(p.manifests) for p in pullers)
+        data['blob_cache'] = self.blob_cache.stats() if self.blob_cache else None
+        return data
+
+
+def make_daemon_handler(daemon: PullDaemon):
+    from http.server import BaseHTTPRequestHandler
+
+    class DaemonHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, data: Dict[str, Any]):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_options(self) -> Optional[Dict[str, Any]]:
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                options = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send_json(400, {'type': 'BadRequest', 'message': '请求体不是合法的 JSON'})
+                return None
+            if not isinstance(options, dict) or not options.get('image'):
+                self._send_json(400, {'type': 'BadRequest', 'message': '缺少 image 字段'})
+                return None
+            return options
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/health':
+                self._send_json(200, daemon.health())
+            elif path == '/metrics':
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            if path not in ('/pull', '/resolve'):
+                self.send_error(404)
+                return
+            options = self._read_options()
+            if options is None:
+                return
+            try:
+                check_arch(options.get('arch', 'amd64'))
+            except PullError as e:
+                self._send_json(400, {'type': 'BadRequest', 'message': str(e)})
+                return
+            puller = daemon.get_puller(options)
+            if path == '/pull':
+                try:
+                    paths = {name: daemon.confine_path(options.get(name), name)
+                             for name in ('output', 'report', 'delta_base')}
+                except ValueError as e:
+                    self._send_json(400, {'type': 'BadRequest', 'message': str(e)})
+                    return
+                self._stream_pull(puller, {**options, **paths})
+                return
+
+            try:
+                resolved = puller.resolve(options['image'], options.get('arch', 'amd64'))
+            except PullError as e:
+                status = 401 if isinstance(e, AuthError) else 404 if isinstance(e, ManifestError) else 502
+                self._send_json(status, pull_error_dict(e))
+                return
+            info = resolved.image
+            self._send_json(200, {
+                'image': f'{info.registry}/{info.repository}:{info.tag}',
+                'arch': resolved.arch,
+                'digest': resolved.digest,
+                'platforms': resolved.platforms,
+                'layers': [{'digest': l['digest'], 'size': l.get('size', 0)} for l in resolved.manifest['layers']],
+                'size': sum(l.get('size', 0) for l in resolved.manifest['layers']),
+            })
+
+        def _stream_pull(self, puller: Puller, options: Dict[str, Any]):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            write_lock = threading.Lock()
+            disconnected = threading.Event()
+            cancel_event = threading.Event()
+
+            def send(event: Dict[str, Any]):
+                line = (json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+                with write_lock:
+                    if disconnected.is_set():
+                        return
+                    try:
+                        self.wfile.write(line)
+                        self.wfile.flush()
+                    except OSError:
+                        # 客户端断开时取消任务，已下载的层留在输出目录，再次请求时断点续传
+                        disconnected.set()
+                        puller.cancel(cancel_event)
+
+            send({'event': 'queued', 'ts': round(time.time(), 3), 'jobs_ahead': daemon.job_started()})
+            ok = False
+            try:
+                split_size = options.get('split_size')
+                result = puller.pull(
+                    options['image'], options.get('arch', 'amd64'),
+                    output=options.get('output'),
+                    compress=options.get('compress'),
+                    compress_level=options.get('compress_level'),
+                    split_size=parse_size(str(split_size)) if split_size else None,
+                    delta_base=options.get('delta_base'),
+                    report_path=options.get('report'),
+                    progress=send,
+                    cancel_event=cancel_event
+                )
+                ok = True
+                info = result.image
+                send({
+                    'event': 'result',
+                    'image': f'{info.registry}/{info.repository}:{info.tag}',
+                    'arch': result.arch,
+                    'digest': result.digest,
+                    'output_file': result.output_file,
+                    'output_dir': result.output_dir,
+                    'report': result.report,
+                })
+            except PullError as e:
+                send({'event': 'error', **pull_error_dict(e)})
+            except argparse.ArgumentTypeError as e:
+                send({'event': 'error', 'type': 'BadRequest', 'message': str(e)})
+            finally:
+                daemon.job_finished(ok)
+
+        def log_message(self, format, *args):
+            logger.debug(f'[daemon] {format % args}')
+
+    return DaemonHandler
+
+
+def start_daemon_server(daemon: PullDaemon, listen: str):
+    handler = make_daemon_handler(daemon)
+    if listen.startswith('unix:'):
+        import socket
+        import socketserver
+        import stat
+
+        if not hasattr(socket, 'AF_UNIX'):
+            raise PullError('当前系统不支持 Unix socket，请改用 host:port')
+        path = listen[len('unix:'):]
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise PullError(f'{path} 已存在且不是 socket 文件')
+            os.remove(path)
+
+        class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        server = UnixHTTPServer(path, handler)
+        os.chmod(path, 0o600)
+        return server
+
+    from http.server import ThreadingHTTPServer
+
+    host, _, port = listen.rpartition(':')
+    server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), handler)
+    server.daemon_threads = True
+    return server
+
+
+def run_daemon(listen: str, output_dir: Optional[str], workers: int, blob_cache: Optional[BlobCache]):
+    daemon = PullDaemon(output_dir, workers, REGISTRY_SCHEME == 'http', blob_cache)
+    server = start_daemon_server(daemon, listen)
+    logger.info(f'🛰️  守护进程已启动: {listen}（POST /pull、POST /resolve、GET /health、GET /metrics）')
+    if blob_cache:
+        logger.info(f'🗃️  blob 缓存目录: {blob_cache.directory}')
+    # 守护进程里 Ctrl+C 直接退出，不走拉取时"先保存进度"的两段式处理
+    signal.signal(signal.SIGINT, original_sigint_handler or signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info('⚠️ 守护进程退出')
+    finally:
+        stop_event.set()
+        server.server_close()
+        if listen.startswith('unix:') and os.path.exists(listen[len('unix:'):]):
+            os.remove(listen[len('unix:'):])
+
+
 def cleanup_tmp_dir():
     tmp_dir = 'tmp'
     try:
@@ -1030,6 +2869,10 @@ def cleanup_tmp_dir():
 
 
 def main():
+    setup_console()
+    report_path = None
+    interactive = True
+    exit_code = 0
     try:
         parser = argparse.ArgumentParser(
             description="Docker 镜像拉取工具 - 无需Docker环境直接下载镜像",
@@ -1051,7 +2894,24 @@ def main():
         parser.add_argument("-o", "--output", help="输出目录，默认为当前目录下的镜像名_tag_arch目录")
         parser.add_argument("-v", "--version", action="version", version=f"%(prog)s {VERSION}", help="显示版本信息")
         parser.add_argument("--debug", action="store_true", help="启用调试模式，打印请求 URL 和连接状态")
+        parser.add_argument("--plain-http", action="store_true", help="使用 HTTP 而非 HTTPS 访问仓库（本地/内网仓库）")
+        parser.add_argument("--http2", action="store_true", help="使用 HTTP/2（需要 pip install \"httpx[http2]\"），并发分片复用少量连接，适合高延迟链路")
         parser.add_argument("--workers", type=int, default=4, help="并发下载线程数，默认4")
+        parser.add_argument("--compress", choices=sorted(COMPRESS_SUFFIXES), help="直接输出压缩包（gzip: .tar.gz 多线程分块压缩；zstd: .tar.zst 多线程压缩）")
+        parser.add_argument("--compress-level", type=int, help="压缩级别，默认 gzip=6, zstd=3")
+        parser.add_argument("--split-size", type=parse_size, help="按指定大小分卷输出（例如 700M, 4G），同时生成分卷校验清单")
+        parser.add_argument("--load-volumes", metavar="MANIFEST", help="并行校验分卷并流式导入到 docker load（参数为 .volumes.json 清单）")
+        parser.add_argument("--load-command", default="docker load", help="配合 --load-volumes 使用的导入命令，默认 docker load")
+        parser.add_argument("--delta-base", metavar="BASE", help="增量导出：基准镜像包（.tar/.tar.gz/.tar.zst）或其 manifest.json，只打包新增的层")
+        parser.add_argument("--rehydrate", metavar="DELTA", help="配合 --delta-base：将增量包与基准镜像包合并还原为完整镜像包")
+        parser.add_argument("--progress", choices=["tty", "json"], default="tty", help="进度输出方式：tty 终端进度条（默认）；json 输出 NDJSON 进度事件，便于 CI/编排系统解析")
+        parser.add_argument("--progress-fd", type=int, help="配合 --progress=json，将进度事件写入指定的文件描述符（默认 stdout）")
+        parser.add_argument("--metrics-port", type=int, help="在指定端口启动 Prometheus 指标服务（/metrics）")
+        parser.add_argument("--report", metavar="PATH", help="各阶段耗时报告（JSON）的保存路径，默认写入输出目录下的 pull_report.json")
+        parser.add_argument("--blob-cache", nargs="?", const=BLOB_CACHE_DIR, metavar="DIR", help=f"按 digest 缓存已下载的 blob，多个镜像共享的层只下载一次（默认目录 {BLOB_CACHE_DIR}）")
+        parser.add_argument("--blob-cache-size", type=parse_size, help="blob 缓存上限（例如 50G），超出时按最近使用时间淘汰")
+        parser.add_argument("--daemon", action="store_true", help="以守护进程运行，通过本地 HTTP / Unix socket 接收拉取任务（默认开启 blob 缓存）")
+        parser.add_argument("--listen", default=DAEMON_LISTEN, help=f"配合 --daemon 使用的监听地址，host:port 或 unix:/path/to.sock，默认 {DAEMON_LISTEN}")
 
         logger.info(f'🚀 Docker 镜像拉取工具 {VERSION}')
 
@@ -1060,6 +2920,52 @@ def main():
         if args.debug:
             logger.setLevel(logging.DEBUG)
 
+        if args.plain_http:
+            global REGISTRY_SCHEME
+            REGISTRY_SCHEME = 'http'
+
+        if args.http2:
+            SessionManager.use_http2 = True
+
+        if args.progress == 'json':
+            global PROGRESS_MODE, progress_stream, progress_display
+            PROGRESS_MODE = 'json'
+            if args.progress_fd is not None:
+                progress_stream = os.fdopen(args.progress_fd, 'w', encoding='utf-8', closefd=False)
+            progress_display = create_progress_display()
+
+        if args.metrics_port:
+            start_metrics_server(args.metrics_port)
+            logger.info(f'📈 Prometheus 指标: http://0.0.0.0:{args.metrics_port}/metrics')
+
+        blob_cache = None
+        if args.blob_cache or args.daemon:
+            blob_cache = BlobCache(args.blob_cache or BLOB_CACHE_DIR, args.blob_cache_size or 0)
+
+        if args.daemon:
+            interactive = False
+            run_daemon(args.listen, args.output, args.workers, blob_cache)
+            return
+
+        if args.load_volumes:
+            # 一般在脚本里调用：不等回车，导入失败时以非零退出码结束
+            interactive = False
+            exit_code = 1
+            load_volumes(args.load_volumes, args.load_command, args.workers)
+            exit_code = 0
+            return
+
+        if args.rehydrate:
+            interactive = False
+            exit_code = 1
+            if not args.delta_base:
+                logger.error('错误：--rehydrate 需要配合 --delta-base 指定基准镜像包')
+                return
+            output_file = rehydrate_delta(args.rehydrate, args.delta_base)
+            logger.info(f'💡 导入命令: docker load -i {output_file}')
+            exit_code = 0
+            return
+
         if not args.image:
             args.image = input("请输入 Docker 镜像名称（例如：nginx:latest 或 harbor.abc.com/abc/nginx:1.26.0）：").strip()
             if not args.image:
@@ -1083,6 +2989,13 @@ def main():
                 args.custom_registry = None
 
         image_info = parse_image_input(args.image, args.custom_registry)
+        report_path = args.report
+        pull_report.image = {
+            'registry': image_info.registry,
+            'repository': image_info.repository,
+            'tag': image_info.tag,
+            'arch': args.arch,
+        }
 
         if not args.username and not args.quiet:
             args.username = input("请输入镜像仓库用户名：").strip() or None
@@ -1093,19 +3006,20 @@ def main():
         auth_head = None
 
         try:
-            url = f'https://{image_info.registry}/v2/'
+            url = f'{REGISTRY_SCHEME}://{image_info.registry}/v2/'
             logger.debug(f"获取认证信息: {url}")
-            resp = session.get(url, verify=False, timeout=60)
+            with pull_report.phase('ping'):
+                resp = session.get(url, verify=False, timeout=60)
             auth_url = resp.headers['WWW-Authenticate'].split('"')[1]
             reg_service = resp.headers['WWW-Authenticate'].split('"')[3]
             auth_head = get_auth_head(
                 session, auth_url, reg_service, image_info.repository,
-                args.username, args.password
+                args.username, args.password, report=pull_report
             )
 
             resp, http_code = fetch_manifest(
                 session, image_info.registry, image_info.repository,
-                image_info.tag, auth_head
+                image_info.tag, auth_head, report=pull_report
             )
 
             if http_code == 401:
@@ -1115,14 +3029,14 @@ def main():
                     args.password = input("请输入密码: ").strip()
                 auth_head = get_auth_head(
                     session, auth_url, reg_service, image_info.repository,
-                    args.username, args.password
+                    args.username, args.password, report=pull_report
                 )
 
             resp, http_code = fetch_manifest(
                 session, image_info.registry, image_info.repository,
-                image_info.tag, auth_head
+                image_info.tag, auth_head, report=pull_report
             )
-        except requests.exceptions.RequestException as e:
+        except request_errors() as e:
             logger.error(f'连接仓库失败: {e}')
             raise
 
@@ -1130,11 +3044,7 @@ def main():
 
         manifests = resp_json.get('manifests')
         if manifests is not None:
-            archs = [
-                m.get('annotations', {}).get('com.docker.official-images.bashbrew.arch') or
-                m.get('platform', {}).get('architecture')
-                for m in manifests if m.get('platform', {}).get('os') == 'linux'
-            ]
+            archs = list_platforms(manifests)
 
             if archs:
                 logger.info(f'📋 当前可用架构：{", ".join(archs)}')
@@ -1157,10 +3067,11 @@ def main():
                 logger.error(f'在清单中找不到指定的架构 {args.arch}')
                 return
 
-            url = f'https://{image_info.registry}/v2/{image_info.repository}/manifests/{digest}'
+            url = f'{REGISTRY_SCHEME}://{image_info.registry}/v2/{image_info.repository}/manifests/{digest}'
             logger.debug(f'获取架构清单: {url}')
 
-            manifest_resp = session.get(url, headers=auth_head, verify=False, timeout=60)
+            with pull_report.phase('manifest'):
+                manifest_resp = session.get(url, headers=auth_head, verify=False, timeout=60)
             try:
                 manifest_resp.raise_for_status()
                 resp_json = manifest_resp.json()
@@ -1178,10 +3089,11 @@ def main():
         else:
             config_digest = resp_json.get('config', {}).get('digest')
             if config_digest:
-                config_url = f'https://{image_info.registry}/v2/{image_info.repository}/blobs/{config_digest}'
+                config_url = f'{REGISTRY_SCHEME}://{image_info.registry}/v2/{image_info.repository}/blobs/{config_digest}'
                 logger.debug(f'获取镜像配置: {config_url}')
                 try:
-                    config_resp = session.get(config_url, headers=auth_head, verify=False, timeout=60)
+                    with pull_report.phase('config'):
+                        config_resp = session.get(config_url, headers=auth_head, verify=False, timeout=60)
                     config_resp.raise_for_status()
                     config_json = config_resp.json()
                     actual_arch = config_json.get('architecture', 'unknown')
@@ -1215,50 +3127,77 @@ def main():
 
         output_dir = get_output_dir(image_info.repository, image_info.tag, args.arch, args.output)
         imgdir = str(output_dir / 'layers')
+        pull_report.image['arch'] = args.arch
+        report_path = args.report or str(output_dir / 'pull_report.json')
         os.makedirs(imgdir, exist_ok=True)
         logger.info(f'📁 输出目录：{output_dir}')
         logger.info('📥 开始下载...')
 
-        if image_info.registry == 'registry-1.docker.io' and image_info.repository.startswith('library/'):
-            imgparts = []
-        else:
-            imgparts = image_info.repository.split('/')[:-1]
+        imgparts = get_imgparts(image_info)
+
+        base_layers = load_delta_base_layers(args.delta_base) if args.delta_base else None
 
         download_layers(
             session, image_info.registry, image_info.repository,
             resp_json['layers'], auth_head, imgdir, resp_json,
             imgparts, image_info.image_name, image_info.tag, args.arch,
-            output_dir, args.workers
+            output_dir, args.workers, reuse_layers=base_layers, blob_cache=blob_cache
         )
 
-        output_file = create_image_tar(imgdir, image_info.repository, image_info.tag, args.arch, output_dir)
+        if base_layers is not None:
+            reused = write_delta_info(imgdir, args.delta_base, base_layers)
+            logger.info(f'♻️ 增量包复用基准镜像包中的 {len(reused)} 个层')
+
+        with pull_report.phase('archive'):
+            output_file = create_image_tar(
+                imgdir, image_info.repository, image_info.tag, args.arch, output_dir,
+                compress=args.compress, compress_level=args.compress_level, split_size=args.split_size,
+                name_suffix='.delta' if base_layers is not None else ''
+            )
+        pull_report.finish('ok')
         logger.info(f'✅ 镜像已保存为: {output_file}')
-        logger.info(f'💡 导入命令: docker load -i {output_file}')
+        if base_layers is not None:
+            logger.info(f'💡 还原命令: {os.path.basename(sys.argv[0])} --rehydrate {output_file} --delta-base {os.path.basename(args.delta_base)}')
+        elif args.split_size:
+            logger.info(f'💡 导入命令: {os.path.basename(sys.argv[0])} --load-volumes {output_file}')
+        else:
+            logger.info(f'💡 导入命令: docker load -i {output_file}')
         if image_info.registry not in ("registry-1.docker.io", "docker.io"):
             logger.info(f'💡 标签命令: docker tag {image_info.repository}:{image_info.tag} {image_info.registry}/{image_info.repository}:{image_info.tag}')
 
     except KeyboardInterrupt:
+        pull_report.finish('cancelled')
         logger.info('⚠️ 用户取消操作。')
-    except requests.exceptions.RequestException as e:
+    except request_errors() as e:
+        pull_report.finish('failed', e)
         logger.error(f'❌ 网络连接失败: {e}')
     except json.JSONDecodeError as e:
+        pull_report.finish('failed', e)
         logger.error(f'❌ JSON解析失败: {e}')
     except FileNotFoundError as e:
+        pull_report.finish('failed', e)
         logger.error(f'❌ 文件操作失败: {e}')
     except argparse.ArgumentError as e:
+        pull_report.finish('failed', e)
         logger.error(f'❌ 命令行参数错误: {e}')
     except Exception as e:
+        pull_report.finish('failed', e)
         logger.error(f'❌ 程序运行过程中发生异常: {e}')
         import traceback
         logger.debug(traceback.format_exc())
 
     finally:
         cleanup_tmp_dir()
-        try:
-            input("\n按回车键退出程序...")
-        except (KeyboardInterrupt, EOFError):
-            pass
-        sys.exit(0)
+        if report_path:
+            pull_report.finish('failed')
+            progress_display.summary(pull_report)
+            pull_report.write(report_path)
+        if interactive and PROGRESS_MODE != 'json':
+            try:
+                input("\n按回车键退出程序...")
+            except (KeyboardInterrupt, EOFError):
+                pass
+        sys.exit(exit_code)
 
 
 if __name__ == '__main__':
@@ -19,12 +19,14 @@ import urllib3
 import argparse
 import logging
 import base64
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from typing import Optional, Dict, List, Tuple, Any
 from pathlib import Path
 import io
 import signal
+import queue
+from collections import OrderedDict
 
 """
 1ms Docker 镜像下载专版
@@ -48,6 +50,8 @@ VERSION = "v1.0.0-1ms"
 DEFAULT_1MS_REGISTRY = "docker.1ms.run"
 # 1ms 搜索 API（搜索镜像用）
 DEFAULT_1MS_API = "https://1ms.run/api/v1/registry"
+# registry 访问协议（本地/内网 HTTP 仓库可通过 --plain-http 切换）
+REGISTRY_SCHEME = "https"
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s", encoding="utf-8")
 logger = logging.getLogger(__name__)
@@ -284,6 +288,202 @@ class SessionManager:
         return session
 
 
+# 1ms 搜索/Tag 接口缓存：TTL 内直接返回；过期但未超过 stale 期限时先返回旧值并在后台刷新
+API_CACHE_TTL = 300
+API_CACHE_STALE_TTL = 3600
+API_CACHE_MAX_ENTRIES = 512
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_AGE = 60
+PREFETCH_TOP_ITEMS = 3
+TAG_PAGE_SIZE = 8
+TAG_INDEX_PAGE_SIZE = 100
+TAG_INDEX_WORKERS = 8
+TAG_INDEX_DIR = Path.home() / ".cache" / "docker_image_puller_1ms" / "tags"
+MANIFEST_CACHE_FILE = TAG_INDEX_DIR.parent / "manifests.json"
+MANIFEST_CACHE_TTL = 30 * 24 * 3600
+ARCH_MATRIX_WORKERS = 8
+ARCH_MATRIX_MAX_TAGS = 30
+MANIFEST_ACCEPT = ", ".join(
+    [
+        "application/vnd.docker.distribution.manifest.v2+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        "application/vnd.oci.image.index.v1+json",
+        "application/vnd.oci.image.manifest.v1+json",
+    ]
+)
+
+
+def cache_key(*parts) -> str:
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+
+
+class TTLCache:
+    # autosave=False 时 set() 只标记脏数据，由调用方在批量写入结束后 flush() 一次落盘
+    def __init__(self, ttl=API_CACHE_TTL, stale_ttl=API_CACHE_STALE_TTL, max_entries=API_CACHE_MAX_ENTRIES, disk_path=None, autosave=True):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.autosave = autosave
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.refreshing = set()
+        if disk_path:
+            self._load()
+
+    def get_or_load(self, key: str, loader):
+        if self.ttl <= 0:
+            return loader()
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.ttl:
+                return value
+            if age < self.stale_ttl:
+                self._refresh_async(key, loader)
+                return value
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def set(self, key: str, value):
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+        if self.disk_path and self.autosave:
+            self._save()
+
+    def flush(self):
+        if self.disk_path and self.dirty:
+            self._save()
+
+    def _refresh_async(self, key: str, loader):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, loader())
+            except Exception:
+                pass  # 刷新失败时继续使用旧值
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _load(self):
+        try:
+            with open(self.disk_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, (value, stored_at) in data.get("entries", {}).items():
+            if now - stored_at < self.stale_ttl:
+                self.entries[key] = (value, stored_at)
+
+    def _save(self):
+        with self.lock:
+            data = {"entries": {k: [v, t] for k, (v, t) in self.entries.items()}}
+            self.dirty = False
+        tmp_path = f"{self.disk_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.disk_path)
+        except OSError:
+            pass
+
+
+api_cache = TTLCache()
+
+
+# 用户浏览当前页时在后台预取相邻页和候选镜像的详情/Tag；前台请求同一数据时直接复用进行中或已完成的结果。
+# 任务后进先出：快速翻页时优先预取最新一页附近的数据
+class Prefetcher:
+    def __init__(self, workers=PREFETCH_WORKERS, max_age=PREFETCH_MAX_AGE, enabled=True):
+        self.workers = workers
+        self.max_age = max_age
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.tasks: "queue.LifoQueue" = queue.LifoQueue()
+        self.threads: List[threading.Thread] = []
+        self.futures: "OrderedDict[str, Tuple[Future, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(fn, args) -> str:
+        return cache_key(fn.__name__, *args)
+
+    def submit(self, fn, session: requests.Session, *args):
+        if not self.enabled:
+            return
+        key = self._key(fn, args)
+        with self.lock:
+            if key in self.futures:
+                return
+            future = Future()
+            self.futures[key] = (future, time.time())
+            while len(self.futures) > API_CACHE_MAX_ENTRIES:
+                self.futures.popitem(last=False)
+            if len(self.threads) < self.workers:
+                thread = threading.Thread(target=self._worker, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        self.tasks.put((future, fn, session, args))
+
+    def _worker(self):
+        while True:
+            future, fn, session, args = self.tasks.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(session, *args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def get(self, fn, session: requests.Session, *args):
+        with self.lock:
+            entry = self.futures.pop(self._key(fn, args), None)
+        if entry is not None:
+            future, submitted_at = entry
+            # 还在排队的预取直接取消，由前台自己请求，避免排在其他预取后面
+            if not future.cancel() and time.time() - submitted_at < self.max_age:
+                try:
+                    return future.result()
+                except Exception:
+                    pass  # 预取失败时前台重新请求
+        return fn(session, *args)
+
+
+prefetcher = Prefetcher()
+
+
+def prefetch_search_neighbours(session: requests.Session, api_base: str, keyword: str, page: int, page_size: int,
+                               total_pages: int, items: List[Dict[str, Any]]):
+    # 先提交的后执行：相邻页放在最后提交，最先被预取
+    for it in reversed(items[:PREFETCH_TOP_ITEMS]):
+        if not it.get("name"):
+            continue
+        repositories = f"{it.get('namespace') or 'library'}/{it['name']}"
+        prefetcher.submit(get_tags_1ms, session, api_base, repositories, 1, TAG_PAGE_SIZE, "")
+        prefetcher.submit(get_detail_1ms, session, api_base, repositories)
+    for p in (page - 1, page + 1):
+        if 1 <= p <= total_pages:
+            prefetcher.submit(search_1ms, session, api_base, keyword, p, page_size)
+
+
 def format_big_number(n: int) -> str:
     try:
         n = int(n)
@@ -327,14 +527,7 @@ def get_auth_head(
             access_token = resp.json()["token"]
             return {
                 "Authorization": f"Bearer {access_token}",
-                "Accept": ", ".join(
-                    [
-                        "application/vnd.docker.distribution.manifest.v2+json",
-                        "application/vnd.docker.distribution.manifest.list.v2+json",
-                        "application/vnd.oci.image.index.v1+json",
-                        "application/vnd.oci.image.manifest.v1+json",
-                    ]
-                ),
+                "Accept": MANIFEST_ACCEPT,
             }
         except requests.exceptions.RequestException as e:
             if attempt < max_retries - 1:
@@ -356,7 +549,7 @@ def fetch_manifest(
 ) -> Tuple[requests.Response, int]:
     for attempt in range(max_retries):
         try:
-            url = f"https://{registry}/v2/{repository}/manifests/{tag_or_digest}"
+            url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/manifests/{tag_or_digest}"
             resp = session.get(url, headers=auth_head, verify=False, timeout=60)
             if resp.status_code == 401:
                 return resp, 401
@@ -372,6 +565,33 @@ def fetch_manifest(
     raise RuntimeError("获取 manifest 失败")
 
 
+def registry_auth_head(session: requests.Session, registry: str, repository: str) -> Dict[str, str]:
+    auth_head: Dict[str, str] = {"Accept": MANIFEST_ACCEPT}
+    try:
+        ping_url = f"{REGISTRY_SCHEME}://{registry}/v2/"
+        resp = session.get(ping_url, verify=False, timeout=30)
+        if resp.status_code == 401 and "WWW-Authenticate" in resp.headers:
+            www = resp.headers["WWW-Authenticate"]
+            auth_url = www.split('"')[1]
+            reg_service = www.split('"')[3]
+            auth_head = get_auth_head(session, auth_url, reg_service, repository)
+    except Exception as e:
+        logger.warning(f"连接 registry 探测认证失败，将继续尝试直接拉取 manifest: {e}")
+    return auth_head
+
+
+def head_manifest_digest(session: requests.Session, registry: str, repository: str, tag: str, auth_head: Dict[str, str]) -> Optional[str]:
+    # HEAD 只返回 Docker-Content-Digest，不下载 manifest 内容；部分镜像站不支持时返回 None
+    try:
+        url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/manifests/{tag}"
+        resp = session.head(url, headers=auth_head, verify=False, timeout=30)
+        if resp.status_code == 200:
+            return resp.headers.get("Docker-Content-Digest")
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+
 def select_manifest_digest(manifests: List[Dict[str, Any]], arch: str) -> Optional[str]:
     for m in manifests:
         if (
@@ -453,6 +673,31 @@ def get_file_size(session: requests.Session, url: str, headers: Dict[str, str])
     return 0
 
 
+def update_hash_from_file(sha256_hash, path: str, block_size: int = 65536):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            sha256_hash.update(data)
+
+
+def merge_chunk_files(chunk_paths: List[str], save_path: str, sha256_hash=None, block_size: int = 65536) -> bool:
+    with open(save_path, "wb") as outfile:
+        for chunk_file in chunk_paths:
+            if stop_event.is_set():
+                return False
+            with open(chunk_file, "rb") as infile:
+                while True:
+                    data = infile.read(block_size)
+                    if not data:
+                        break
+                    outfile.write(data)
+                    if sha256_hash:
+                        sha256_hash.update(data)
+    return True
+
+
 def download_file_in_chunks(
     session: requests.Session,
     url: str,
@@ -581,16 +826,8 @@ def download_file_in_chunks(
                 return False
 
         sha256_hash = hashlib.sha256() if expected_digest else None
-        with open(save_path, "wb") as outfile:
-            for _, _, chunk_file in chunk_files:
-                with open(chunk_file, "rb") as infile:
-                    while True:
-                        data = infile.read(65536)
-                        if not data:
-                            break
-                        outfile.write(data)
-                        if sha256_hash:
-                            sha256_hash.update(data)
+        if not merge_chunk_files([chunk_file for _, _, chunk_file in chunk_files], save_path, sha256_hash):
+            return False
 
         shutil.rmtree(temp_dir, ignore_errors=True)
 
@@ -661,12 +898,7 @@ def download_file_with_progress(
 
                 sha256_hash = hashlib.sha256() if expected_digest else None
                 if resume_pos > 0 and sha256_hash:
-                    with open(save_path, "rb") as existing_file:
-                        while True:
-                            chunk = existing_file.read(65536)
-                            if not chunk:
-                                break
-                            sha256_hash.update(chunk)
+                    update_hash_from_file(sha256_hash, save_path)
 
                 if stats:
                     stats.total_size += total_size - resume_pos
@@ -735,6 +967,70 @@ def download_file_with_progress(
     return False
 
 
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DECOMPRESS_BUFFER_SIZE = 1024 * 1024
+
+
+def detect_layer_compression(path: str, media_type: str = "") -> str:
+    # 以文件头魔数为准：部分镜像站返回的 mediaType 与实际内容不一致
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        compression = "gzip"
+    elif magic.startswith(ZSTD_MAGIC):
+        compression = "zstd"
+    else:
+        compression = "none"
+
+    if media_type.endswith("+zstd"):
+        declared = "zstd"
+    elif media_type.endswith("+gzip") or media_type.endswith(".tar.gzip"):
+        declared = "gzip"
+    elif media_type:
+        declared = "none"
+    else:
+        declared = compression
+    if declared != compression:
+        logger.debug(f"层声明类型 {media_type} 与实际内容 ({compression}) 不符，按实际内容处理")
+    return compression
+
+
+def _zstd_decompress_stream(src, dst):
+    # Python 3.14+ 使用标准库 compression.zstd，否则回退到 zstandard 模块
+    try:
+        from compression import zstd
+    except ImportError:
+        zstd = None
+    if zstd is not None:
+        with zstd.ZstdFile(src, "rb") as reader:
+            shutil.copyfileobj(reader, dst, DECOMPRESS_BUFFER_SIZE)
+        return
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("解压 zstd 层需要 Python 3.14+ 或安装 zstandard 模块（pip install zstandard）")
+    zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=DECOMPRESS_BUFFER_SIZE, write_size=DECOMPRESS_BUFFER_SIZE)
+
+
+def decompress_layer(src_path: str, dst_path: str, media_type: str = "") -> str:
+    compression = detect_layer_compression(src_path, media_type)
+    if compression == "none":
+        # 未压缩的层直接改名，不做任何拷贝
+        os.replace(src_path, dst_path)
+        return compression
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        if compression == "gzip":
+            with gzip.GzipFile(fileobj=src, mode="rb") as gz:
+                shutil.copyfileobj(gz, dst, DECOMPRESS_BUFFER_SIZE)
+        else:
+            _zstd_decompress_stream(src, dst)
+    os.remove(src_path)
+    return compression
+
+
 def download_layers(
     session: requests.Session,
     registry: str,
@@ -763,7 +1059,7 @@ def download_layers(
     config_size = int(resp_json.get("config", {}).get("size") or 0)
     config_filename = f"{config_digest[7:]}.json"
     config_path = os.path.join(imgdir, config_filename)
-    config_url = f"https://{registry}/v2/{repository}/blobs/{config_digest}"
+    config_url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/blobs/{config_digest}"
 
     if progress_manager.is_config_completed() and os.path.exists(config_path):
         logger.info("✅ Config 已存在，跳过下载")
@@ -779,6 +1075,7 @@ def download_layers(
     content = [{"Config": config_filename, "RepoTags": [repo_tag], "Layers": []}]
     parentid = ""
     layer_json_map: Dict[str, Dict[str, Any]] = {}
+    layer_media_types: Dict[str, str] = {}
 
     layers_to_download: List[Tuple[str, str, str, str, int]] = []
     skipped_count = 0
@@ -789,6 +1086,7 @@ def download_layers(
         layerdir = f"{imgdir}/{fake_layerid}"
         os.makedirs(layerdir, exist_ok=True)
         layer_json_map[fake_layerid] = {"id": fake_layerid, "parent": parentid if parentid else None}
+        layer_media_types[fake_layerid] = layer.get("mediaType", "")
         parentid = fake_layerid
 
         save_path = f"{layerdir}/layer_gzip.tar"
@@ -813,7 +1111,7 @@ def download_layers(
         for ublob, _, _, save_path, _ in layers_to_download:
             if stop_event.is_set():
                 raise KeyboardInterrupt
-            url = f"https://{registry}/v2/{repository}/blobs/{ublob}"
+            url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/blobs/{ublob}"
             progress_manager.update_layer_status(ublob, "downloading")
             futures[
                 executor.submit(
@@ -861,7 +1159,7 @@ def download_layers(
         with ThreadPoolExecutor(max_workers=num_workers) as executor:
             futures2: Dict[Any, Tuple[str, str]] = {}
             for ublob, save_path in retry_list:
-                url = f"https://{registry}/v2/{repository}/blobs/{ublob}"
+                url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/blobs/{ublob}"
                 progress_manager.update_layer_status(ublob, "retrying")
                 futures2[
                     executor.submit(
@@ -894,7 +1192,7 @@ def download_layers(
         logger.error("💡 可重新运行程序，已成功的层会自动跳过")
         raise RuntimeError(f"{len(failed_layers)} 个层下载失败，镜像不完整")
 
-    # 解压 + 写 json
+    # 解压（gzip / zstd / 未压缩）+ 写 json
     for fake_layerid in layer_json_map.keys():
         if stop_event.is_set():
             raise KeyboardInterrupt("用户已取消操作")
@@ -902,9 +1200,7 @@ def download_layers(
         gz_path = f"{layerdir}/layer_gzip.tar"
         tar_path = f"{layerdir}/layer.tar"
         if os.path.exists(gz_path):
-            with gzip.open(gz_path, "rb") as gz, open(tar_path, "wb") as file:
-                shutil.copyfileobj(gz, file)
-            os.remove(gz_path)
+            decompress_layer(gz_path, tar_path, layer_media_types[fake_layerid])
 
         with open(f"{layerdir}/json", "w", encoding="utf-8") as file:
             json.dump(layer_json_map[fake_layerid], file)
@@ -950,26 +1246,32 @@ def cleanup_tmp_dir():
 
 
 def search_1ms(session: requests.Session, api_base: str, query: str, page: int, page_size: int) -> Dict[str, Any]:
-    url = f"{api_base}/search"
-    resp = session.get(url, params={"query": query, "page": page, "page_size": page_size}, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-    if data.get("code") != 0:
-        raise RuntimeError(f"搜索接口返回异常: {data}")
-    return data["data"]
+    def load():
+        url = f"{api_base}/search"
+        resp = session.get(url, params={"query": query, "page": page, "page_size": page_size}, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("code") != 0:
+            raise RuntimeError(f"搜索接口返回异常: {data}")
+        return data["data"]
+
+    return api_cache.get_or_load(cache_key("search", api_base, query, page, page_size), load)
 
 
 def get_detail_1ms(session: requests.Session, api_base: str, repositories: str) -> Dict[str, Any]:
-    url = f"{api_base}/get_detail"
-    resp = session.get(url, params={"repositories": repositories}, timeout=30)
-    resp.raise_for_status()
-    payload = resp.json()
-    if payload.get("code") != 0:
-        raise RuntimeError(f"详情接口返回异常: {payload}")
-    return payload.get("data") or {}
+    def load():
+        url = f"{api_base}/get_detail"
+        resp = session.get(url, params={"repositories": repositories}, timeout=30)
+        resp.raise_for_status()
+        payload = resp.json()
+        if payload.get("code") != 0:
+            raise RuntimeError(f"详情接口返回异常: {payload}")
+        return payload.get("data") or {}
 
+    return api_cache.get_or_load(cache_key("detail", api_base, repositories), load)
 
-def get_tags_1ms(
+
+def fetch_tags_1ms(
     session: requests.Session,
     api_base: str,
     repositories: str,
@@ -996,6 +1298,23 @@ def get_tags_1ms(
     return payload.get("data") or {}
 
 
+def get_tags_1ms(
+    session: requests.Session,
+    api_base: str,
+    repositories: str,
+    page: int,
+    page_size: int,
+    search: str = "",
+    sort_by: str = "last_updated",
+    sort_order: str = "DESC",
+) -> Dict[str, Any]:
+    def load():
+        return fetch_tags_1ms(session, api_base, repositories, page, page_size, search, sort_by, sort_order)
+
+    key = cache_key("tags", api_base, repositories, page, page_size, search, sort_by, sort_order)
+    return api_cache.get_or_load(key, load)
+
+
 def _fmt_time(t: str) -> str:
     # 2026-04-07T19:51:13.804481832Z -> 2026-04-07 19:51:13
     if not t:
@@ -1027,11 +1346,45 @@ def _fmt_arch(img: Dict[str, Any]) -> str:
     return f"{os_}/{arch}"
 
 
+def _print_tag_items(items: List[Dict[str, Any]], default_tag: str):
+    # 显示：tag_name、最近推送、架构数量、示例架构、大小（取 amd64/linux 的 size）
+    for idx, it in enumerate(items, start=1):
+        tag_name = it.get("tag_name") or it.get("name") or ""
+        images = it.get("images") or []
+        last_pushed = _max_last_pushed(images)
+        linux_imgs = [im for im in images if (im.get("os") == "linux" and im.get("architecture") not in (None, "", "unknown"))]
+        arch_count = len(linux_imgs)
+        arch_preview = ", ".join([_fmt_arch(im) for im in linux_imgs[:3]])
+
+        size = ""
+        for im in linux_imgs:
+            if im.get("architecture") == "amd64":
+                try:
+                    size = DownloadStats().format_size(int(im.get("size") or 0))
+                except Exception:
+                    size = ""
+                break
+        default_mark = " (默认)" if tag_name == default_tag else ""
+
+        print(f"{idx:>2}. {tag_name}{default_mark}")
+        meta = []
+        if last_pushed:
+            meta.append(f"last_pushed={last_pushed}")
+        if arch_count:
+            meta.append(f"archs={arch_count}")
+        if size:
+            meta.append(f"amd64_size≈{size}")
+        if meta:
+            print(f"    {'  '.join(meta)}")
+        if arch_preview:
+            print(f"    {arch_preview}")
+
+
 def interactive_tag_select(
     session: requests.Session,
     api_base: str,
     repositories: str,
-    page_size: int = 8,
+    page_size: int = TAG_PAGE_SIZE,
     default_tag: str = "latest",
 ) -> Tuple[str, Dict[str, Any]]:
     """
@@ -1042,10 +1395,13 @@ def interactive_tag_select(
     search = ""
 
     while True:
-        data = get_tags_1ms(session, api_base, repositories, page, page_size, search=search)
+        data = prefetcher.get(get_tags_1ms, session, api_base, repositories, page, page_size, search)
         total = int(data.get("total", 0) or 0)
         items = data.get("list", []) or []
         total_pages = max(1, (total + page_size - 1) // page_size)
+        for p in (page - 1, page + 1):
+            if 1 <= p <= total_pages:
+                prefetcher.submit(get_tags_1ms, session, api_base, repositories, p, page_size, search)
 
         print("\n" + "=" * 80)
         title = f"🏷️ Tag 列表: {repositories}    页码: {page}/{total_pages}    总数: {total}"
@@ -1054,37 +1410,7 @@ def interactive_tag_select(
         print(title)
         print("-" * 80)
 
-        # 显示：tag_name、最近推送、架构数量、示例架构、大小（取 amd64/linux 的 size）
-        for idx, it in enumerate(items, start=1):
-            tag_name = it.get("tag_name") or it.get("name") or ""
-            images = it.get("images") or []
-            last_pushed = _max_last_pushed(images)
-            linux_imgs = [im for im in images if (im.get("os") == "linux" and im.get("architecture") not in (None, "", "unknown"))]
-            arch_count = len(linux_imgs)
-            arch_preview = ", ".join([_fmt_arch(im) for im in linux_imgs[:3]])
-
-            size = ""
-            for im in linux_imgs:
-                if im.get("architecture") == "amd64":
-                    try:
-                        size = DownloadStats().format_size(int(im.get("size") or 0))
-                    except Exception:
-                        size = ""
-                    break
-            default_mark = " (默认)" if tag_name == default_tag else ""
-
-            print(f"{idx:>2}. {tag_name}{default_mark}")
-            meta = []
-            if last_pushed:
-                meta.append(f"last_pushed={last_pushed}")
-            if arch_count:
-                meta.append(f"archs={arch_count}")
-            if size:
-                meta.append(f"amd64_size≈{size}")
-            if meta:
-                print(f"    {'  '.join(meta)}")
-            if arch_preview:
-                print(f"    {arch_preview}")
+        _print_tag_items(items, default_tag)
 
         print("-" * 80)
         print("输入：序号=选择  n=下一页  p=上一页  g=跳页  s=搜索tag  q=退出")
@@ -1133,6 +1459,328 @@ def interactive_tag_select(
             print("输入无效")
 
 
+def _tag_updated(item: Dict[str, Any]) -> str:
+    images = item.get("images") or []
+    return item.get("last_updated") or max((im.get("last_pushed") or "" for im in images), default="")
+
+
+def fuzzy_score(query: str, text: str) -> Optional[float]:
+    # 子串命中优先（越靠前、tag 越短分越高）；否则按子序列匹配，连续命中加分，都不满足返回 None
+    pos = text.find(query)
+    if pos >= 0:
+        return 1000.0 - pos - len(text) / 100
+    score = 0.0
+    last = -1
+    for ch in query:
+        found = text.find(ch, last + 1)
+        if found < 0:
+            return None
+        score += 3.0 if found == last + 1 else 1.0 - min(found - last, 10) / 20
+        last = found
+    return score
+
+
+# 仓库全部 tag 的本地索引：并发拉取所有分页，之后在本地做子串/模糊搜索与排序。
+# 再次打开时按 last_updated 倒序只拉取比索引更新的页；与服务端总数对不上（有 tag 被删除）时整体重建
+class TagIndex:
+    def __init__(self, api_base: str, repositories: str, index_dir: Path = TAG_INDEX_DIR):
+        self.api_base = api_base
+        self.repositories = repositories
+        name = hashlib.sha1(f"{api_base}|{repositories}".encode("utf-8")).hexdigest()[:16]
+        self.path = Path(index_dir) / f"{name}.json"
+        self.tags: Dict[str, Dict[str, Any]] = {}
+        self.newest = ""
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("repositories") == self.repositories:
+            self._merge(data.get("tags") or [])
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"repositories": self.repositories, "tags": list(self.tags.values())}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _compact(item: Dict[str, Any]) -> Dict[str, Any]:
+        keep = ("os", "architecture", "variant", "digest", "size", "last_pushed")
+        return {
+            "tag_name": item.get("tag_name") or item.get("name") or "",
+            "last_updated": _tag_updated(item),
+            "images": [{k: im[k] for k in keep if im.get(k) is not None} for im in item.get("images") or []],
+        }
+
+    def _merge(self, items: List[Dict[str, Any]]):
+        for item in items:
+            entry = self._compact(item)
+            if entry["tag_name"]:
+                self.tags[entry["tag_name"]] = entry
+                self.newest = max(self.newest, entry["last_updated"])
+
+    def _fetch(self, session: requests.Session, page: int) -> Dict[str, Any]:
+        return fetch_tags_1ms(session, self.api_base, self.repositories, page, TAG_INDEX_PAGE_SIZE)
+
+    def rebuild(self, session: requests.Session) -> int:
+        first = self._fetch(session, 1)
+        total = int(first.get("total", 0) or 0)
+        pages = max(1, (total + TAG_INDEX_PAGE_SIZE - 1) // TAG_INDEX_PAGE_SIZE)
+        self.tags = {}
+        self.newest = ""
+        self._merge(first.get("list") or [])
+        with ThreadPoolExecutor(max_workers=TAG_INDEX_WORKERS) as executor:
+            for data in executor.map(lambda p: self._fetch(session, p), range(2, pages + 1)):
+                self._merge(data.get("list") or [])
+        self._save()
+        return pages
+
+    def refresh(self, session: requests.Session) -> int:
+        if not self.tags:
+            return self.rebuild(session)
+        newest = self.newest
+        page = 1
+        while True:
+            data = self._fetch(session, page)
+            items = data.get("list") or []
+            total = int(data.get("total", 0) or 0)
+            self._merge(items)
+            if not items or any(_tag_updated(it) <= newest for it in items) or page * TAG_INDEX_PAGE_SIZE >= total:
+                break
+            page += 1
+        if total != len(self.tags):
+            return page + self.rebuild(session)
+        self._save()
+        return page
+
+    def search(self, query: str = "", sort: str = "time") -> List[Dict[str, Any]]:
+        entries = list(self.tags.values())
+        if query:
+            query = query.lower()
+            scored = [(score, e) for e in entries if (score := fuzzy_score(query, e["tag_name"].lower())) is not None]
+            scored.sort(key=lambda x: (x[0], x[1]["last_updated"]), reverse=True)
+            return [e for _, e in scored]
+        if sort == "name":
+            return sorted(entries, key=lambda e: e["tag_name"])
+        return sorted(entries, key=lambda e: e["last_updated"], reverse=True)
+
+
+def interactive_local_tag_select(
+    session: requests.Session,
+    api_base: str,
+    repositories: str,
+    page_size: int = TAG_PAGE_SIZE,
+    default_tag: str = "latest",
+    index_dir: Path = TAG_INDEX_DIR,
+) -> Tuple[str, Dict[str, Any]]:
+    index = TagIndex(api_base, repositories, index_dir)
+    print(f"\n📚 {'增量更新' if index.tags else '建立'}本地 tag 索引: {repositories} ...")
+    start = time.perf_counter()
+    requests_made = index.refresh(session)
+    print(f"✅ 索引就绪：{len(index.tags)} 个 tag，请求 {requests_made} 页，用时 {time.perf_counter() - start:.2f}s")
+
+    page = 1
+    search = ""
+    sort = "time"
+
+    while True:
+        start = time.perf_counter()
+        matches = index.search(search, sort)
+        cost_ms = (time.perf_counter() - start) * 1000
+        total_pages = max(1, (len(matches) + page_size - 1) // page_size)
+        page = min(page, total_pages)
+        items = matches[(page - 1) * page_size: page * page_size]
+
+        print("\n" + "=" * 80)
+        title = f"🏷️ Tag 列表（本地索引）: {repositories}    页码: {page}/{total_pages}    匹配: {len(matches)}/{len(index.tags)}"
+        if search:
+            title += f"    搜索: {search}"
+        else:
+            title += f"    排序: {'更新时间' if sort == 'time' else '名称'}"
+        print(f"{title}    ({cost_ms:.1f}ms)")
+        print("-" * 80)
+        _print_tag_items(items, default_tag)
+        print("-" * 80)
+        print("输入：序号=选择  n=下一页  p=上一页  g=跳页  s=搜索tag(支持模糊)  o=切换排序  r=刷新索引  q=退出")
+        cmd = input("你的选择: ").strip().lower()
+
+        if cmd in ("q", "quit", "exit"):
+            raise KeyboardInterrupt("用户退出")
+        if cmd in ("n", "next"):
+            if page < total_pages:
+                page += 1
+            else:
+                print("已是最后一页")
+            continue
+        if cmd in ("p", "prev", "previous"):
+            if page > 1:
+                page -= 1
+            else:
+                print("已是第一页")
+            continue
+        if cmd in ("g", "goto"):
+            try:
+                new_page = int(input(f"请输入页码(1-{total_pages}): ").strip())
+                if 1 <= new_page <= total_pages:
+                    page = new_page
+                else:
+                    print("页码超出范围")
+            except Exception:
+                print("页码输入无效")
+            continue
+        if cmd in ("s", "search"):
+            search = input("输入 tag 搜索关键词（留空清空搜索）: ").strip()
+            page = 1
+            continue
+        if cmd in ("o", "order"):
+            sort = "name" if sort == "time" else "time"
+            page = 1
+            continue
+        if cmd in ("r", "refresh"):
+            start = time.perf_counter()
+            requests_made = index.refresh(session)
+            print(f"✅ 索引已刷新：{len(index.tags)} 个 tag，请求 {requests_made} 页，用时 {time.perf_counter() - start:.2f}s")
+            continue
+
+        try:
+            selected = int(cmd)
+            if 1 <= selected <= len(items):
+                it = items[selected - 1]
+                return it["tag_name"], it
+            print("序号超出范围")
+        except Exception:
+            print("输入无效")
+
+
+def _platform_name(platform: Dict[str, Any]) -> str:
+    parts = [platform.get("os") or "unknown", platform.get("architecture") or "unknown"]
+    if platform.get("variant"):
+        parts.append(platform["variant"])
+    return "/".join(parts)
+
+
+# manifest 按 digest 寻址、内容不会变化，平台与压缩大小的汇总可以长期缓存；
+# 每个 tag 先用 HEAD 取 digest，命中缓存时不再下载 manifest
+def summarize_tag_platforms(
+    session: requests.Session,
+    registry: str,
+    repository: str,
+    tag: str,
+    auth_head: Dict[str, str],
+    cache: TTLCache,
+) -> Dict[str, int]:
+    def manifest_json(ref: str) -> Dict[str, Any]:
+        resp, code = fetch_manifest(session, registry, repository, ref, auth_head)
+        if code != 200:
+            raise RuntimeError(f"获取 manifest 失败: HTTP {code}")
+        return resp.json()
+
+    def image_size(data: Dict[str, Any]) -> int:
+        return int(data.get("config", {}).get("size") or 0) + sum(int(l.get("size") or 0) for l in data.get("layers", []))
+
+    def load_image(digest: str) -> int:
+        return cache.get_or_load(cache_key("image-size", registry, repository, digest), lambda: image_size(manifest_json(digest)))
+
+    def load() -> Dict[str, int]:
+        data = manifest_json(digest or tag)
+        manifests = data.get("manifests")
+        if manifests is None:
+            # 单架构镜像：平台信息在 config 里
+            config_digest = data["config"]["digest"]
+            url = f"{REGISTRY_SCHEME}://{registry}/v2/{repository}/blobs/{config_digest}"
+            resp = session.get(url, headers=auth_head, verify=False, timeout=60)
+            resp.raise_for_status()
+            return {_platform_name(resp.json()): image_size(data)}
+        platforms = {}
+        for m in manifests:
+            platform = m.get("platform") or {}
+            if platform.get("os") in (None, "unknown"):
+                continue  # attestation 等非镜像条目
+            platforms[_platform_name(platform)] = load_image(m["digest"])
+        return platforms
+
+    digest = head_manifest_digest(session, registry, repository, tag, auth_head)
+    if digest is None:
+        return load()
+    return cache.get_or_load(cache_key("platforms", registry, repository, digest), load)
+
+
+def collect_matrix_tags(session: requests.Session, api_base: str, repositories: str, tag_filter: str, limit: int) -> List[str]:
+    tags: List[str] = []
+    page = 1
+    while len(tags) < limit:
+        data = fetch_tags_1ms(session, api_base, repositories, page, TAG_INDEX_PAGE_SIZE, search=tag_filter)
+        items = data.get("list") or []
+        tags.extend(name for it in items if (name := it.get("tag_name") or it.get("name")))
+        if not items or page * TAG_INDEX_PAGE_SIZE >= int(data.get("total", 0) or 0):
+            break
+        page += 1
+    return tags[:limit]
+
+
+def print_arch_matrix(
+    session: requests.Session,
+    api_base: str,
+    registry: str,
+    repositories: str,
+    tag_filter: str = "",
+    limit: int = ARCH_MATRIX_MAX_TAGS,
+    highlight_arch: str = "",
+) -> Dict[str, Dict[str, int]]:
+    start = time.perf_counter()
+    tags = collect_matrix_tags(session, api_base, repositories, tag_filter, limit)
+    if not tags:
+        logger.error("没有匹配的 tag")
+        return {}
+    auth_head = registry_auth_head(session, registry, repositories)
+    MANIFEST_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    cache = TTLCache(ttl=MANIFEST_CACHE_TTL, max_entries=8192, disk_path=str(MANIFEST_CACHE_FILE), autosave=False)
+
+    matrix: Dict[str, Dict[str, int]] = {}
+    errors: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=ARCH_MATRIX_WORKERS) as executor:
+        futures = {executor.submit(summarize_tag_platforms, session, registry, repositories, tag, auth_head, cache): tag for tag in tags}
+        for future in as_completed(futures):
+            tag = futures[future]
+            try:
+                matrix[tag] = future.result()
+            except Exception as e:
+                errors[tag] = str(e)
+    cache.flush()
+
+    preferred = ["linux/amd64", "linux/arm64/v8", "linux/arm64", "linux/arm/v7", "linux/arm/v6", "linux/386", "linux/ppc64le", "linux/s390x", "linux/riscv64"]
+    platforms = sorted({p for row in matrix.values() for p in row}, key=lambda p: (preferred.index(p) if p in preferred else len(preferred), p))
+    stats = DownloadStats()
+    tag_width = max(len(t) for t in tags) + 2
+    col_width = max([10] + [len(p) + 2 for p in platforms])
+
+    print("\n" + "=" * 80)
+    print(f"🧩 架构矩阵: {repositories}    tag 数: {len(tags)}    用时: {time.perf_counter() - start:.2f}s")
+    print("-" * 80)
+    print(f"{'TAG':<{tag_width}}" + "".join(f"{p:>{col_width}}" for p in platforms))
+    for tag in tags:
+        if tag in errors:
+            print(f"{tag:<{tag_width}}  ❌ {errors[tag]}")
+            continue
+        row = matrix.get(tag, {})
+        cells = []
+        for p in platforms:
+            cell = stats.format_size(row[p]) if p in row else "-"
+            if highlight_arch and p.split("/")[1:2] == [highlight_arch] and p in row:
+                cell = f"*{cell}"
+            cells.append(f"{cell:>{col_width}}")
+        print(f"{tag:<{tag_width}}" + "".join(cells))
+    print("-" * 80)
+    print("单元格为该平台镜像的压缩大小（config + 各层），- 表示该 tag 不提供此平台" + (f"，* 标记 {highlight_arch}" if highlight_arch else ""))
+    return matrix
+
+
 def interactive_search_and_select(
     session: requests.Session,
     api_base: str,
@@ -1141,10 +1789,11 @@ def interactive_search_and_select(
 ) -> Tuple[Dict[str, Any], int]:
     page = 1
     while True:
-        data = search_1ms(session, api_base, keyword, page, page_size)
+        data = prefetcher.get(search_1ms, session, api_base, keyword, page, page_size)
         total = data.get("total", 0)
         items = data.get("list", [])
         total_pages = max(1, (total + page_size - 1) // page_size)
+        prefetch_search_neighbours(session, api_base, keyword, page, page_size, total_pages, items)
 
         print("\n" + "=" * 80)
         print(f"🔎 关键词: {keyword}    页码: {page}/{total_pages}    总数: {total}")
@@ -1279,12 +1928,29 @@ def main():
         parser.add_argument("--no-download", action="store_true", help="仅验证搜索与 manifest（不下载层）")
         parser.add_argument("--select-index", type=int, help="配合 --keyword：自动选择当前页的第 N 个结果（用于脚本化/验证）")
         parser.add_argument("--page", type=int, default=1, help="配合 --select-index：指定页码，默认 1")
+        parser.add_argument("--plain-http", action="store_true", help="使用 HTTP 而非 HTTPS 访问 registry（本地/内网仓库）")
+        parser.add_argument("--cache-ttl", type=int, default=API_CACHE_TTL, help=f"搜索/Tag 结果缓存秒数，0 关闭缓存，默认 {API_CACHE_TTL}")
+        parser.add_argument("--cache-file", help="将搜索/Tag 缓存持久化到指定 JSON 文件，跨次运行复用")
+        parser.add_argument("--no-prefetch", action="store_true", help="关闭交互浏览时对相邻页和候选镜像的后台预取")
+        parser.add_argument("--local-tags", action="store_true", help="交互选择 tag 时先建立/增量更新本地 tag 索引，在本地搜索与排序")
+        parser.add_argument("--arch-matrix", action="store_true", help="选择镜像后并发检查多个 tag 的可用平台与压缩大小，输出 tag × 平台矩阵后退出")
+        parser.add_argument("--tag-filter", default="", help="配合 --arch-matrix：只检查名称包含该关键词的 tag")
+        parser.add_argument("--matrix-tags", type=int, default=ARCH_MATRIX_MAX_TAGS, help=f"配合 --arch-matrix：最多检查的 tag 数（按更新时间倒序），默认 {ARCH_MATRIX_MAX_TAGS}")
+        parser.add_argument("--tag-index-dir", default=str(TAG_INDEX_DIR), help=f"本地 tag 索引目录，默认 {TAG_INDEX_DIR}")
         parser.add_argument("--debug", action="store_true", help="调试模式")
         args = parser.parse_args()
 
         if args.debug:
             logger.setLevel(logging.DEBUG)
 
+        if args.plain_http:
+            global REGISTRY_SCHEME
+            REGISTRY_SCHEME = "http"
+
+        global api_cache
+        api_cache = TTLCache(ttl=args.cache_ttl, disk_path=args.cache_file)
+        prefetcher.enabled = not args.no_prefetch
+
         logger.info(f"🚀 1ms Docker 镜像下载专版 {VERSION}")
 
         session = SessionManager.get_session()
@@ -1319,7 +1985,7 @@ def main():
 
         # 2) 详情（展示一下，简化用户判断）
         try:
-            detail = get_detail_1ms(session, args.api, repositories)
+            detail = prefetcher.get(get_detail_1ms, session, args.api, repositories)
             desc = (detail.get("description") or "").strip()
             cats = ", ".join([c.get("name") for c in (detail.get("categories") or []) if c.get("name")]) or ""
             reg = detail.get("date_registered") or ""
@@ -1333,6 +1999,10 @@ def main():
         except Exception as e:
             logger.warning(f"获取详情失败（可忽略）：{e}")
 
+        if args.arch_matrix:
+            print_arch_matrix(session, args.api, args.registry, repositories, args.tag_filter, args.matrix_tags, args.arch)
+            return
+
         # 3) tag（来自 1ms /get_tags）
         # 非交互：保持兼容，如果未传 --tag 则默认 latest
         is_interactive = (args.select_index is None) and sys.stdin.isatty()
@@ -1341,12 +2011,21 @@ def main():
             chosen_tag = args.tag
         elif not is_interactive:
             chosen_tag = "latest"
+        elif args.local_tags:
+            chosen_tag, chosen_tag_item = interactive_local_tag_select(
+                session=session,
+                api_base=args.api,
+                repositories=repositories,
+                page_size=TAG_PAGE_SIZE,
+                default_tag="latest",
+                index_dir=Path(args.tag_index_dir),
+            )
         else:
             chosen_tag, chosen_tag_item = interactive_tag_select(
                 session=session,
                 api_base=args.api,
                 repositories=repositories,
-                page_size=8,
+                page_size=TAG_PAGE_SIZE,
                 default_tag="latest",
             )
         args.tag = chosen_tag
@@ -1355,26 +2034,7 @@ def main():
         image_info = build_image_info_from_search_item(args.registry, selected_item, args.tag)
 
         # 3) registry auth（尽量兼容有 token 的镜像站）
-        auth_head: Dict[str, str] = {
-            "Accept": ", ".join(
-                [
-                    "application/vnd.docker.distribution.manifest.v2+json",
-                    "application/vnd.docker.distribution.manifest.list.v2+json",
-                    "application/vnd.oci.image.index.v1+json",
-                    "application/vnd.oci.image.manifest.v1+json",
-                ]
-            )
-        }
-        try:
-            ping_url = f"https://{image_info.registry}/v2/"
-            resp = session.get(ping_url, verify=False, timeout=30)
-            if resp.status_code == 401 and "WWW-Authenticate" in resp.headers:
-                www = resp.headers["WWW-Authenticate"]
-                auth_url = www.split('"')[1]
-                reg_service = www.split('"')[3]
-                auth_head = get_auth_head(session, auth_url, reg_service, image_info.repository)
-        except Exception as e:
-            logger.warning(f"连接 registry 探测认证失败，将继续尝试直接拉取 manifest: {e}")
+        auth_head = registry_auth_head(session, image_info.registry, image_info.repository)
 
         # 4) 拉取 manifest（tag）
         resp, code = fetch_manifest(session, image_info.registry, image_info.repository, image_info.tag, auth_head)